@@ -0,0 +1,60 @@
+import base64
+import io
+import os
+
+# Report artifacts (robustness CSV, trade log CSV, strategy graph PNG) are built as bytes in
+# memory and handed back with the request's result, so concurrent requests for the same
+# strategy never share a file and nothing is written just to be read back.
+# A job submitted with "save_artifacts": true also keeps them as files in its own directory,
+# ARTIFACTS_DIR/<job id>/, once it finishes.
+ARTIFACTS_DIR = os.environ.get('BACKTEST_ARTIFACTS_DIR', os.path.join('stock_data', 'artifacts'))
+ARTIFACT_FILES = {
+    "Robustness Test": "robustness_test_{strategy}.csv",
+    "Trade Log": "trade_log_{strategy}.csv",
+    "Graph Img": "{strategy}_strategy_graph.png",
+}
+
+
+def figure_image(fmt='png', dpi=100):
+    import matplotlib.pyplot as plt
+    """Render the current pyplot figure to PNG (or SVG) bytes and close it."""
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format=fmt, dpi=dpi)
+    plt.close()  # Free memory
+    return buffer.getvalue()
+
+
+def frame_csv(frame):
+    from components.telemetry import span
+    with span('encode'):
+        return frame.to_csv(index=False).encode('utf-8')
+
+
+def encode(data):
+    from components.telemetry import span
+    with span('encode'):
+        return base64.b64encode(data).decode('utf-8') if data is not None else None
+
+
+def job_artifacts_dir(job_id):
+    return os.path.join(ARTIFACTS_DIR, job_id)
+
+
+def save_job_artifacts(job_id, result):
+    """Write the artifacts of a finished job's reports to its directory and return the paths."""
+    # /backtest answers with one report, /execute-strategies with a list; other results carry none
+    reports = result if isinstance(result, list) else [result]
+    directory = job_artifacts_dir(job_id)
+    paths = []
+    for report in reports:
+        if not isinstance(report, dict) or "Strategy name" not in report:
+            continue
+        for field, filename in ARTIFACT_FILES.items():
+            if not report.get(field):
+                continue
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, filename.format(strategy=report["Strategy name"]))
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(report[field]))
+            paths.append(path)
+    return paths
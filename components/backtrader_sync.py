@@ -1,28 +1,40 @@
 import backtrader as bt
+import numpy as np
 import numpy_financial as npf
+import time
 
-def run_backtrader_sync(data_feed, strategy_name, params, initial_portfolio_value, stock_data):
+def run_backtrader_sync(data_feed, strategy_name, params, initial_portfolio_value, stock_data, context=None,
+                        pruner=None):
     from components.strategy_class import create_strategy_class
-    from components.formulas import calculate_metrics, calculate_cash_flows
+    from components.formulas import calculate_metrics, calculate_cash_flows, metrics_context
+    from components.telemetry import span, observe, count
     """Run Backtrader synchronously in a separate thread."""
+    start_time = time.perf_counter()
+    context = context or metrics_context(stock_data)
     cerebro = bt.Cerebro()
     cerebro.adddata(data_feed)
     cerebro.broker.setcash(initial_portfolio_value)
     Strategy = create_strategy_class(strategy_name)
-    cerebro.addstrategy(Strategy, params=params)
+    if pruner is not None:
+        pruner.reset()
+        cerebro.addstrategy(Strategy, params=params, pruner=pruner)
+    else:
+        cerebro.addstrategy(Strategy, params=params)
     strategy = cerebro.run()[0]
     final_portfolio_value = cerebro.broker.getvalue()
-    # Calculate cash flows
-    cash_flows = calculate_cash_flows(strategy.log_data, initial_portfolio_value, stock_data)
-    # print(f"Cash flow: {cash_flows}")
-    irr = npf.irr(cash_flows)
-    
-    # Calculate additional metrics
-    win_rate, sharpe_ratio, max_drawdown = calculate_metrics(
-        strategy,
-        initial_portfolio_value=initial_portfolio_value,
-        final_portfolio_value=cerebro.broker.getvalue(), stock_data=stock_data, cash_flows=cash_flows
-    )
+    with span('metrics'):
+        # Calculate cash flows
+        cash_flows = calculate_cash_flows(strategy.log_data, initial_portfolio_value, stock_data, context)
+        # print(f"Cash flow: {cash_flows}")
+        irr = npf.irr(cash_flows)
+
+        # Calculate additional metrics
+        win_rate, sharpe_ratio, max_drawdown = calculate_metrics(
+            strategy,
+            initial_portfolio_value=initial_portfolio_value,
+            final_portfolio_value=cerebro.broker.getvalue(), stock_data=stock_data, cash_flows=cash_flows,
+            context=context
+        )
     
     # Save results
     result = {
@@ -33,5 +45,52 @@ def run_backtrader_sync(data_feed, strategy_name, params, initial_portfolio_valu
         "IRR": f"{irr:.2f}",
         "Portfolio Value": f"{final_portfolio_value:.2f}",
     }
+    if pruner is not None:
+        result["Pruned"] = strategy.pruned
+
+    observe('combo', time.perf_counter() - start_time, engine='backtrader')
+    count('combos', engine='backtrader')
+    return result
+
+def run_backtrader_chunk(price_handle, strategy_name, combinations, initial_portfolio_value, pruning=None,
+                         threshold=-np.inf, profile_sample=None):
+    from components.shared_prices import with_attached_prices
+    """Run a chunk of combinations on the price block published for the sweep."""
+    # The block is mapped for the chunk only and unmapped once it is done
+    return with_attached_prices(
+        price_handle, run_chunk, strategy_name, combinations, initial_portfolio_value, pruning, threshold,
+        profile_sample
+    )
 
-    return result
\ No newline at end of file
+def run_chunk(stock_data, strategy_name, combinations, initial_portfolio_value, pruning, threshold, profile_sample):
+    from components.formulas import metrics_context
+    from components.pruning import Pruner
+    # With profile_sample, that share of the combinations runs under cProfile and the chunk
+    # returns (results, elapsed, profile) instead of (results, elapsed)
+    start_time = time.perf_counter()
+    # The chunk builds one feed and one metrics context for all its combinations
+    data_feed = bt.feeds.PandasData(dataname=stock_data)
+    context = metrics_context(stock_data)
+    # The top-k threshold is the sweep's when the chunk was sent, raised by the chunk's own runs
+    pruner = Pruner(pruning, stock_data, initial_portfolio_value, threshold) if pruning else None
+    profiler = None
+    if profile_sample:
+        import cProfile
+        from components.profiling import is_sampled, worker_profile
+        profiler = cProfile.Profile()
+        sampled = 0
+    results = []
+    for params in combinations:
+        if profiler is not None and is_sampled(params, profile_sample):
+            profiler.enable()
+            result = run_backtrader_sync(data_feed, strategy_name, params, initial_portfolio_value, stock_data, context, pruner)
+            profiler.disable()
+            sampled += 1
+        else:
+            result = run_backtrader_sync(data_feed, strategy_name, params, initial_portfolio_value, stock_data, context, pruner)
+        if pruner is not None:
+            pruner.record([result])
+        results.append(result)
+    if profiler is not None:
+        return results, time.perf_counter() - start_time, worker_profile(profiler, sampled)
+    return results, time.perf_counter() - start_time
@@ -4,16 +4,23 @@ from datetime import timedelta
 
 # Base Strategy Class
 class BaseStrategy(bt.Strategy):
-    def __init__(self, params, indicators, strategy_name):
+    def __init__(self, params, indicators, strategy_name, pruner=None, chart_format='png'):
         if strategy_name not in strategy_tree:
             raise ValueError(f"Strategy '{strategy_name}' not found.")
         strategy_data = strategy_tree[strategy_name]
         self.params = params
         self.strategy_name = strategy_name
         self.indicators = indicators
+        self.pruner = pruner
+        self.pruned = ""
 
         self.order = None
         self.log_data = []
+        # Report artifacts built by the stop logic of a best-params replay, as bytes;
+        # no chart is drawn when chart_format is None
+        self.chart_format = chart_format
+        self.trade_log_csv = None
+        self.graph_image = None
         self.buy_signals = []
         self.sell_signals = []
 
@@ -38,5 +45,14 @@ class BaseStrategy(bt.Strategy):
             self.log("Order Canceled/Margin/Rejected")
             self.order = None
 
+    def prune(self):
+        """Stop the run when the portfolio value at this bar breaks a pruning rule."""
+        bar = len(self.data) - 1
+        pruned = self.pruner.check(bar, bar, self.broker.getcash(), self.position.size, self.params["Trade Size"])
+        if pruned:
+            self.pruned = pruned[1]
+            self.env.runstop()
+        return bool(pruned)
+
     def next(self):
         raise NotImplementedError("The 'next' method should be implemented in the subclass.")
\ No newline at end of file
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+# Batch engine: evaluates a whole parameter grid as (combos x bars) matrices.
+# Each row of the signal matrix is one combination; the broker replay steps through the
+# bars once for every row at the same time, and the metrics are derived from the resulting
+# cash and position matrices with array operations.
+# Rows match run_vectorized_sync; IRR is solved with Newton's method instead of np.roots,
+# which agrees to well below the two decimals we report.
+
+# Rough bytes held per (combo, bar) cell: signals, cash/position matrices and temporaries
+BYTES_PER_CELL = 48
+DEFAULT_MAX_MATRIX_BYTES = 256 * 1024 * 1024
+
+
+def build_signal_matrix(indicator_cache, strategy_name, combinations):
+    from strategies import strategy_tree
+    vectorized_logic = strategy_tree[strategy_name]["vectorized_logic"]
+    # Signal rows are still built one combination at a time, from series in the shared indicator
+    # cache; only the broker replay and the metrics below run on the whole matrix at once
+    signals = [vectorized_logic(indicator_cache, params) for params in combinations]
+    return {
+        "buy": np.vstack([signal["buy"] for signal in signals]),
+        "sell": np.vstack([signal["sell"] for signal in signals]),
+        "start": np.array([signal["start"] for signal in signals]),
+        "accumulate": signals[0]["accumulate"],
+    }
+
+
+def simulate_long_only_grid(prices, signals, trade_size, initial_portfolio_value):
+    # Same broker rules as vectorized_sync.simulate_long_only, applied to every row at once
+    open_price, close = prices["open"], prices["close"]
+    buy, sell, start, accumulate = signals["buy"], signals["sell"], signals["start"], signals["accumulate"]
+    combos, bars = buy.shape
+
+    cash = np.full(combos, float(initial_portfolio_value))
+    position = np.zeros(combos, dtype=trade_size.dtype)
+    cash_matrix = np.full((combos, bars), float(initial_portfolio_value))
+    position_matrix = np.zeros((combos, bars), dtype=trade_size.dtype)
+    traded = np.zeros((combos, bars), dtype=bool)
+
+    # Win rate bookkeeping, mirroring calculate_metrics
+    open_cost = np.zeros(combos)
+    open_quantity = np.zeros(combos, dtype=trade_size.dtype)
+    winning_shares = np.zeros(combos, dtype=trade_size.dtype)
+    shares_bought = np.zeros(combos, dtype=trade_size.dtype)
+
+    for i in range(int(start.min()), bars - 1):  # orders placed on the last bar are never filled
+        fill_price = open_price[i + 1]
+        active = start <= i
+        buy_branch = buy[:, i] & active & (accumulate | (position == 0))
+        margin = (cash < trade_size * close[i]) | (cash < trade_size * fill_price)
+        filled_buy = buy_branch & ~margin
+        filled_sell = ~buy_branch & sell[:, i] & active & (position != 0)
+
+        if filled_buy.any():
+            cash = np.where(filled_buy, cash - trade_size * fill_price, cash)
+            open_cost = np.where(filled_buy, open_cost + fill_price * trade_size, open_cost)
+            open_quantity = np.where(filled_buy, open_quantity + trade_size, open_quantity)
+            shares_bought = np.where(filled_buy, shares_bought + trade_size, shares_bought)
+            position = np.where(filled_buy, position + trade_size, position)
+        if filled_sell.any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                average_buy_price = np.where(open_quantity > 0, open_cost / open_quantity, 0)
+            winning_shares = np.where(filled_sell & (fill_price > average_buy_price), winning_shares + position, winning_shares)
+            open_cost = np.where(filled_sell, 0.0, open_cost)
+            open_quantity = np.where(filled_sell, 0, open_quantity)
+            cash = np.where(filled_sell, cash + position * fill_price, cash)
+            position = np.where(filled_sell, 0, position)
+
+        traded[:, i + 1] = filled_buy | filled_sell
+        cash_matrix[:, i + 1] = cash
+        position_matrix[:, i + 1] = position
+
+    return {
+        "cash": cash_matrix,
+        "position": position_matrix,
+        "traded": traded,
+        "winning_shares": winning_shares,
+        "shares_bought": shares_bought,
+    }
+
+
+def irr_grid(cash_flows, iterations=100):
+    # Only the first flow is negative, so sum(cf_t * x^t) has exactly one positive root and
+    # is convex for x > 0. Newton's method started right of the root converges onto it.
+    exponents = np.arange(cash_flows.shape[1])
+    x = np.ones(len(cash_flows))
+    for _ in range(64):
+        below = (cash_flows * x[:, None] ** exponents).sum(axis=1) < 0
+        if not below.any():
+            break
+        x = np.where(below, x * 2, x)
+
+    for _ in range(iterations):
+        powers = x[:, None] ** exponents
+        npv = (cash_flows * powers).sum(axis=1)
+        slope = (cash_flows[:, 1:] * exponents[1:] * powers[:, :-1]).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            next_x = np.where(slope > 0, x - npv / slope, x)
+        if np.array_equal(next_x, x):
+            break
+        x = next_x
+    return 1 / x - 1
+
+
+def grid_metrics(prices, dates, replay, initial_portfolio_value, context):
+    open_price, close = prices["open"], prices["close"]
+    cash, position, traded = replay["cash"], replay["position"], replay["traded"]
+    combos = len(cash)
+    rows = np.arange(combos)
+
+    final_portfolio_value = cash[:, -1] + position[:, -1] * close[-1]
+
+    # IRR cash flows: -initial, the portfolio value after every fill, the final value
+    trade_values = cash + position * open_price
+    trade_counts = traded.sum(axis=1)
+    cash_flows = np.zeros((combos, int(trade_counts.max()) + 2))
+    cash_flows[:, 0] = -initial_portfolio_value
+    trade_rows, trade_bars = np.nonzero(traded)
+    cash_flows[trade_rows, np.cumsum(traded, axis=1)[trade_rows, trade_bars]] = trade_values[trade_rows, trade_bars]
+    cash_flows[rows, trade_counts + 1] = final_portfolio_value
+    irr = irr_grid(cash_flows)
+
+    risk_free_rate = 0.055
+    mean_portfolio_return = (final_portfolio_value - initial_portfolio_value) / initial_portfolio_value * 100
+    sharpe_ratio = (mean_portfolio_return - risk_free_rate) / context["std_dev"]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = replay["winning_shares"] / replay["shares_bought"] * 100
+    has_trades = (replay["shares_bought"] > 0) | (replay["winning_shares"] > 0)
+
+    # Drawdown between the close price peak and trough. The trade log dates every fill one
+    # day before its bar, and calculate_portfolio_value counts fills dated on or before the target.
+    log_dates = (dates - pd.Timedelta(days=1)).normalize()
+    peak, trough = context["peak_row"], context["trough_row"]
+    peak_bar = np.searchsorted(log_dates, dates[peak], side='right') - 1
+    trough_bar = np.searchsorted(log_dates, dates[trough], side='right') - 1
+    value_at_peak = cash[:, peak_bar] + position[:, peak_bar] * close[peak]
+    value_at_trough = cash[:, trough_bar] + position[:, trough_bar] * close[trough]
+    max_drawdown = (value_at_peak - value_at_trough) / value_at_peak * 100
+
+    return {
+        "Win Rate": np.where(has_trades, np.char.add(np.char.mod('%.2f', win_rate), '%'), "No Trades"),
+        "Sharpe Ratio": np.char.mod('%.2f', sharpe_ratio),
+        "Max Drawdown": np.char.add(np.char.mod('%.2f', max_drawdown), '%'),
+        "IRR": np.char.mod('%.2f', irr),
+        "Portfolio Value": np.char.mod('%.2f', final_portfolio_value),
+    }
+
+
+def run_batch_sweep(stock_data, strategy_name, valid_combinations, initial_portfolio_value,
+                    indicator_cache=None, max_matrix_bytes=DEFAULT_MAX_MATRIX_BYTES):
+    from components.indicator_cache import IndicatorCache
+    from components.formulas import metrics_context
+    """Score every combination of a grid in one pass over the bars."""
+    indicator_cache = indicator_cache or IndicatorCache(stock_data)
+    prices = indicator_cache.prices
+    context = metrics_context(stock_data)  # Returns std dev, peak and trough, as in calculate_metrics
+
+    # Split the grid so combos x bars matrices stay under the memory cap
+    chunk_size = max(1, int(max_matrix_bytes // (len(stock_data) * BYTES_PER_CELL)))
+    results = []
+    chunks = 0
+    for chunk_start in range(0, len(valid_combinations), chunk_size):
+        combinations = valid_combinations[chunk_start:chunk_start + chunk_size]
+        signals = build_signal_matrix(indicator_cache, strategy_name, combinations)
+        trade_size = np.array([params["Trade Size"] for params in combinations])
+        replay = simulate_long_only_grid(prices, signals, trade_size, initial_portfolio_value)
+        metrics = grid_metrics(prices, stock_data.index, replay, initial_portfolio_value, context)
+        results.extend(
+            {**params, **{name: str(values[row]) for name, values in metrics.items()}}
+            for row, params in enumerate(combinations)
+        )
+        chunks += 1
+
+    return results, {"chunks": chunks, "chunk_size": chunk_size}
@@ -0,0 +1,334 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Offline benchmark suite for the hot paths, on synthetic OHLCV of configurable length:
+#   strategy_run - one parameter combination of every strategy, per engine
+#   sweep        - a sample of every strategy's grid on the worker pool at each worker count
+#                  (wall time and combos/sec), and the vectorized and batch engines in process
+#   metrics      - metrics_context per dataset, cash flows + metrics per combination
+#   fetch        - fetch_stock_data from a price store on disk, cold and from the frame cache
+#   chart        - drawing one strategy chart to PNG
+# Results are written as JSON keyed "<section>/<name>/<bars>"; --baseline compares them with an
+# earlier file and exits with status 1 when a benchmark got slower than --tolerance allows.
+#
+#   python -m components.benchmark --bars 1000,10000 --workers 1,2,4 --output bench.json
+#   python -m components.benchmark --bars 1000,10000 --baseline bench.json --output new.json
+BENCHMARK_SECTIONS = ('strategy_run', 'sweep', 'metrics', 'fetch', 'chart')
+BENCHMARK_ENGINES = ('backtrader', 'vectorized')
+DEFAULT_BARS = (1000, 10000)
+DEFAULT_TOLERANCE = 0.25
+INITIAL_PORTFOLIO_VALUE = 100000
+TRADE_SIZE = 30
+# Daily bars reach back before 1677 (the datetime64 limit) past this, so longer histories are hourly
+MAX_DAILY_BARS = 50000
+SYNTHETIC_END = pd.Timestamp('2025-12-31')
+
+
+def synthetic_prices(bars, seed=0):
+    """A random-walk OHLCV frame of bars rows, shaped like the price store's frames."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+    open_price = close * (1 + rng.normal(0, 0.005, bars))
+    high = np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.007, bars)))
+    low = np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.007, bars)))
+    volume = rng.integers(100000, 1000000, bars).astype(float)
+    freq = 'B' if bars <= MAX_DAILY_BARS else 'h'
+    index = pd.date_range(end=SYNTHETIC_END, periods=bars, freq=freq, name='datetime')
+    return pd.DataFrame(
+        {'close': close, 'high': high, 'low': low, 'open': open_price, 'volume': volume}, index=index
+    )
+
+
+def sample_combinations(strategy_name, count):
+    from components.parameter_combinations import get_valid_combinations
+    # Evenly spaced over the grid, so fast and slow corners are both represented
+    combinations = get_valid_combinations(strategy_name, TRADE_SIZE)
+    if count >= len(combinations):
+        return combinations
+    return [combinations[int(i)] for i in np.linspace(0, len(combinations) - 1, count)]
+
+
+def time_call(fn, repeat=3, number=1):
+    """Time number calls of fn, repeat times; return seconds per call (min, median of the repeats)."""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start_time) / number)
+    return {"seconds": min(timings), "median": statistics.median(timings), "repeat": repeat, "number": number}
+
+
+def bench_strategy_runs(stock_data, strategies, repeat):
+    import backtrader as bt
+    from components.backtrader_sync import run_backtrader_sync
+    from components.vectorized_sync import run_vectorized_sync
+    from components.formulas import metrics_context
+    """Seconds per single combination of each strategy, per engine."""
+    results = {}
+    context = metrics_context(stock_data)
+    data_feed = bt.feeds.PandasData(dataname=stock_data)
+    runs = {
+        # A single run computes its own indicators, as a /backtest replay would
+        'backtrader': lambda name, params: run_backtrader_sync(
+            data_feed, name, params, INITIAL_PORTFOLIO_VALUE, stock_data, context
+        ),
+        'vectorized': lambda name, params: run_vectorized_sync(stock_data, name, params, INITIAL_PORTFOLIO_VALUE),
+    }
+    for strategy_name in strategies:
+        params = sample_combinations(strategy_name, 3)[1]
+        for engine in BENCHMARK_ENGINES:
+            results[f"{engine}/{strategy_name}"] = time_call(lambda: runs[engine](strategy_name, params), repeat)
+    return results
+
+
+def bench_sweeps(stock_data, strategies, worker_counts, combos):
+    from components.run_sweep import dispatch_sweeps
+    from components.batch_sweep import run_batch_sweep
+    from components.indicator_cache import IndicatorCache
+    from components.formulas import metrics_context
+    from components.vectorized_sync import run_vectorized_sync
+    from components.shared_prices import shared_prices
+    from components.worker_pool import start_worker_pool, shutdown_worker_pool
+    """Wall time and combos/sec of a sample of every strategy's grid, per engine and worker count."""
+    samples = {strategy_name: sample_combinations(strategy_name, combos) for strategy_name in strategies}
+    total = sum(len(combinations) for combinations in samples.values())
+    results = {}
+
+    def record(name, seconds):
+        results[name] = {"seconds": seconds, "combos": total, "combos_per_sec": round(total / seconds, 2)}
+
+    for workers in worker_counts:
+        # A fresh pool per count; startup is not timed, as the application starts it once
+        shutdown_worker_pool()
+        executor = start_worker_pool(workers)
+        start_time = time.perf_counter()
+        with shared_prices(stock_data) as price_handle:
+            sweeps = [(name, name, combinations, price_handle) for name, combinations in samples.items()]
+            for _ in dispatch_sweeps(executor, sweeps, INITIAL_PORTFOLIO_VALUE):
+                pass
+        record(f"backtrader/workers={workers}", time.perf_counter() - start_time)
+    shutdown_worker_pool()
+
+    # The NumPy engines run in the request's process and share one indicator cache per sweep
+    start_time = time.perf_counter()
+    for strategy_name, combinations in samples.items():
+        indicator_cache = IndicatorCache(stock_data)
+        context = metrics_context(stock_data)
+        for params in combinations:
+            run_vectorized_sync(stock_data, strategy_name, params, INITIAL_PORTFOLIO_VALUE, indicator_cache, context)
+    record("vectorized/workers=0", time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    for strategy_name, combinations in samples.items():
+        run_batch_sweep(stock_data, strategy_name, combinations, INITIAL_PORTFOLIO_VALUE, IndicatorCache(stock_data))
+    record("batch/workers=0", time.perf_counter() - start_time)
+    return results
+
+
+def synthetic_trade_log(stock_data, trades=100, seed=0):
+    # Alternating runs of buys closed by a sell, on random bars in date order
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(stock_data), size=min(trades, len(stock_data)), replace=False))
+    close = stock_data['close'].to_numpy()
+    log_data = []
+    for order, row in enumerate(rows.tolist()):
+        kind = 'SELL' if order % 3 == 2 else 'BUY'
+        log_data.append({
+            'Date': stock_data.index[row].date(), 'Type': kind, 'Price': float(close[row]),
+            'Size': TRADE_SIZE if kind == 'BUY' else -2 * TRADE_SIZE,
+        })
+    return log_data
+
+
+def bench_metrics(stock_data, repeat):
+    import numpy_financial as npf
+    from types import SimpleNamespace
+    from components.formulas import metrics_context, calculate_metrics, calculate_cash_flows
+    """Seconds per metrics_context (per dataset) and per combination's cash flows, IRR and metrics."""
+    context = metrics_context(stock_data)
+    strategy = SimpleNamespace(log_data=synthetic_trade_log(stock_data))
+
+    def combo_metrics():
+        cash_flows = calculate_cash_flows(strategy.log_data, INITIAL_PORTFOLIO_VALUE, stock_data, context)
+        npf.irr(cash_flows)
+        calculate_metrics(strategy, INITIAL_PORTFOLIO_VALUE, cash_flows[-1], stock_data, cash_flows, context)
+
+    return {
+        "metrics_context": time_call(lambda: metrics_context(stock_data), repeat, number=20),
+        "combo_metrics": time_call(combo_metrics, repeat, number=200),
+    }
+
+
+def bench_fetch(stock_data, repeat):
+    from components import fetch_data
+    from components.price_store import write_prices, mark_checked
+    from components.frame_cache import clear_frame_cache
+    """Seconds per fetch_stock_data of a stored symbol, read from disk and from the frame cache."""
+    symbol, interval = 'BENCH', '1d'
+    upload_folder = fetch_data.UPLOAD_FOLDER
+    with tempfile.TemporaryDirectory() as folder:
+        write_prices(stock_data, folder, symbol, interval)
+        # Checked just now, so loading it never tries to download
+        mark_checked(folder, symbol, interval)
+        fetch_data.UPLOAD_FOLDER = folder
+        try:
+            def cold():
+                clear_frame_cache()
+                fetch_data.fetch_stock_data(symbol, stock_data.index[0], interval)
+
+            results = {"cold": time_call(cold, repeat, number=5)}
+            results["frame_cache"] = time_call(
+                lambda: fetch_data.fetch_stock_data(symbol, stock_data.index[0], interval), repeat, number=50
+            )
+        finally:
+            fetch_data.UPLOAD_FOLDER = upload_folder
+            clear_frame_cache()
+    return results
+
+
+def bench_charts(stock_data, strategies, repeat):
+    from components.charts import render_chart
+    """Seconds to replay and draw one chart of each strategy to PNG."""
+    results = {}
+    for strategy_name in strategies:
+        params = sample_combinations(strategy_name, 3)[1]
+        results[strategy_name] = time_call(
+            lambda: render_chart(stock_data, strategy_name, INITIAL_PORTFOLIO_VALUE, params, 'png'), repeat
+        )
+    return results
+
+
+def run_benchmarks(bars_list, sections=BENCHMARK_SECTIONS, strategies=None, worker_counts=(1,), combos=16,
+                   repeat=3, seed=0):
+    from strategies import strategy_tree
+    from components.worker_pool import POOL_WORKERS
+    """Run the sections on synthetic histories of each length in bars_list and return the report."""
+    unknown = sorted(set(sections) - set(BENCHMARK_SECTIONS))
+    if unknown:
+        raise ValueError(f"Unknown benchmark sections {unknown}. Choose from {BENCHMARK_SECTIONS}.")
+    strategies = list(strategies or strategy_tree)
+    for strategy_name in strategies:
+        if strategy_name not in strategy_tree:
+            raise ValueError(f"Strategy '{strategy_name}' not found in the strategy tree.")
+
+    results = {}
+    for bars in bars_list:
+        stock_data = synthetic_prices(bars, seed)
+        for section in sections:
+            print(f"Benchmarking {section} on {bars} bars")
+            start_time = time.perf_counter()
+            if section == 'strategy_run':
+                timings = bench_strategy_runs(stock_data, strategies, repeat)
+            elif section == 'sweep':
+                timings = bench_sweeps(stock_data, strategies, worker_counts, combos)
+            elif section == 'metrics':
+                timings = bench_metrics(stock_data, repeat)
+            elif section == 'fetch':
+                timings = bench_fetch(stock_data, repeat)
+            else:
+                timings = bench_charts(stock_data, strategies, repeat)
+            for name, timing in timings.items():
+                results[f"{section}/{name}/{bars}"] = timing
+            print(f"Benchmarked {section} on {bars} bars in {time.perf_counter() - start_time:.2f}s")
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec='seconds'),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pool_workers": POOL_WORKERS,
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "config": {
+            "bars": list(bars_list), "sections": list(sections), "strategies": strategies,
+            "workers": list(worker_counts), "combos": combos, "repeat": repeat, "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare_reports(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare the benchmarks two reports share; return {name: {baseline, current, ratio, status}}."""
+    comparison = {}
+    for name, timing in report["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["seconds"], timing["seconds"]
+        ratio = after / before if before > 0 else float('inf')
+        if ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 / (1 + tolerance):
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        comparison[name] = {"baseline": before, "current": after, "ratio": round(ratio, 3), "status": status}
+    return comparison
+
+
+def print_report(report, comparison=None):
+    width = max((len(name) for name in report["results"]), default=0)
+    for name, timing in report["results"].items():
+        line = f"{name:<{width}}  {timing['seconds'] * 1000:12.3f} ms"
+        if "combos_per_sec" in timing:
+            line += f"  {timing['combos_per_sec']:10.2f} combos/s"
+        if comparison and name in comparison:
+            line += f"  x{comparison[name]['ratio']:<6} {comparison[name]['status']}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest hot paths on synthetic prices.")
+    parser.add_argument('--bars', default=','.join(str(bars) for bars in DEFAULT_BARS),
+                        help="Comma-separated history lengths, e.g. 1000,10000,100000")
+    parser.add_argument('--sections', default=','.join(BENCHMARK_SECTIONS),
+                        help=f"Comma-separated sections out of {','.join(BENCHMARK_SECTIONS)}")
+    parser.add_argument('--strategies', default='', help="Comma-separated strategies (all by default)")
+    parser.add_argument('--workers', default='1', help="Comma-separated worker counts for the sweep section")
+    parser.add_argument('--combos', type=int, default=16, help="Combinations per strategy in the sweep section")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed repeats; the fastest is reported")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--baseline', help="Compare with the JSON report in this file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before a benchmark counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        [int(bars) for bars in args.bars.split(',')],
+        sections=[section for section in args.sections.split(',') if section],
+        strategies=[name for name in args.strategies.split(',') if name],
+        worker_counts=[int(workers) for workers in args.workers.split(',')],
+        combos=args.combos, repeat=args.repeat, seed=args.seed,
+    )
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare_reports(report, baseline, args.tolerance)
+        report["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "results": comparison}
+    print_report(report, comparison)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark report written to {args.output}")
+    regressions = sorted(name for name, result in (comparison or {}).items() if result["status"] == 'regression')
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed beyond {args.tolerance:.0%}: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Strategy charts are drawn on demand instead of for every best-params replay.
+# A report carries a chart handle: the hash of the symbol, interval, price history fingerprint,
+# strategy, parameters and initial capital, registered here with the number of bars it covers.
+# GET /charts/<handle> replays those parameters on that history with the strategy's chart
+# drawing stop logic and caches the PNG or SVG in SQLite (BACKTEST_CHART_CACHE_PATH), evicting
+# the least recently used images beyond BACKTEST_CHART_CACHE_MB. The price store only ever
+# appends bars, so a handle stays renderable after new bars arrive; it is refused only when the
+# bars it was made on have changed.
+# A request with "chart": "inline" still gets the PNG base64-encoded in "Graph Img" as before.
+CHART_CACHE_PATH = os.environ.get('BACKTEST_CHART_CACHE_PATH', os.path.join('stock_data', 'chart_cache.sqlite'))
+CHART_CACHE_MAX_BYTES = int(float(os.environ.get('BACKTEST_CHART_CACHE_MB', 64)) * 1024 * 1024)
+# Handles are a few hundred bytes each; the oldest are forgotten past this many
+MAX_CHART_HANDLES = 50000
+CHART_MODES = ('handle', 'inline')
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+class StaleChart(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def open_store(path=None):
+    path = path or CHART_CACHE_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        with _schema_lock:
+            if path not in _schema_ready:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS charts ('
+                    'handle TEXT PRIMARY KEY, symbol TEXT, interval TEXT, bars INTEGER, fingerprint TEXT, '
+                    'strategy TEXT, params TEXT, initial_portfolio_value REAL, created REAL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS charts_created ON charts (created)')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS images ('
+                    'key TEXT PRIMARY KEY, handle TEXT, format TEXT, image BLOB, size INTEGER, last_used REAL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS images_last_used ON images (last_used)')
+                connection.commit()
+                _schema_ready.add(path)
+        # Commits on success and rolls back on error
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def chart_mode(data):
+    """Read how a request wants its chart: a handle to render later, or the PNG inline."""
+    mode = data.get('chart', 'handle')
+    if mode not in CHART_MODES:
+        raise ValueError(f"Chart mode '{mode}' not found. Choose one of {CHART_MODES}.")
+    return mode
+
+
+def chart_handle(symbol, interval, fingerprint, strategy_name, params, initial_portfolio_value):
+    identity = [symbol, interval, fingerprint, strategy_name, params, initial_portfolio_value]
+    return hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def register_chart(stock_data, strategy_name, initial_portfolio_value, params):
+    from components.indicator_cache import data_fingerprint
+    """Remember what a chart shows and return its {"handle", "url"}; nothing is drawn yet."""
+    symbol = stock_data.attrs.get('symbol')
+    if symbol is None:
+        return None  # Only stored price histories can be loaded again to draw the chart
+    interval = stock_data.attrs.get('interval')
+    fingerprint = data_fingerprint(stock_data)
+    handle = chart_handle(symbol, interval, fingerprint, strategy_name, params, initial_portfolio_value)
+    with open_store() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO charts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (handle, symbol, interval, len(stock_data), fingerprint, strategy_name, json.dumps(params),
+             initial_portfolio_value, time.time())
+        )
+        connection.execute(
+            'DELETE FROM charts WHERE handle IN '
+            '(SELECT handle FROM charts ORDER BY created DESC LIMIT -1 OFFSET ?)', (MAX_CHART_HANDLES,)
+        )
+    return {"handle": handle, "url": f"/charts/{handle}"}
+
+
+def chart_prices(symbol, interval, bars, fingerprint):
+    from components.fetch_data import UPLOAD_FOLDER
+    from components.frame_cache import cached_prices
+    from components.indicator_cache import data_fingerprint
+    from components.price_store import has_prices
+    # The stored history the chart was made on; nothing is downloaded to draw a chart
+    if not has_prices(UPLOAD_FOLDER, symbol, interval):
+        raise StaleChart(f"No stored prices for {symbol} at {interval} interval.")
+    stock_data = cached_prices(UPLOAD_FOLDER, symbol, interval)
+    if len(stock_data) < bars or data_fingerprint(stock_data.iloc[:bars]) != fingerprint:
+        raise StaleChart(f"The price history of {symbol} this chart was made on has changed.")
+    return stock_data.iloc[:bars]
+
+
+def render_chart(stock_data, strategy_name, initial_portfolio_value, params, fmt):
+    import backtrader as bt
+    from components.strategy_class import create_strategy_class
+    """Replay params on stock_data with the chart-drawing stop logic and return the image bytes."""
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=stock_data))
+    cerebro.broker.setcash(initial_portfolio_value)
+    Graph = create_strategy_class(strategy_name=strategy_name, stop_logic='stop_logic')
+    cerebro.addstrategy(Graph, params=params, chart_format=fmt)
+    return cerebro.run()[0].graph_image
+
+
+def evict(connection, max_bytes=None):
+    from components.telemetry import info
+    max_bytes = CHART_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM images').fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    # Drop the least recently used images until the cache is back to 90% of the cap
+    target = total - int(max_bytes * 0.9)
+    freed = 0
+    evicted = []
+    for key, size in connection.execute('SELECT key, size FROM images ORDER BY last_used'):
+        evicted.append(key)
+        freed += size
+        if freed >= target:
+            break
+    connection.executemany('DELETE FROM images WHERE key = ?', [(key,) for key in evicted])
+    info(f"Chart cache evicted {len(evicted)} images ({freed} bytes)")
+    return len(evicted)
+
+
+def chart_image(handle, fmt='png'):
+    from components.worker_pool import submit_to_pool
+    from components.telemetry import run_traced, collect, count, info
+    """Return the chart of a handle as bytes, drawing it on a miss, or None for an unknown handle."""
+    key = f"{handle}.{fmt}"
+    with open_store() as connection:
+        row = connection.execute('SELECT image FROM images WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            connection.execute('UPDATE images SET last_used = ? WHERE key = ?', (time.time(), key))
+            count('cache_hits', cache='chart')
+            return row[0]
+        spec = connection.execute(
+            'SELECT symbol, interval, bars, fingerprint, strategy, params, initial_portfolio_value '
+            'FROM charts WHERE handle = ?', (handle,)
+        ).fetchone()
+    if spec is None:
+        return None
+    count('cache_misses', cache='chart')
+    symbol, interval, bars, fingerprint, strategy_name, params, initial_portfolio_value = spec
+    stock_data = chart_prices(symbol, interval, bars, fingerprint)
+
+    # Drawn on the shared pool: pyplot is not thread safe and the workers have matplotlib loaded
+    start_time = time.time()
+    image = collect(submit_to_pool(
+        run_traced, render_chart, stock_data, strategy_name, initial_portfolio_value, json.loads(params), fmt
+    ))
+    info(f"Rendered {fmt} chart of {strategy_name} on {symbol} in {time.time() - start_time:.2f}s")
+    with open_store() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)',
+            (key, handle, fmt, image, len(image), time.time())
+        )
+        evict(connection)
+    return image
@@ -0,0 +1,193 @@
+import os
+import random
+import threading
+import time
+import pandas as pd
+
+# Market-data providers behind fetch_stock_data. A provider downloads many symbols in one
+# call and returns {symbol: frame} with the columns normalised by normalise_prices; symbols
+# without bars are left out. BACKTEST_DATA_PROVIDER picks the provider from data_providers:
+# 'yahoo' downloads with yfinance over one pooled HTTP session, 'local' replays frames recorded
+# in BACKTEST_LOCAL_DATA_DIR so tests and load tests run offline. Setting
+# BACKTEST_RECORD_DATA_DIR records every download there in the layout the local provider reads.
+DATA_PROVIDER = os.environ.get('BACKTEST_DATA_PROVIDER', 'yahoo')
+LOCAL_DATA_DIR = os.environ.get('BACKTEST_LOCAL_DATA_DIR', os.path.join('stock_data', 'recorded'))
+RECORD_DATA_DIR = os.environ.get('BACKTEST_RECORD_DATA_DIR')
+PROVIDER_RETRIES = int(os.environ.get('BACKTEST_PROVIDER_RETRIES', 3))
+PROVIDER_BACKOFF_SECONDS = float(os.environ.get('BACKTEST_PROVIDER_BACKOFF', 1.0))
+# Symbols per request and connections kept open to the provider
+PROVIDER_BATCH_SIZE = int(os.environ.get('BACKTEST_PROVIDER_BATCH_SIZE', 50))
+PROVIDER_CONNECTIONS = int(os.environ.get('BACKTEST_PROVIDER_CONNECTIONS', 10))
+
+# Provider column names and the names the price store uses
+PRICE_COLUMNS = {
+    'adj close': 'adj_close',
+    'adj_close': 'adj_close',
+    'close': 'close',
+    'high': 'high',
+    'low': 'low',
+    'open': 'open',
+    'volume': 'volume',
+}
+REQUIRED_COLUMNS = ['close', 'high', 'low', 'open', 'volume']
+# Stored column order, as older versions wrote it
+COLUMN_ORDER = ['adj_close', 'close', 'high', 'low', 'open', 'volume']
+
+
+def normalise_prices(raw, stock_symbol=None):
+    """Rename, validate and type the columns of one symbol's raw bars."""
+    if isinstance(raw.columns, pd.MultiIndex):
+        # yfinance puts the ticker on one level of the columns, on either side of the price field
+        level = next(
+            (level for level in range(raw.columns.nlevels) if stock_symbol in raw.columns.get_level_values(level)),
+            None,
+        )
+        if level is None:
+            raise ValueError(f"Downloaded data has no columns for {stock_symbol}.")
+        raw = raw.xs(stock_symbol, axis=1, level=level)
+    renamed = {}
+    for column in raw.columns:
+        name = PRICE_COLUMNS.get(str(column).strip().lower())
+        if name is None:
+            continue
+        if name in renamed.values():
+            raise ValueError(f"Downloaded data for {stock_symbol} has more than one '{name}' column.")
+        renamed[column] = name
+    missing = [column for column in REQUIRED_COLUMNS if column not in renamed.values()]
+    if missing:
+        raise ValueError(f"Downloaded data for {stock_symbol} is missing columns {missing}: {list(raw.columns)}")
+
+    stock_data = raw[list(renamed)].rename(columns=renamed)
+    stock_data = stock_data[[column for column in COLUMN_ORDER if column in stock_data.columns]]
+    stock_data = stock_data.apply(pd.to_numeric, errors='coerce')
+    # Rows the provider filled with NaN for a day without trades are not bars
+    stock_data = stock_data.dropna(subset=['close'])
+    stock_data.index = pd.DatetimeIndex(stock_data.index, name='datetime')
+    return stock_data
+
+
+def with_retries(download, description):
+    from components.telemetry import warning
+    # Exponential backoff with jitter between attempts; the last error is raised
+    for attempt in range(PROVIDER_RETRIES + 1):
+        try:
+            return download()
+        except Exception as e:
+            if attempt == PROVIDER_RETRIES:
+                raise
+            delay = PROVIDER_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random() / 2)
+            warning(f"{description} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def batches(symbols):
+    for start in range(0, len(symbols), PROVIDER_BATCH_SIZE):
+        yield symbols[start:start + PROVIDER_BATCH_SIZE]
+
+
+def record_prices(frames, folder, interval):
+    os.makedirs(folder, exist_ok=True)
+    for stock_symbol, stock_data in frames.items():
+        stock_data.to_csv(os.path.join(folder, f"{stock_symbol}_{interval}.csv"))
+
+
+class YahooProvider:
+    name = 'yahoo'
+    _session = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def session(cls):
+        import requests
+        # One session for every download, so connections to Yahoo are reused across requests
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=PROVIDER_CONNECTIONS, pool_maxsize=PROVIDER_CONNECTIONS
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                cls._session = session
+        return cls._session
+
+    def download_batch(self, symbols, start, interval):
+        import yfinance as yf
+        import yfinance.shared as yf_shared
+        from components.telemetry import warning
+        raw = yf.download(
+            symbols, start=start, interval=interval, group_by='ticker', threads=True,
+            progress=False, session=self.session(),
+        )
+        # yfinance logs failed tickers instead of raising. Only a batch where every symbol failed is
+        # retried (e.g. a dropped connection); symbols failing on their own are reported and skipped
+        failed = {symbol: error for symbol, error in getattr(yf_shared, '_ERRORS', {}).items() if symbol in symbols}
+        if failed and len(failed) == len(symbols):
+            raise ConnectionError(f"Yahoo returned errors for {failed}")
+        frames = {}
+        for stock_symbol in symbols:
+            if stock_symbol in failed:
+                warning(f"Yahoo returned no data for {stock_symbol}: {failed[stock_symbol]}")
+                continue
+            stock_data = normalise_prices(raw, stock_symbol) if not raw.empty else raw
+            if not stock_data.empty:
+                frames[stock_symbol] = stock_data
+        return frames
+
+    def download(self, symbols, start, interval):
+        """Return {symbol: normalised bars from start} for the symbols with data."""
+        frames = {}
+        for batch in batches(list(symbols)):
+            frames.update(with_retries(
+                lambda: self.download_batch(batch, start, interval), f"Yahoo download of {len(batch)} symbols"
+            ))
+        return frames
+
+
+class LocalProvider:
+    # Replays <symbol>_<interval>.csv files recorded with record_prices (or raw yfinance CSVs)
+    name = 'local'
+
+    def __init__(self, folder=None):
+        self.folder = folder or LOCAL_DATA_DIR
+
+    def download(self, symbols, start, interval):
+        from components.telemetry import warning
+        """Return {symbol: normalised bars from start} for the symbols with recorded data."""
+        frames = {}
+        for stock_symbol in symbols:
+            path = os.path.join(self.folder, f"{stock_symbol}_{interval}.csv")
+            if not os.path.exists(path):
+                warning(f"No recorded data for {stock_symbol} in {self.folder}")
+                continue
+            stock_data = normalise_prices(pd.read_csv(path, index_col=0, parse_dates=True), stock_symbol)
+            index = stock_data.index
+            start_at = pd.Timestamp(start)
+            if index.tz is not None and start_at.tzinfo is None:
+                start_at = start_at.tz_localize(index.tz)
+            stock_data = stock_data[index >= start_at]
+            if not stock_data.empty:
+                frames[stock_symbol] = stock_data
+        return frames
+
+
+data_providers = {
+    'yahoo': YahooProvider,
+    'local': LocalProvider,
+}
+
+
+def get_provider(name=None):
+    name = name or DATA_PROVIDER
+    if name not in data_providers:
+        raise ValueError(f"Data provider '{name}' not found. Choose one of {list(data_providers)}.")
+    return data_providers[name]()
+
+
+def download_prices(symbols, start, interval, provider=None):
+    """Download symbols through the configured provider, recording them when asked to."""
+    provider = provider or get_provider()
+    frames = provider.download(list(symbols), start, interval)
+    if RECORD_DATA_DIR and provider.name != 'local':
+        record_prices(frames, RECORD_DATA_DIR, interval)
+    return frames
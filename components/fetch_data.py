@@ -1,44 +1,126 @@
-import yfinance as yf
+import contextlib
 import os
+import time
 import pandas as pd
+from components.price_store import (
+    has_prices, write_prices, append_prices, migrate_csv, lock_prices, read_meta, store_path,
+    mark_checked,
+)
+from components.data_provider import download_prices
+from components.frame_cache import cached_prices, frame_cache_report
+from components.market_calendar import symbol_exchange, is_fresh, complete_bars
+from components.telemetry import observe, debug, info, warning
 
 UPLOAD_FOLDER = "stock_data"  # Folder to store downloaded stock data
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)  # Ensure the folder exists
+# A stale history is not downloaded again until this many seconds after the last download, so a
+# session the calendar does not know was closed costs one empty download per TTL, not one per request
+FRESHNESS_TTL = float(os.environ.get('BACKTEST_DATA_TTL_SECONDS', 900))
 
 def fetch_stock_data(stock_symbol, start_date, interval):
+    frames, errors = fetch_many_stock_data([stock_symbol], start_date, interval)
+    if stock_symbol in errors:
+        raise errors[stock_symbol]
+    return frames[stock_symbol]
+
+def fetch_many_stock_data(stock_symbols, start_date, interval):
+    """Load or download every symbol, returning ({symbol: frame}, {symbol: exception})."""
+    start_time = time.perf_counter()
+    frames, errors = {}, {}
+    with contextlib.ExitStack() as locks:
+        # Concurrent requests for a symbol wait here; the first one downloads and the rest find the
+        # data fresh. Locks are always taken in sorted order, so overlapping batches cannot deadlock.
+        symbols = sorted(set(stock_symbols))
+        for stock_symbol in symbols:
+            locks.enter_context(lock_prices(UPLOAD_FOLDER, stock_symbol, interval))
+
+        # Symbols to download, grouped by whether they are new to the store
+        downloads = {}
+        for stock_symbol in symbols:
+            try:
+                stock_data, download_from = load_stored(stock_symbol, start_date, interval)
+            except Exception as e:
+                errors[stock_symbol] = e
+                continue
+            if stock_data is not None:
+                frames[stock_symbol] = stock_data
+            if download_from is not None:
+                # Stored symbols are downloaded together from the oldest last bar; the overlap is skipped on append
+                group = 'new' if stock_data is None else 'append'
+                start, group_symbols = downloads.get(group, (download_from, []))
+                downloads[group] = (min(start, download_from), group_symbols + [stock_symbol])
+
+        for start, group_symbols in downloads.values():
+            info(f"Downloading new data for {group_symbols} with {interval} interval from {start}")
+            try:
+                downloaded = download_prices(group_symbols, start, interval)
+            except Exception as e:
+                for stock_symbol in group_symbols:
+                    errors[stock_symbol] = e
+                continue
+            for stock_symbol in group_symbols:
+                try:
+                    frames[stock_symbol] = store_download(stock_symbol, start_date, interval, downloaded.get(stock_symbol))
+                except Exception as e:
+                    errors[stock_symbol] = e
+    debug(f"Frame cache: {frame_cache_report()}")
+
+    for stock_symbol, e in errors.items():
+        frames.pop(stock_symbol, None)
+        warning(f"Could not fetch {stock_symbol}: {e}")
+    for stock_symbol, stock_data in frames.items():
+        # Lets caches tie results to the symbol the data belongs to
+        stock_data.attrs['symbol'] = stock_symbol
+        stock_data.attrs['interval'] = interval
+    observe('fetch', time.perf_counter() - start_time)
+    return frames, errors
+
+def stored_check(stock_symbol, interval):
+    # When the store last asked the provider for new bars
+    return read_meta(store_path(UPLOAD_FOLDER, stock_symbol, interval)).get("checked_at", 0)
+
+def load_stored(stock_symbol, start_date, interval):
+    """Return the stored frame (None if there is none) and the date to download from (None if fresh)."""
+    exchange = symbol_exchange(stock_symbol)
     csv_path = os.path.join(UPLOAD_FOLDER, f"{stock_symbol}_{interval}.csv")
-    
-    # Check if file already exists
-    if os.path.exists(csv_path):
-        print(f"Loading data from {csv_path}")
-        stock_data = pd.read_csv(csv_path, index_col=0, parse_dates=True)
-
-        last_date = stock_data.index[-1]
-        print(f'Last date in the existing data: {last_date}')
-        # Get today's date
-        today_date = pd.to_datetime("today").normalize()
-        if last_date != today_date:
-            # Download new data from the last date to the present
-            print(f"Downloading new data for {stock_symbol} from {last_date} to the current date")
-            new_data = yf.download(stock_symbol, start=last_date, interval=interval)
-            # Clean and format the new data
-            new_data.iloc[:, 1:] = new_data.iloc[:, 1:].apply(pd.to_numeric, errors='coerce')
-            new_data.columns = ['adj_close', 'close', 'high', 'low', 'open', 'volume'] if 'Adj Close' in new_data.columns else ['close', 'high', 'low', 'open', 'volume']
-            new_data.index.name = 'datetime'
-            
-            # Append the new data
-            stock_data = pd.concat([stock_data, new_data])
-            print(f"Appended new data for {stock_symbol}")
+    if not has_prices(UPLOAD_FOLDER, stock_symbol, interval) and os.path.exists(csv_path):
+        # Data cached by older versions is moved into the columnar store once
+        migrate_csv(csv_path, UPLOAD_FOLDER, stock_symbol, interval)
+
+    # Check if data already exists
+    if not has_prices(UPLOAD_FOLDER, stock_symbol, interval):
+        return None, pd.Timestamp(start_date)
+
+    debug(f"Loading data for {stock_symbol} from the price store (cached in memory while unchanged)")
+    stock_data = cached_prices(UPLOAD_FOLDER, stock_symbol, interval)
+    last_date = stock_data.index[-1] if len(stock_data) else pd.Timestamp(start_date)
+    debug(f'Last date in the existing data: {last_date}')
+    if len(stock_data) and is_fresh(last_date, interval, exchange):
+        info(f"Data for {stock_symbol} is up to date with the last {exchange} session.")
+        return stock_data, None
+    if time.time() - stored_check(stock_symbol, interval) < FRESHNESS_TTL:
+        info(f"Data for {stock_symbol} was checked less than {FRESHNESS_TTL:.0f}s ago; not downloading again.")
+        return stock_data, None
+    # Download new data from the day of the last bar to the present
+    return stock_data, pd.Timestamp(last_date).tz_localize(None).normalize()
+
+def store_download(stock_symbol, start_date, interval, new_data):
+    """Save downloaded bars to the price store and return the stored frame."""
+    exchange = symbol_exchange(stock_symbol)
+    if has_prices(UPLOAD_FOLDER, stock_symbol, interval):
+        if new_data is None:
+            mark_checked(UPLOAD_FOLDER, stock_symbol, interval)
+            info(f"No new data available for {stock_symbol}.")
         else:
-            print(f"No new data available for {stock_symbol}.")
-        
-    else:
-        # If not, download from Yahoo Finance
-        print(f"Downloading new data for {stock_symbol} with {interval} interval")
-        stock_data = yf.download(stock_symbol, start=start_date, interval=interval)
-        stock_data.iloc[:, 1:] = stock_data.iloc[:, 1:].apply(pd.to_numeric, errors='coerce')
-        stock_data.columns = ['adj_close', 'close', 'high', 'low', 'open', 'volume'] if 'Adj Close' in stock_data.columns else ['close', 'high', 'low', 'open', 'volume']
-        stock_data.index.name = 'datetime'
-        stock_data.to_csv(csv_path, index=True) # Save to CSV for future use
-    
-    return stock_data
\ No newline at end of file
+            # Only finished bars newer than the stored ones are appended, so the overlapping bar is skipped
+            added = append_prices(complete_bars(new_data, interval, exchange), UPLOAD_FOLDER, stock_symbol, interval)
+            info(f"Appended {added} new bars for {stock_symbol}" if added else f"No new data available for {stock_symbol}.")
+        # Maps the longer history, or serves the unchanged one from memory
+        return cached_prices(UPLOAD_FOLDER, stock_symbol, interval)
+
+    if new_data is None:
+        raise ValueError(f"No data available for {stock_symbol} from {start_date} at {interval} interval.")
+    stock_data = complete_bars(new_data, interval, exchange)
+    write_prices(stock_data, UPLOAD_FOLDER, stock_symbol, interval) # Save to the price store for future use
+    # Serve the stored bars, deduplicated and memory-mapped like every later load
+    return cached_prices(UPLOAD_FOLDER, stock_symbol, interval)
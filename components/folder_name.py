@@ -1 +0,0 @@
-UPLOAD_FOLDER = 'static/files'
\ No newline at end of file
@@ -1,150 +1,135 @@
 import pandas as pd
 import numpy as np
 
+# Performance metrics for one backtest run.
+# The order log is turned into NumPy arrays once and replayed with cumulative sums, and
+# everything that only depends on the price history (returns std dev, peak and trough) is
+# computed once per dataset by metrics_context, so a combo costs O(trades) whatever the
+# length of the history. The cumulative sums add the orders in the same sequence as a
+# running total would, so the values are identical to the bar-by-bar bookkeeping.
+
+
+def metrics_context(stock_data):
+    """Per-dataset quantities shared by every run on stock_data."""
+    close_price = stock_data['close']
+    index = stock_data.index.to_numpy(dtype='datetime64[ns]')
+    # Get the dates corresponding to peak and trough
+    peak_date = close_price.idxmax()  # Date of the peak value
+    trough_date = close_price.idxmin()  # Date of the trough value
+    # The first bar carrying each date gives its price, as a label lookup would
+    peak_row = int(np.flatnonzero(index == np.datetime64(peak_date, 'ns'))[0])
+    trough_row = int(np.flatnonzero(index == np.datetime64(trough_date, 'ns'))[0])
+    return {
+        "std_dev": close_price.pct_change().std() * np.sqrt(252),  # Annualized std dev
+        "final_close": float(close_price.iloc[-1]),
+        "peak_date": np.datetime64(peak_date, 'ns'),
+        "peak_row": peak_row,
+        "peak_close": float(close_price.iloc[peak_row]),
+        "trough_date": np.datetime64(trough_date, 'ns'),
+        "trough_row": trough_row,
+        "trough_close": float(close_price.iloc[trough_row]),
+    }
+
+
+def order_arrays(order_log_file):
+    # Column arrays of the order log: dates, fill prices, sizes and which orders are buys
+    dates = np.array([order['Date'] for order in order_log_file], dtype='datetime64[ns]')
+    prices = np.array([float(order['Price']) for order in order_log_file], dtype=float)
+    sizes = np.array([int(order['Size']) for order in order_log_file], dtype=np.int64)
+    is_buy = np.array([order['Type'] == 'BUY' for order in order_log_file], dtype=bool)
+    is_sell = np.array([order['Type'] == 'SELL' for order in order_log_file], dtype=bool)
+    return dates, prices, sizes, is_buy, is_sell
+
+
+def replay_orders(prices, sizes, is_buy, is_sell, initial_portfolio_value):
+    # Cash and shares after 0, 1, ..., n orders. A sell always closes the whole holding.
+    round_trip = np.concatenate(([0], np.cumsum(is_sell)))[:-1]
+    bought = np.where(is_buy, sizes, 0)
+    held = np.cumsum(bought)
+    # Shares bought before the current round trip started, so holdings restart at zero after a sell
+    sell_points = np.flatnonzero(is_sell)
+    reset = np.concatenate(([0], held[sell_points]))
+    shares = np.where(is_sell, 0, held - reset[round_trip])
+    shares_before = np.concatenate(([0], shares))[:-1]
+
+    cash_change = np.where(is_buy, -(prices * sizes), np.where(is_sell, prices * shares_before, 0.0))
+    cash = np.cumsum(np.concatenate(([float(initial_portfolio_value)], cash_change)))
+    return cash, np.concatenate(([0], shares))
+
 
 def calculate_portfolio_value(order_log_file, date_str, stock_data, cash_flows, initial_portfolio_value):
-    # Initialize variables for tracking cash and shares
-    cash = initial_portfolio_value
-    shares_owned = 0
-    
-    # Convert peak_date to a datetime object to compare with order dates
-    target_date = pd.to_datetime(date_str)
-    
-    # Iterate over each order in the order log and     filter trades before the peak date
-    for order in order_log_file:
-        order_date = pd.to_datetime(order['Date'])
-        # Process the order only if the order is before or on the peak date
-        if order_date <= target_date:
-            order_type = order['Type']
-            price = float(order['Price'])
-            size = int(order['Size'])
-            
-             # Adjust cash and shares based on the order type
-            if order_type == 'BUY':
-                cash -= price * size  # Decrease cash when buying
-                shares_owned += size  # Increase shares when buying
-            elif order_type == 'SELL':
-                cash += price * shares_owned  # Increase cash when selling
-                shares_owned = 0  # Decrease shares when selling
-        
-        # After processing orders, ensure price is defined
-    if 'price' not in locals():
-        # Fetch the price from stock data on the target date
-        if target_date in stock_data.index:
-            price = stock_data.loc[target_date, 'close']
-        else:
-            raise ValueError(f"Price data for target date {target_date} is not available.")
+    dates, prices, sizes, is_buy, is_sell = order_arrays(order_log_file)
+    cash, shares = replay_orders(prices, sizes, is_buy, is_sell, initial_portfolio_value)
+    target_date = np.datetime64(pd.to_datetime(date_str), 'ns')
+    # Orders on or before the target date; the log is in execution order
+    orders_done = int(np.searchsorted(dates, target_date, side='right'))
 
-        # After each trade, calculate the current portfolio value and append to cash_flows
-        portfolio_value = cash + (shares_owned * price)  # Cash + value of owned shares
-        cash_flows.append(portfolio_value)  # Append the updated portfolio value to cash flows
-    
-    # Get the final portfolio value (after the last order)
-    final_portfolio_value = cash + (shares_owned * stock_data['close'].iloc[-1])
-    cash_flows.append(final_portfolio_value)  # Append final portfolio value to cash flows
-    
-    # Now, find the price of the stock at the peak date
-    target_date_data = stock_data[stock_data.index == target_date]
-    
-    if not target_date_data.empty:
-        peak_price = target_date_data['close'].iloc[0]
-        portfolio_value_at_target = cash + (shares_owned * peak_price)
-        return portfolio_value_at_target
-    else:
+    index = stock_data.index.to_numpy(dtype='datetime64[ns]')
+    row = int(np.searchsorted(index, target_date, side='left'))
+    if row == len(index) or index[row] != target_date:
+        if not orders_done:
+            raise ValueError(f"Price data for target date {target_date} is not available.")
         return None
+    target_price = float(stock_data['close'].iloc[row])
+    return cash[orders_done] + (shares[orders_done] * target_price)
 
-    # Calculate performance metrics
-def calculate_metrics(strategy, initial_portfolio_value, final_portfolio_value, stock_data, cash_flows):
+
+# Calculate performance metrics
+def calculate_metrics(strategy, initial_portfolio_value, final_portfolio_value, stock_data, cash_flows, context=None):
+    context = context or metrics_context(stock_data)
 
     # Extract portfolio values and returns
     portfolio_values = final_portfolio_value
     risk_free_rate = 0.055
-    stock_data['Returns'] = stock_data['close'].pct_change()
-    std_dev = stock_data['Returns'].std() * np.sqrt(252)  # Annualized std dev
-    # print("standard deviation: ", f"{std_dev:.4f}%")
+    std_dev = context["std_dev"]
     mean_portfolio_return = (portfolio_values - initial_portfolio_value) / initial_portfolio_value * 100
-    # print('Mean Portfolio Return: ', f"{mean_portfolio_return:.2f}%")
     sharpe_ratio = (mean_portfolio_return - risk_free_rate) / std_dev
-    # print("sharpe ratio: ", f"{sharpe_ratio:.2f}")
 
-    # Win Rate
-    # Initialize variables
+    dates, prices, sizes, is_buy, is_sell = order_arrays(strategy.log_data)
+
+    # Win Rate: every sell is compared with the average price of the buys since the last sell
+    total_shares_traded = int(np.abs(sizes[is_buy]).sum())
     total_winning_shares = 0
-    total_shares_traded = 0
-
-    # Iterate through order logs to find buy and sell sequences
-    buy_orders = []
-    for log in strategy.log_data:
-        if log["Type"] == "BUY":
-            buy_orders.append(log)  # Store buy orders
-            total_shares_traded += abs(log["Size"])
-        elif log["Type"] == "SELL" and buy_orders:
-            # Calculate the average buy price
-            total_buy_cost = sum(buy["Price"] * buy["Size"] for buy in buy_orders)
-            # print('total_buy_cost: ', total_buy_cost)
-            total_buy_quantity = sum(buy["Size"] for buy in buy_orders)
-            # print('total_buy_quantity: ', total_buy_quantity)
-            average_buy_price = total_buy_cost / total_buy_quantity if total_buy_quantity > 0 else 0
-
-            shares_sold = abs(log["Size"])  # Convert negative size to positive
-            # Compare the sell price to the average buy price
-            if log["Price"] > average_buy_price:
-                total_winning_shares += shares_sold
-            
-            buy_orders = []
-    # print('wins: ', total_winning_shares)
-    # print('total: ', total_shares_traded)
-
-# Calculate the win rate
-    if total_shares_traded > 0 or total_winning_shares >0:
+    round_trip_start = 0
+    for sell in np.flatnonzero(is_sell).tolist():
+        buys = np.flatnonzero(is_buy[round_trip_start:sell]) + round_trip_start
+        round_trip_start = sell + 1
+        if not len(buys):
+            continue
+        # Running totals in order, so the average matches adding the buys one by one
+        total_buy_cost = np.cumsum(prices[buys] * sizes[buys])[-1]
+        total_buy_quantity = int(sizes[buys].sum())
+        average_buy_price = total_buy_cost / total_buy_quantity if total_buy_quantity > 0 else 0
+        # Compare the sell price to the average buy price
+        if prices[sell] > average_buy_price:
+            total_winning_shares += abs(int(sizes[sell]))
+
+    # Calculate the win rate
+    if total_shares_traded > 0 or total_winning_shares > 0:
         win_rate = total_winning_shares / total_shares_traded * 100
         win_rate_output = f"{win_rate:.2f}%"
     else:
         win_rate_output = "No Trades"
 
-    # Max DrawDown
-    close_price = stock_data['close']
-    # Get the dates corresponding to peak and trough
-    peak_date = close_price.idxmax()  # Date of the peak value
-    trough_date = close_price.idxmin()  # Date of the trough value
-    # peak_date_str = peak_date.strftime('%Y-%m-%d') # Convert peak date to string for comparison
-    # trough_date_str = trough_date.strftime('%Y-%m-%d') # Convert trough date to string for comparison
-    portfolio_value_at_peak = calculate_portfolio_value(strategy.log_data, peak_date, stock_data, cash_flows, initial_portfolio_value=initial_portfolio_value)
-    portfolio_value_at_trough = calculate_portfolio_value(strategy.log_data, trough_date, stock_data, cash_flows, initial_portfolio_value=initial_portfolio_value)
-    # print('portfolio value at peak: ',portfolio_value_at_peak)
-    # print('portfolio value at trough: ',portfolio_value_at_trough)
+    # Max DrawDown between the close price peak and trough
+    cash, shares = replay_orders(prices, sizes, is_buy, is_sell, initial_portfolio_value)
+    at_peak = int(np.searchsorted(dates, context["peak_date"], side='right'))
+    at_trough = int(np.searchsorted(dates, context["trough_date"], side='right'))
+    portfolio_value_at_peak = cash[at_peak] + (shares[at_peak] * context["peak_close"])
+    portfolio_value_at_trough = cash[at_trough] + (shares[at_trough] * context["trough_close"])
 
-    max_drawdown = (portfolio_value_at_peak - portfolio_value_at_trough) / portfolio_value_at_peak * 100 # calculation of     Max DrawDown
+    max_drawdown = (portfolio_value_at_peak - portfolio_value_at_trough) / portfolio_value_at_peak * 100 # calculation of Max DrawDown
 
     return win_rate_output, sharpe_ratio, max_drawdown
 
-def calculate_cash_flows(order_log_file, initial_value, stock_data):
-    cash_flows = [-initial_value]
-    cash = initial_value  # Initialize cash as the initial portfolio value
-    shares_owned = 0  # Initialize the number of shares owned
-
-    # Iterate over the orders and calculate cash flows
-    for order in order_log_file:
-        order_date = pd.to_datetime(order['Date'])
-        order_type = order['Type']
-        price = float(order['Price'])
-        size = int(order['Size'])
-
-        # Calculate the portfolio value at the time of the trade
-        if order_type == 'BUY':
-            cash -= price * size  # Decrease cash when buying shares
-            shares_owned += size  # Increase shares owned
-        elif order_type == 'SELL':
-            cash += price * shares_owned  # Increase cash when selling shares
-            shares_owned = 0  # Decrease shares owned
-        
-        # After each trade, calculate the current portfolio value and append to cash_flows
-        portfolio_value = cash + (shares_owned * price)  # Cash + value of owned shares
-        cash_flows.append(portfolio_value)  # Append the updated portfolio value to cash flows
-    
+
+def calculate_cash_flows(order_log_file, initial_value, stock_data, context=None):
+    final_close = context["final_close"] if context else stock_data['close'].iloc[-1]
+    dates, prices, sizes, is_buy, is_sell = order_arrays(order_log_file)
+    cash, shares = replay_orders(prices, sizes, is_buy, is_sell, initial_value)
+
+    # The portfolio value after each trade, valued at that trade's price
+    trade_values = cash[1:] + (shares[1:] * prices)
     # Get the final portfolio value (after the last order)
-    final_portfolio_value = cash + (shares_owned * stock_data['close'].iloc[-1])
-    cash_flows.append(final_portfolio_value)  # Append final portfolio value to cash flows
-    # print(f"Cash flow internal: {cash_flows}")
-        
-    return cash_flows
\ No newline at end of file
+    final_portfolio_value = cash[-1] + (shares[-1] * final_close)
+    return [-initial_value, *trade_values.tolist(), float(final_portfolio_value)]
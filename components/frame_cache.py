@@ -0,0 +1,76 @@
+import collections
+import os
+import threading
+
+# In-process LRU cache of the price frames loaded from the price store, shared by every request.
+# Entries are keyed by (symbol, interval, version of meta.json): every write or append replaces
+# meta.json, so a changed store gets a new key and its old frame simply ages out. Callers get a
+# shallow copy whose columns are read-only views on the cached arrays, so nothing a request does
+# to its frame (attrs, new columns) leaks into the cache. The cache is capped by the bytes of its
+# frames (BACKTEST_FRAME_CACHE_MB) and evicts the least recently used frames first.
+FRAME_CACHE_MAX_BYTES = int(float(os.environ.get('BACKTEST_FRAME_CACHE_MB', 256)) * 1024 * 1024)
+
+_lock = threading.Lock()
+_frames = collections.OrderedDict()
+frame_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def frame_bytes(stock_data):
+    return int(stock_data.memory_usage(index=True, deep=False).sum())
+
+
+def store_version(folder, stock_symbol, interval):
+    from components.price_store import store_path
+    # replace() gives meta.json a new inode, so this changes even within one mtime tick
+    stat = os.stat(os.path.join(store_path(folder, stock_symbol, interval), 'meta.json'))
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def cached_prices(folder, stock_symbol, interval):
+    from components.price_store import load_prices
+    """Return the stored frame for the symbol, loading it only when the store changed."""
+    key = (os.path.abspath(folder), stock_symbol, interval, store_version(folder, stock_symbol, interval))
+    with _lock:
+        stock_data = _frames.get(key)
+        if stock_data is not None:
+            _frames.move_to_end(key)
+            frame_cache_stats["hits"] += 1
+            return stock_data.copy(deep=False)
+
+    stock_data = load_prices(folder, stock_symbol, interval)
+    size = frame_bytes(stock_data)
+    with _lock:
+        frame_cache_stats["misses"] += 1
+        # Older versions of the same store can no longer be hit
+        for stale in [other for other in _frames if other[:3] == key[:3] and other != key]:
+            frame_cache_stats["bytes"] -= frame_bytes(_frames.pop(stale))
+        if key not in _frames and size <= FRAME_CACHE_MAX_BYTES:
+            _frames[key] = stock_data
+            frame_cache_stats["bytes"] += size
+            evict()
+    return stock_data.copy(deep=False)
+
+
+def evict():
+    # Called with _lock held
+    while frame_cache_stats["bytes"] > FRAME_CACHE_MAX_BYTES and _frames:
+        _, stock_data = _frames.popitem(last=False)
+        frame_cache_stats["bytes"] -= frame_bytes(stock_data)
+        frame_cache_stats["evictions"] += 1
+
+
+def clear_frame_cache():
+    with _lock:
+        _frames.clear()
+        frame_cache_stats["bytes"] = 0
+
+
+def frame_cache_report():
+    with _lock:
+        lookups = frame_cache_stats["hits"] + frame_cache_stats["misses"]
+        return {
+            **frame_cache_stats,
+            "entries": len(_frames),
+            "hit_rate": round(frame_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "max_bytes": FRAME_CACHE_MAX_BYTES,
+        }
@@ -0,0 +1,69 @@
+import hashlib
+import numpy as np
+import components.vectorized_indicators as vi
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+# Single-line indicators that can be shared between parameter combinations
+INDICATORS = {
+    'sma': vi.sma,
+    'ema': vi.ema,
+    'smma': vi.smma,
+    'highest': vi.highest,
+    'lowest': vi.lowest,
+    'stddev': vi.stddev,
+    'rsi': vi.rsi,
+}
+
+
+def data_fingerprint(stock_data):
+    # Identifies the price history: any changed or appended bar gives a new fingerprint
+    digest = hashlib.sha1(stock_data.index.to_numpy(dtype='datetime64[ns]').tobytes())
+    for column in PRICE_COLUMNS:
+        digest.update(np.ascontiguousarray(stock_data[column].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    # Per-sweep store of indicator series keyed by (data fingerprint, indicator type, period, source line).
+    # Combinations that share a period read the same array, so indicator work scales with the
+    # number of distinct periods in the grid instead of the number of combinations.
+    def __init__(self, stock_data):
+        self.fingerprint = data_fingerprint(stock_data)
+        self.prices = {column: stock_data[column].to_numpy(dtype=float) for column in PRICE_COLUMNS}
+        self.hits = 0
+        self.misses = 0
+        self._series = {}
+
+    def line(self, source):
+        if source in self.prices:
+            return self.prices[source]
+        return self._series[(self.fingerprint, 'line', None, source)]
+
+    def get(self, indicator, period, source='close'):
+        key = (self.fingerprint, indicator, period, source)
+        if key in self._series:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._series[key] = INDICATORS[indicator](self.line(source), period)
+        return self._series[key]
+
+    def derive(self, source, compute):
+        # Register a derived line (e.g. a MACD line) so other indicators can use it as their source
+        key = (self.fingerprint, 'line', None, source)
+        if key in self._series:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._series[key] = compute()
+        return self._series[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "series": len(self._series),
+        }
@@ -0,0 +1,213 @@
+import concurrent.futures
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Background jobs for the long-running endpoints. A submitted job gets an id straight away and
+# runs on a small thread pool in the server process; its sweeps report completed combinations
+# through a JobProgress, which also carries the cancel flag the sweep loops check. Job state and
+# results are kept in SQLite (BACKTEST_JOBS_PATH), so finished results survive a restart; jobs
+# that were queued or running when the server stopped are marked interrupted on startup.
+JOBS_PATH = os.environ.get('BACKTEST_JOBS_PATH', os.path.join('stock_data', 'jobs.sqlite'))
+JOB_THREADS = int(os.environ.get('BACKTEST_JOB_THREADS', 2))
+# Progress is written to the store at most this often; status reads of live jobs come from memory
+PROGRESS_WRITE_SECONDS = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+_live = {}
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def connect(path=None):
+    path = path or JOBS_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    with _schema_lock:
+        if path in _schema_ready:
+            return connection
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, kind TEXT, status TEXT, request TEXT, done INTEGER, total INTEGER, '
+            'created REAL, started REAL, finished REAL, result TEXT, error TEXT)'
+        )
+        # Nothing from a previous server process is still running
+        connection.execute(
+            "UPDATE jobs SET status = 'interrupted', finished = ? WHERE status IN ('queued', 'running')",
+            (time.time(),)
+        )
+        connection.commit()
+        _schema_ready.add(path)
+    return connection
+
+
+def update_job(job_id, **fields):
+    connection = connect()
+    try:
+        with connection:
+            assignments = ', '.join(f'{field} = ?' for field in fields)
+            connection.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', [*fields.values(), job_id])
+    finally:
+        connection.close()
+
+
+class JobProgress:
+    # Handed to the sweep functions: they add the combinations they will run to the total,
+    # advance it as chunks finish and stop when cancelled() turns true
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.done = 0
+        self.total = 0
+        self.started = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.lock = threading.Lock()
+        self.last_write = 0.0
+
+    def add_total(self, combos):
+        with self.lock:
+            self.total += combos
+        self.persist()
+
+    def advance(self, combos):
+        with self.lock:
+            self.done += combos
+        self.persist()
+
+    def persist(self, force=False):
+        now = time.time()
+        if force or now - self.last_write >= PROGRESS_WRITE_SECONDS:
+            self.last_write = now
+            update_job(self.job_id, done=self.done, total=self.total)
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check(self):
+        if self.cancelled():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+def job_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=JOB_THREADS, thread_name_prefix='job')
+        return _executor
+
+
+def run_job(job_id, run, request_data, progress):
+    from components.telemetry import info, warning
+    if progress.cancelled():
+        # Cancelled while queued; only this thread records it, so it cannot race the start below
+        update_job(job_id, status='cancelled', finished=time.time())
+        _live.pop(job_id, None)
+        return
+    progress.started = time.time()
+    update_job(job_id, status='running', started=progress.started)
+    try:
+        result = run(request_data, progress)
+    except JobCancelled:
+        progress.persist(force=True)
+        update_job(job_id, status='cancelled', finished=time.time())
+        info(f"Job {job_id} cancelled after {progress.done}/{progress.total} combinations")
+    except Exception as e:
+        progress.persist(force=True)
+        update_job(job_id, status='failed', finished=time.time(), error=f"{type(e).__name__}: {e}")
+        warning(f"Job {job_id} failed: {e}")
+    else:
+        progress.persist(force=True)
+        if request_data.get('save_artifacts'):
+            from components.artifacts import save_job_artifacts
+            info(f"Job {job_id} artifacts saved: {save_job_artifacts(job_id, result)}")
+        update_job(job_id, status='finished', finished=time.time(), result=json.dumps(result))
+        info(f"Job {job_id} finished in {time.time() - progress.started:.1f}s")
+    finally:
+        _live.pop(job_id, None)
+
+
+def submit_job(kind, run, request_data):
+    """Queue run(request_data, progress) in the background and return the new job id."""
+    job_id = uuid.uuid4().hex
+    connection = connect()
+    try:
+        with connection:
+            connection.execute(
+                'INSERT INTO jobs (id, kind, status, request, done, total, created) VALUES (?, ?, ?, ?, 0, 0, ?)',
+                (job_id, kind, 'queued', json.dumps(request_data), time.time())
+            )
+    finally:
+        connection.close()
+    progress = JobProgress(job_id)
+    _live[job_id] = progress
+    progress.future = job_executor().submit(run_job, job_id, run, request_data, progress)
+    return job_id
+
+
+def job_status(job_id):
+    """Status, progress and ETA of a job, or None if there is no such job."""
+    connection = connect()
+    try:
+        row = connection.execute(
+            'SELECT kind, status, done, total, created, started, finished, error FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+    from components.artifacts import job_artifacts_dir
+    from components.profiling import has_profile
+    kind, status, done, total, created, started, finished, error = row
+    progress = _live.get(job_id)
+    if progress is not None:
+        done, total = progress.done, progress.total
+    eta = None
+    if status == 'running' and started and done and total > done:
+        eta = round((time.time() - started) / done * (total - done), 1)
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "status": status,
+        "combos_completed": done,
+        "combos_total": total,
+        "eta_seconds": eta,
+        "created": created,
+        "started": started,
+        "finished": finished,
+        "error": error,
+        # Set once a job submitted with "save_artifacts" has written its files
+        "artifacts_dir": job_artifacts_dir(job_id) if os.path.isdir(job_artifacts_dir(job_id)) else None,
+        # Set once a job submitted with "profile" has saved its report
+        "profile_url": f"/profiles/{job_id}" if has_profile(job_id) else None,
+    }
+
+
+def cancel_job(job_id):
+    """Ask a queued or running job to stop; returns its status."""
+    progress = _live.get(job_id)
+    if progress is not None:
+        progress.cancel_event.set()
+        # A job still waiting for a thread is taken off the queue, so run_job never sees it; one
+        # that has been picked up records the cancellation itself, before starting or at its next check()
+        if progress.future is not None and progress.future.cancel():
+            update_job(job_id, status='cancelled', finished=time.time())
+            _live.pop(job_id, None)
+    return job_status(job_id)
+
+
+def job_result(job_id):
+    connection = connect()
+    try:
+        row = connection.execute('SELECT result FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        connection.close()
+    return json.loads(row[0]) if row and row[0] is not None else None
@@ -0,0 +1,113 @@
+import datetime
+import json
+import os
+import pandas as pd
+
+# Exchange sessions used to decide whether the stored history can still grow.
+# A session is a weekday that is not listed as a holiday; holidays are read from the JSON file
+# in BACKTEST_HOLIDAYS_FILE ({"XNSE": ["2025-01-26", ...], ...}) when it exists.
+# A session's bars are treated as final BACKTEST_DATA_READY_MINUTES after its close.
+EXCHANGES = {
+    'XNSE': {"tz": "Asia/Kolkata", "open": datetime.time(9, 15), "close": datetime.time(15, 30)},
+    'XBOM': {"tz": "Asia/Kolkata", "open": datetime.time(9, 15), "close": datetime.time(15, 30)},
+    'XNYS': {"tz": "America/New_York", "open": datetime.time(9, 30), "close": datetime.time(16, 0)},
+}
+SYMBOL_SUFFIXES = {'.NS': 'XNSE', '.BO': 'XBOM'}
+DEFAULT_EXCHANGE = 'XNYS'
+HOLIDAYS_FILE = os.environ.get('BACKTEST_HOLIDAYS_FILE', os.path.join('stock_data', 'holidays.json'))
+DATA_READY_DELAY = pd.Timedelta(minutes=int(os.environ.get('BACKTEST_DATA_READY_MINUTES', 30)))
+# Bar lengths of the intraday intervals yfinance serves
+INTRADAY_INTERVALS = {
+    '1m': pd.Timedelta(minutes=1), '2m': pd.Timedelta(minutes=2), '5m': pd.Timedelta(minutes=5),
+    '15m': pd.Timedelta(minutes=15), '30m': pd.Timedelta(minutes=30), '60m': pd.Timedelta(hours=1),
+    '90m': pd.Timedelta(minutes=90), '1h': pd.Timedelta(hours=1),
+}
+# Longer bars are stamped with the first session they cover
+PERIOD_INTERVALS = {'5d': 7, '1wk': 7, '1mo': 31, '3mo': 92}
+
+_holidays = {}
+
+
+def symbol_exchange(stock_symbol):
+    for suffix, exchange in SYMBOL_SUFFIXES.items():
+        if stock_symbol.upper().endswith(suffix):
+            return exchange
+    return DEFAULT_EXCHANGE
+
+
+def exchange_holidays(exchange):
+    if exchange not in _holidays:
+        holidays = set()
+        if os.path.exists(HOLIDAYS_FILE):
+            with open(HOLIDAYS_FILE) as f:
+                holidays = {datetime.date.fromisoformat(day) for day in json.load(f).get(exchange, [])}
+        _holidays[exchange] = holidays
+    return _holidays[exchange]
+
+
+def is_session(exchange, day):
+    return day.weekday() < 5 and day not in exchange_holidays(exchange)
+
+
+def exchange_now(exchange, now=None):
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    if now.tzinfo is None:
+        now = now.tz_localize('UTC')
+    return now.tz_convert(EXCHANGES[exchange]["tz"])
+
+
+def session_bounds(exchange, day):
+    tz = EXCHANGES[exchange]["tz"]
+    opens = pd.Timestamp(datetime.datetime.combine(day, EXCHANGES[exchange]["open"])).tz_localize(tz)
+    closes = pd.Timestamp(datetime.datetime.combine(day, EXCHANGES[exchange]["close"])).tz_localize(tz)
+    return opens, closes
+
+
+def last_closed_session(exchange, now=None):
+    """The latest session whose bars are final at now."""
+    now = exchange_now(exchange, now)
+    day = now.date()
+    while True:
+        if is_session(exchange, day) and session_bounds(exchange, day)[1] + DATA_READY_DELAY <= now:
+            return day
+        day -= datetime.timedelta(days=1)
+
+
+def bar_date(timestamp, exchange):
+    # Daily bars are stamped at midnight; intraday bars may carry any zone
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(EXCHANGES[exchange]["tz"])
+    return timestamp.date()
+
+
+def is_fresh(last_bar, interval, exchange, now=None):
+    """Whether a history ending at last_bar already holds every bar that can be final at now."""
+    closed_session = last_closed_session(exchange, now)
+    if interval in INTRADAY_INTERVALS:
+        current = exchange_now(exchange, now)
+        opens, closes = session_bounds(exchange, current.date())
+        if is_session(exchange, current.date()) and opens + INTRADAY_INTERVALS[interval] <= current < closes + DATA_READY_DELAY:
+            # Mid-session: the newest complete bar ended at most one bar length ago
+            last_bar = pd.Timestamp(last_bar)
+            if last_bar.tzinfo is None:
+                last_bar = last_bar.tz_localize(EXCHANGES[exchange]["tz"])
+            return current - last_bar < 2 * INTRADAY_INTERVALS[interval]
+    if interval in PERIOD_INTERVALS:
+        return bar_date(last_bar, exchange) > closed_session - datetime.timedelta(days=PERIOD_INTERVALS[interval])
+    return bar_date(last_bar, exchange) >= closed_session
+
+
+def complete_bars(new_data, interval, exchange, now=None):
+    # Drop the bar of a session that is still trading; it would be stored with partial values
+    if new_data.empty or interval in PERIOD_INTERVALS:
+        return new_data
+    current = exchange_now(exchange, now)
+    if interval in INTRADAY_INTERVALS:
+        index = new_data.index
+        if index.tz is None:
+            index = index.tz_localize(EXCHANGES[exchange]["tz"])
+        return new_data[index + INTRADAY_INTERVALS[interval] <= current]
+    closed_session = last_closed_session(exchange, now)
+    dates = [bar_date(timestamp, exchange) for timestamp in new_data.index]
+    return new_data[[day <= closed_session for day in dates]]
@@ -0,0 +1,324 @@
+import math
+import time
+import numpy as np
+
+# Budgeted alternatives to the exhaustive grid sweep. A search draws parameter sets from each
+# strategy's ranges (optionally widened per request) without expanding the full product, runs them
+# through the same sweep engines and result cache as the grid, and stops at an evaluation or
+# wall-clock budget:
+#   random   - uniform samples from the valid parameter sets
+#   halving  - successive halving: many samples scored on a short prefix of the history, the best
+#              third promoted to a window three times longer, until the survivors see every bar
+#   tpe      - Tree-structured Parzen Estimator: after random start-up samples, new candidates are
+#              drawn where the best quarter of results is dense and the rest is sparse
+# The evaluation budget counts full-history runs; a run on a prefix counts as its share of the bars.
+# Only full-history results are returned, so rows and the best parameters are comparable with a grid.
+OPTIMIZERS = ('grid', 'random', 'halving', 'tpe')
+DEFAULT_EVALUATIONS = 100
+SEARCH_BATCH = 16
+HALVING_ETA = 3
+MAX_HALVING_RUNGS = 3
+MIN_WINDOW_BARS = 120
+TPE_GAMMA = 0.25
+TPE_CANDIDATES = 64
+# Spaces up to this size are expanded to compare against the grid optimum from the result cache
+GRID_COMPARE_LIMIT = 20000
+
+
+def search_options(data):
+    from components.pruning import pruning_rules
+    """Read the optimizer and pruning settings of a request body."""
+    optimizer = data.get('optimizer', 'grid')
+    if optimizer not in OPTIMIZERS:
+        raise ValueError(f"Optimizer '{optimizer}' not found. Choose one of {OPTIMIZERS}.")
+    budget = data.get('budget') or {}
+    return {
+        "optimizer": optimizer,
+        "evaluations": budget.get('evaluations'),
+        "seconds": budget.get('seconds'),
+        "parameter_ranges": data.get('parameter_ranges'),
+        "seed": data.get('seed'),
+        "compare_to_grid": bool(data.get('compare_to_grid', False)),
+        "pruning": pruning_rules(data),
+    }
+
+
+def strategy_ranges(search, strategy_name):
+    # Multi-strategy requests key the range overrides by strategy name
+    parameter_ranges = (search or {}).get('parameter_ranges') or {}
+    if strategy_name in parameter_ranges:
+        return parameter_ranges[strategy_name]
+    from strategies import strategy_tree
+    if any(name in strategy_tree for name in parameter_ranges):
+        return None
+    return parameter_ranges or None
+
+
+def is_search(search):
+    return bool(search) and search.get('optimizer', 'grid') != 'grid'
+
+
+class SearchSpace:
+    # Parameter sets are tuples of value indices into each parameter's range
+    def __init__(self, strategy_name, trade_size, parameter_ranges=None):
+        from components.parameter_combinations import get_parameter_ranges
+        ranges = get_parameter_ranges(strategy_name, parameter_ranges)
+        self.names = list(ranges)
+        self.values = [list(values) for values in ranges.values()]
+        self.sizes = np.array([len(values) for values in self.values])
+        self.size = int(np.prod(self.sizes, dtype=float)) if len(self.sizes) else 0
+        self.trade_size = trade_size
+
+    def valid(self, index):
+        from components.parameter_combinations import is_valid_combination
+        return is_valid_combination(tuple(values[i] for values, i in zip(self.values, index)))
+
+    def params(self, index):
+        params = {name: values[i] for name, values, i in zip(self.names, self.values, index)}
+        params['Trade Size'] = self.trade_size
+        return params
+
+    def index_of(self, row):
+        return tuple(values.index(row[name]) for name, values in zip(self.names, self.values))
+
+    def sample(self, rng, count, seen):
+        """Up to count valid parameter sets not in seen, drawn uniformly."""
+        picked = []
+        # Rejection sampling; the attempt cap ends the search once the space is (nearly) exhausted
+        for _ in range(count * 50):
+            if len(picked) == count:
+                break
+            index = tuple(int(i) for i in rng.integers(0, self.sizes))
+            if index not in seen and self.valid(index):
+                seen.add(index)
+                picked.append(index)
+        return picked
+
+
+class Evaluator:
+    # Runs parameter sets on a prefix of the history through the sweep engines (and the result
+    # cache for the whole history), and keeps count of the budget spent
+    def __init__(self, space, strategy_name, initial_portfolio_value, stock_data, engine, search, progress=None):
+        self.space = space
+        self.strategy_name = strategy_name
+        self.initial_portfolio_value = initial_portfolio_value
+        self.stock_data = stock_data
+        self.engine = engine
+        self.progress = progress
+        self.evaluations = search.get('evaluations') or DEFAULT_EVALUATIONS
+        # Pruning applies to full-history runs only: a top-k over prefixes of different lengths means nothing
+        self.pruning = search.get('pruning')
+        self.seconds = search.get('seconds')
+        self.started = time.time()
+        self.cost = 0.0
+        self.runs = 0
+        self.cache_hits = 0
+        self.full_rows = {}
+        self.sweep_stats = {}
+
+    def remaining(self):
+        return self.evaluations - self.cost
+
+    def exhausted(self):
+        if self.seconds is not None and time.time() - self.started >= self.seconds:
+            return True
+        return self.remaining() < 1e-9
+
+    def evaluate(self, indices, bars=None):
+        from components.result_cache import ResultCache
+        from components.run_sweep import iter_combinations
+        """Return {index: result row} for the parameter sets run on the first bars of the history."""
+        bars = len(self.stock_data) if bars is None else bars
+        full = bars == len(self.stock_data)
+        window = self.stock_data if full else self.stock_data.iloc[:bars]
+        combinations = [self.space.params(index) for index in indices]
+        # Only full-history rows go through the result cache. A prefix window has the symbol of the
+        # whole history but another fingerprint, so storing it would purge the strategy's full rows.
+        if full:
+            result_cache = ResultCache(window, self.strategy_name, self.initial_portfolio_value, self.engine)
+            rows, pending = result_cache.split(combinations)
+        else:
+            rows, pending = [], combinations
+        if self.progress is not None:
+            self.progress.add_total(len(combinations))
+            self.progress.advance(len(rows))
+        if pending:
+            fresh = []
+            for batch in iter_combinations(
+                self.strategy_name, pending, self.initial_portfolio_value, window, self.engine, self.sweep_stats,
+                self.progress, self.pruning if full else None, list(self.full_rows.values()) + rows if full else ()
+            ):
+                fresh.extend(batch)
+            if full:
+                result_cache.store(fresh)
+            rows.extend(fresh)
+        if full:
+            self.cache_hits += result_cache.hits
+        self.runs += len(combinations)
+        self.cost += len(combinations) * bars / len(self.stock_data)
+        scored = {self.space.index_of(row): row for row in rows}
+        if full:
+            self.full_rows.update(scored)
+        return scored
+
+
+def score(row):
+    # A pruned run's value is only where it stopped, so it never ranks above a finished run
+    if row.get("Pruned"):
+        return -math.inf
+    return float(row["Portfolio Value"])
+
+
+def random_search(space, evaluator, rng):
+    seen = set()
+    while not evaluator.exhausted():
+        batch = space.sample(rng, min(SEARCH_BATCH, max(1, int(evaluator.remaining()))), seen)
+        if not batch:
+            break
+        evaluator.evaluate(batch)
+
+
+def successive_halving(space, evaluator, rng):
+    bars = len(evaluator.stock_data)
+    numeric = [value for values in space.values for value in values if isinstance(value, (int, float))]
+    # The shortest window must still cover the longest indicator period a little more than once
+    min_window = min(bars, max(MIN_WINDOW_BARS, int(2 * max(numeric, default=0))))
+    rungs = min(MAX_HALVING_RUNGS, int(math.log(bars / min_window, HALVING_ETA))) if bars > min_window else 0
+    # Every rung costs the same share of the budget: n / eta**r sets on windows of bars / eta**(rungs - r)
+    first_rung = max(1, int(evaluator.evaluations * HALVING_ETA ** rungs / (rungs + 1)))
+    survivors = space.sample(rng, first_rung, set())
+    for rung in range(rungs + 1):
+        window = bars if rung == rungs else max(min_window, int(bars / HALVING_ETA ** (rungs - rung)))
+        scored = {}
+        for start in range(0, len(survivors), SEARCH_BATCH):
+            if scored and evaluator.exhausted():
+                break
+            scored.update(evaluator.evaluate(survivors[start:start + SEARCH_BATCH], window))
+        ranked = sorted(scored, key=lambda index: score(scored[index]), reverse=True)
+        if window == bars:
+            return
+        if evaluator.exhausted():
+            # Out of time: the leader so far is still scored on the whole history
+            evaluator.evaluate(ranked[:1])
+            return
+        survivors = ranked[:max(1, math.ceil(len(ranked) / HALVING_ETA))]
+
+
+def parzen_density(space, indices, dimension):
+    # Gaussian kernels on the value positions of one parameter, plus a uniform prior
+    positions = np.arange(space.sizes[dimension])
+    bandwidth = max(1.0, space.sizes[dimension] / 10)
+    centres = np.array([index[dimension] for index in indices], dtype=float)
+    density = np.full(len(positions), 1.0 / len(positions))
+    if len(centres):
+        density = density + np.exp(-0.5 * ((positions[:, None] - centres[None, :]) / bandwidth) ** 2).sum(axis=1)
+    return density / density.sum()
+
+
+def tpe_suggest(space, observations, rng, count, seen):
+    ranked = sorted(observations, key=lambda index: score(observations[index]), reverse=True)
+    good_count = max(1, math.ceil(TPE_GAMMA * len(ranked)))
+    good, bad = ranked[:good_count], ranked[good_count:] or ranked
+    candidates = count * TPE_CANDIDATES
+    draws = []
+    log_ratio = np.zeros(candidates)
+    for dimension in range(len(space.sizes)):
+        good_density = parzen_density(space, good, dimension)
+        bad_density = parzen_density(space, bad, dimension)
+        draw = rng.choice(len(good_density), size=candidates, p=good_density)
+        log_ratio += np.log(good_density[draw]) - np.log(bad_density[draw])
+        draws.append(draw)
+    picked = []
+    for candidate in np.argsort(-log_ratio, kind='stable'):
+        index = tuple(int(draw[candidate]) for draw in draws)
+        if index not in seen and space.valid(index):
+            seen.add(index)
+            picked.append(index)
+            if len(picked) == count:
+                break
+    return picked
+
+
+def tpe_search(space, evaluator, rng):
+    seen = set()
+    startup = max(10, int(evaluator.evaluations // 5))
+    while not evaluator.exhausted():
+        count = min(SEARCH_BATCH, max(1, int(evaluator.remaining())))
+        if len(evaluator.full_rows) < startup:
+            batch = space.sample(rng, min(count, startup - len(evaluator.full_rows)), seen)
+        else:
+            batch = tpe_suggest(space, evaluator.full_rows, rng, count, seen)
+            # Top up with random sets when the model keeps proposing what was already run
+            batch += space.sample(rng, count - len(batch), seen)
+        if not batch:
+            break
+        evaluator.evaluate(batch)
+
+
+search_methods = {
+    'random': random_search,
+    'halving': successive_halving,
+    'tpe': tpe_search,
+}
+
+
+def grid_comparison(space, strategy_name, trade_size, initial_portfolio_value, stock_data, engine, search, best,
+                    progress=None):
+    from components.parameter_combinations import get_valid_combinations
+    from components.result_cache import ResultCache
+    from components.run_sweep import iter_combinations
+    """How the search's best compares with the grid optimum, from cached grid rows (or a full run when asked)."""
+    if space.size > GRID_COMPARE_LIMIT and not search.get('compare_to_grid'):
+        return None
+    grid = get_valid_combinations(strategy_name, trade_size, strategy_ranges(search, strategy_name))
+    result_cache = ResultCache(stock_data, strategy_name, initial_portfolio_value, engine)
+    rows, pending = result_cache.split(grid)
+    if pending and not search.get('compare_to_grid'):
+        return None
+    if pending:
+        fresh = []
+        for batch in iter_combinations(strategy_name, pending, initial_portfolio_value, stock_data, engine, {}, progress):
+            fresh.extend(batch)
+        result_cache.store(fresh)
+        rows.extend(fresh)
+    grid_best = max(score(row) for row in rows)
+    found = score(best)
+    return {
+        "grid_size": len(grid),
+        "grid_best": round(grid_best, 2),
+        "found_best": round(found, 2),
+        "gap_pct": round((grid_best - found) / abs(grid_best) * 100, 4) if grid_best else 0.0,
+        # 1 means the search found the grid optimum
+        "rank": 1 + sum(score(row) > found for row in rows),
+    }
+
+
+def stream_search(strategy_name, trade_size, initial_portfolio_value, stock_data, engine, sweep_stats, search,
+                  progress=None):
+    from components.telemetry import info
+    """Run a budgeted search and yield its full-history result rows; sweep_stats gets an "Optimizer" entry."""
+    space = SearchSpace(strategy_name, trade_size, strategy_ranges(search, strategy_name))
+    evaluator = Evaluator(space, strategy_name, initial_portfolio_value, stock_data, engine, search, progress)
+    rng = np.random.default_rng(search.get('seed'))
+    search_methods[search['optimizer']](space, evaluator, rng)
+    if not evaluator.full_rows:
+        raise ValueError(f"The {search['optimizer']} search for {strategy_name} found no valid parameter sets.")
+
+    results = list(evaluator.full_rows.values())
+    best = max(results, key=score)
+    sweep_stats.update(evaluator.sweep_stats)
+    sweep_stats["Optimizer"] = {
+        "method": search['optimizer'],
+        "space_size": space.size,
+        "evaluations": round(evaluator.cost, 2),
+        "runs": evaluator.runs,
+        "full_history_runs": len(results),
+        "cache_hits": evaluator.cache_hits,
+        "seconds": round(time.time() - evaluator.started, 2),
+        "best_value": round(score(best), 2),
+        "grid": grid_comparison(
+            space, strategy_name, trade_size, initial_portfolio_value, stock_data, engine, search, best, progress
+        ),
+    }
+    info(f"{search['optimizer']} search for {strategy_name}: {sweep_stats['Optimizer']}")
+    yield results
@@ -1,11 +1,53 @@
 from strategies import strategy_tree
 import itertools
-def get_parameter_combinations(strategy_name):
-        if strategy_name in strategy_tree:
-            parameter_ranges = strategy_tree[strategy_name]["parameter_ranges"]
-            param_names = list(parameter_ranges.keys())
-            param_values = list(parameter_ranges.values())
-            param_combinations = itertools.product(*param_values)
-            return param_names, param_combinations
-        else:
-            raise ValueError(f"Strategy {strategy_name} not found in configurations.")
\ No newline at end of file
+import numpy as np
+
+def get_parameter_ranges(strategy_name, parameter_ranges=None):
+        # parameter_ranges overrides a strategy's ranges with {name: [start, stop, step]} (stop excluded,
+        # like range) or {name: {"values": [...]}}
+        if strategy_name not in strategy_tree:
+            raise ValueError(f"Strategy {strategy_name} not found in configurations.")
+        ranges = dict(strategy_tree[strategy_name]["parameter_ranges"])
+        for name, spec in (parameter_ranges or {}).items():
+            if name not in ranges:
+                raise ValueError(f"Strategy {strategy_name} has no parameter '{name}'. Choose from {list(ranges)}.")
+            if isinstance(spec, dict) and "values" in spec:
+                values = list(spec["values"])
+            else:
+                if isinstance(spec, dict):
+                    spec = [spec["start"], spec["stop"], spec.get("step", 1)]
+                if len(spec) != 3:
+                    raise ValueError(f"Range for '{name}' must be [start, stop, step] or {{\"values\": [...]}}: {spec}")
+                if all(isinstance(value, int) for value in spec):
+                    values = range(*spec)
+                else:
+                    # Float steps; rounding keeps values like 0.30000000000000004 out of the grid
+                    values = [round(float(value), 10) for value in np.arange(*spec)]
+            if not len(values):
+                raise ValueError(f"Range for '{name}' of {strategy_name} is empty: {spec}")
+            ranges[name] = values
+        return ranges
+
+def get_parameter_combinations(strategy_name, parameter_ranges=None):
+        parameter_ranges = get_parameter_ranges(strategy_name, parameter_ranges)
+        param_names = list(parameter_ranges.keys())
+        param_values = list(parameter_ranges.values())
+        param_combinations = itertools.product(*param_values)
+        return param_names, param_combinations
+
+def is_valid_combination(combo):
+        # The first parameter must exceed the second (e.g. slow period above fast period)
+        return combo[0] > combo[1]
+
+def get_valid_combinations(strategy_name, trade_size, parameter_ranges=None):
+        from components.telemetry import span
+        with span('grid'):
+            param_names, param_combinations = get_parameter_combinations(strategy_name, parameter_ranges)
+            # Filter invalid parameter combinations before running
+            valid_combinations = [
+                dict(zip(param_names, combo)) for combo in param_combinations if is_valid_combination(combo)
+            ]
+        # Add 'Trade Size' to each parameter set
+        for params in valid_combinations:
+            params['Trade Size'] = trade_size
+        return valid_combinations
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Plotting data shared by the strategies' chart-drawing stop logic.
+# Backtrader keeps dates as float day ordinals; they are turned into datetime64 in one array
+# operation instead of a Python call per bar. Trades and indicator signals are read from a
+# columnar ledger built once per chart. Lines are thinned with Largest-Triangle-Three-Buckets
+# before matplotlib sees them: each bucket of bars keeps the one point that best preserves the
+# line's shape, and every line's extremes are kept, so drawing a 20-year daily or long intraday
+# history costs about the same as a one-year chart. BACKTEST_PLOT_POINTS caps the bars a chart
+# draws, shared between its lines (0 draws every bar).
+MAX_PLOT_POINTS = int(os.environ.get('BACKTEST_PLOT_POINTS', 2000))
+# Day ordinal of 1970-01-01 as datetime.date.toordinal counts it
+EPOCH_ORDINAL = 719163
+NANOSECONDS_PER_DAY = 86400 * 10 ** 9
+
+
+def ordinal_dates(ordinals):
+    """Convert backtrader's float day ordinals to a DatetimeIndex."""
+    ordinals = np.asarray(ordinals, dtype=float)
+    days = np.floor(ordinals)
+    # The time of day is rounded to microseconds, as datetime.timedelta(days=fraction) does
+    microseconds = np.round((ordinals - days) * 86400 * 10 ** 6).astype(np.int64)
+    nanoseconds = (days.astype(np.int64) - EPOCH_ORDINAL) * NANOSECONDS_PER_DAY + microseconds * 1000
+    return pd.DatetimeIndex(nanoseconds.astype('datetime64[ns]'))
+
+
+def plot_frame(strategy, lines, dropna=None):
+    """A DataFrame of the close and the given {column: backtrader line}, indexed by bar date."""
+    columns = {'Close': strategy.data.close.array}
+    columns.update({name: line.array for name, line in lines.items()})
+    data = pd.DataFrame(
+        {name: np.asarray(values, dtype=float) for name, values in columns.items()},
+        index=ordinal_dates(strategy.data.datetime.array),
+    )
+    if dropna:
+        data = data.dropna(subset=dropna)
+    return data
+
+
+def trade_ledger(log_data):
+    # Orders as columns: Date, Type, Price, Size
+    return pd.DataFrame.from_records(log_data, columns=['Date', 'Type', 'Price', 'Size'])
+
+
+def trade_signals(log_data):
+    """Buy and sell fills of the trade log as (buys, sells) DataFrames with Date and Price."""
+    ledger = trade_ledger(log_data)
+    is_buy = (ledger['Type'] == 'BUY').to_numpy()
+    is_sell = (ledger['Type'] == 'SELL').to_numpy()
+    return ledger.loc[is_buy, ['Date', 'Price']], ledger.loc[is_sell, ['Date', 'Price']]
+
+
+def indicator_signals(entries, value, kind, dates=None):
+    """The Date and value of the entries of one Type ('BUY' or 'SELL'), optionally only on dates."""
+    ledger = pd.DataFrame.from_records(entries, columns=['Date', 'Type', value])
+    keep = (ledger['Type'] == kind).to_numpy()
+    if dates is not None:
+        keep &= ledger['Date'].isin(dates).to_numpy()
+    return ledger.loc[keep, ['Date', value]]
+
+
+def lttb(values, target):
+    """Positions of the target points of values that Largest-Triangle-Three-Buckets keeps."""
+    count = len(values)
+    if target >= count or target < 3:
+        return np.arange(count)
+    x = np.arange(count, dtype=float)
+    # First and last points are kept; the rest is split into target - 2 buckets
+    edges = np.linspace(1, count - 1, target - 1).astype(np.int64)
+    kept = np.empty(target, dtype=np.int64)
+    kept[0], kept[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(target - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # The third corner is the average of the next bucket (the last point after the final bucket)
+        following = slice(stop, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(count - 1, count)
+        next_x, next_y = x[following].mean(), values[following].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (values[start:stop] - values[previous])
+            - (x[previous] - x[start:stop]) * (next_y - values[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def decimate(data, columns=None, target=None):
+    """Thin data to about target rows: those LTTB keeps for any of columns (all by default)."""
+    target = MAX_PLOT_POINTS if target is None else target
+    if not target or len(data) <= target:
+        return data
+    columns = columns or list(data.columns)
+    # The lines share the budget, so the rows kept for one line do not crowd out the others
+    share = max(3, target // len(columns))
+    keep = np.zeros(len(data), dtype=bool)
+    keep[[0, -1]] = True
+    for column in columns:
+        values = data[column].to_numpy(dtype=float)
+        # Warm-up bars of an indicator are NaN; only its defined bars are bucketed
+        defined = np.flatnonzero(~np.isnan(values))
+        if len(defined):
+            keep[defined[lttb(values[defined], share)]] = True
+            # The highest and lowest values are kept even when their bucket picked another point
+            keep[defined[np.argmax(values[defined])]] = keep[defined[np.argmin(values[defined])]] = True
+    return data[keep]
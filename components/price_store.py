@@ -0,0 +1,205 @@
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Columnar on-disk price store that replaces the per-symbol CSV files in stock_data/.
+# Every symbol and interval gets a directory holding one raw fixed-width file per column
+# (int64 nanoseconds for the index, float64 or int64 for the price columns) and a meta.json
+# with the format version, column dtypes and row count. Loading memory-maps the files, so
+# the returned frame reads straight from the page cache without parsing or copying, and
+# new bars are appended to the end of each file in place.
+# meta.json is replaced atomically after the column files have been extended, so a reader
+# never sees more rows than were completely written.
+# Bars are unique and ascending by timestamp: writes drop repeated timestamps and appends skip
+# every bar at or before the last stored one, so re-downloading an overlapping range is a no-op.
+# Writers hold a per-store file lock (lock_prices) so concurrent requests share one download.
+STORE_FORMAT_VERSION = 1
+INDEX_FILE = 'index.i64'
+
+
+def store_path(folder, stock_symbol, interval):
+    return os.path.join(folder, f"{stock_symbol}_{interval}")
+
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != STORE_FORMAT_VERSION:
+        raise ValueError(
+            f"Price store {path} has format version {meta.get('format_version')}, expected {STORE_FORMAT_VERSION}."
+        )
+    return meta
+
+
+def write_meta(path, meta):
+    temp_path = os.path.join(path, 'meta.json.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, os.path.join(path, 'meta.json'))
+
+
+def has_prices(folder, stock_symbol, interval):
+    return os.path.exists(os.path.join(store_path(folder, stock_symbol, interval), 'meta.json'))
+
+
+@contextlib.contextmanager
+def lock_prices(folder, stock_symbol, interval):
+    # An exclusive flock on a file beside the store; it also serialises threads of one process
+    os.makedirs(folder, exist_ok=True)
+    with open(store_path(folder, stock_symbol, interval) + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def unique_bars(stock_data):
+    # Later bars win over earlier ones with the same timestamp
+    stock_data = stock_data[~stock_data.index.duplicated(keep='last')]
+    if not stock_data.index.is_monotonic_increasing:
+        stock_data = stock_data.sort_index()
+    return stock_data
+
+
+def column_file(column, dtype):
+    return f"{column}.{'i64' if dtype == 'int64' else 'f64'}"
+
+
+def column_values(stock_data, column, dtype):
+    return np.ascontiguousarray(stock_data[column].to_numpy(dtype=dtype))
+
+
+def index_values(index):
+    # tz-aware indexes are stored as UTC nanoseconds plus the zone name
+    return np.ascontiguousarray(index.asi8, dtype=np.int64)
+
+
+def write_prices(stock_data, folder, stock_symbol, interval):
+    """Write stock_data as a new store, replacing any previous one."""
+    path = store_path(folder, stock_symbol, interval)
+    os.makedirs(path, exist_ok=True)
+    stock_data = unique_bars(stock_data)
+    index = pd.DatetimeIndex(stock_data.index)
+    dtypes = {
+        column: 'int64' if pd.api.types.is_integer_dtype(stock_data[column].dtype) else 'float64'
+        for column in stock_data.columns
+    }
+    index_values(index).tofile(os.path.join(path, INDEX_FILE))
+    for column, dtype in dtypes.items():
+        column_values(stock_data, column, dtype).tofile(os.path.join(path, column_file(column, dtype)))
+    write_meta(path, {
+        "format_version": STORE_FORMAT_VERSION,
+        "rows": len(stock_data),
+        "index_name": stock_data.index.name,
+        "tz": str(index.tz) if index.tz is not None else None,
+        "columns": dtypes,
+        "checked_at": time.time(),
+    })
+
+
+def last_stored_bar(path, rows):
+    # Raw int64 of the newest committed timestamp, comparable with index_values
+    with open(os.path.join(path, INDEX_FILE), 'rb') as f:
+        f.seek((rows - 1) * 8)
+        return int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+
+
+def append_prices(new_data, folder, stock_symbol, interval):
+    """Append the bars of new_data newer than the stored history in place; return how many were added."""
+    path = store_path(folder, stock_symbol, interval)
+    meta = read_meta(path)
+    rows = meta["rows"]
+    # Bars are appended in the stored column layout; columns the store does not have are dropped
+    new_data = unique_bars(new_data.reindex(columns=list(meta["columns"])))
+    index = pd.DatetimeIndex(new_data.index)
+    if (index.tz is None) != (meta["tz"] is None):
+        raise ValueError(f"Cannot append bars with timezone {index.tz} to price store {path} ({meta['tz']}).")
+    if rows:
+        # Stored bars are never rewritten: readers may have them mapped
+        newer = index_values(index) > last_stored_bar(path, rows)
+        new_data, index = new_data[newer], index[newer]
+    meta["checked_at"] = time.time()
+    if new_data.empty:
+        write_meta(path, meta)
+        return 0
+
+    files = [(INDEX_FILE, 8, index_values(index))] + [
+        (column_file(column, dtype), 8, column_values(new_data, column, dtype))
+        for column, dtype in meta["columns"].items()
+    ]
+    for name, width, values in files:
+        with open(os.path.join(path, name), 'r+b') as f:
+            # Anything past the committed rows is left over from an interrupted append
+            f.seek(rows * width)
+            f.truncate()
+            f.write(values.tobytes())
+    meta["rows"] = rows + len(new_data)
+    write_meta(path, meta)
+    return len(new_data)
+
+
+def mark_checked(folder, stock_symbol, interval):
+    # Records a download that brought no new bars, for the freshness TTL
+    path = store_path(folder, stock_symbol, interval)
+    meta = read_meta(path)
+    meta["checked_at"] = time.time()
+    write_meta(path, meta)
+
+
+def load_prices(folder, stock_symbol, interval):
+    """Memory-map a store as a read-only DataFrame."""
+    path = store_path(folder, stock_symbol, interval)
+    meta = read_meta(path)
+    rows = meta["rows"]
+
+    def open_column(name, dtype):
+        if not rows:
+            values = np.zeros(0, dtype=dtype)
+            values.flags.writeable = False
+            return values
+        return np.memmap(os.path.join(path, name), dtype=dtype, mode='r', shape=(rows,))
+
+    index = pd.DatetimeIndex(open_column(INDEX_FILE, np.int64).view('datetime64[ns]'), name=meta["index_name"])
+    if meta["tz"]:
+        index = index.tz_localize('UTC').tz_convert(meta["tz"])
+    columns = {
+        column: open_column(column_file(column, dtype), np.dtype(dtype))
+        for column, dtype in meta["columns"].items()
+    }
+    # One block per column keeps every column a view on its mapped file
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def migrate_csv(csv_path, folder, stock_symbol, interval):
+    from components.telemetry import info
+    stock_data = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    write_prices(stock_data, folder, stock_symbol, interval)
+    # Keep the CSV next to the store under a new name so the migration only runs once
+    os.replace(csv_path, csv_path + '.migrated')
+    info(f"Migrated {csv_path} to the columnar price store ({len(stock_data)} rows)")
+    return stock_data
+
+
+def migrate_csv_store(folder):
+    """One-shot migration of every <symbol>_<interval>.csv in folder."""
+    migrated = []
+    for csv_path in sorted(glob.glob(os.path.join(folder, '*.csv'))):
+        stock_symbol, _, interval = os.path.basename(csv_path)[:-len('.csv')].rpartition('_')
+        if not stock_symbol or has_prices(folder, stock_symbol, interval):
+            continue
+        migrate_csv(csv_path, folder, stock_symbol, interval)
+        migrated.append((stock_symbol, interval))
+    return migrated
+
+
+if __name__ == "__main__":
+    from components.fetch_data import UPLOAD_FOLDER
+    print(f"Migrated: {migrate_csv_store(UPLOAD_FOLDER)}")
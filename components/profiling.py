@@ -0,0 +1,166 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+# On-demand profiling of one request, asked for with "profile": true or
+# {"sample": 0.1, "top": 40, "sort": "cumulative"} on /backtest, /execute-strategies or /universe-sweep.
+# The request's own thread (the web or job thread: fetching, vectorized and batch sweeps, dispatch,
+# summaries) runs under cProfile. The backtrader sweeps it dispatches profile the sample share of
+# their run_backtrader_sync calls on the workers; a combination is sampled by a hash of its
+# parameters, so the same ones are profiled however the grid is chunked. Each chunk sends its
+# profile back with its results and they are merged into one workers profile.
+# The report is stored in PROFILE_DIR/<id>/ (the job id for async requests) as report.txt (both
+# profiles as pstats text), request.prof and workers.prof (pstats dumps for pstats, snakeviz, ...)
+# and served on /profiles/<id>. Nothing is profiled and no chunk carries anything extra unless asked.
+PROFILE_DIR = os.environ.get('BACKTEST_PROFILE_DIR', os.path.join('stock_data', 'profiles'))
+DEFAULT_SAMPLE = 0.1
+DEFAULT_TOP = 40
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls')
+PROFILE_FILES = {'text': 'report.txt', 'request': 'request.prof', 'workers': 'workers.prof'}
+
+# The profile of the request running on this thread, for the sweeps it dispatches
+_active = threading.local()
+
+
+def profile_options(data):
+    """Read the profiling settings of a request body, or None when profiling is off; ValueError if they are invalid."""
+    options = data.get('profile')
+    if not options:
+        return None
+    if options is True:
+        options = {}
+    if not isinstance(options, dict):
+        raise ValueError(f'Profile must be true or an object like {{"sample": 0.1, "top": 40}}, not {options!r}.')
+    try:
+        sample = float(options.get('sample', DEFAULT_SAMPLE))
+        top = int(options.get('top', DEFAULT_TOP))
+    except (TypeError, ValueError):
+        raise ValueError(f"Profile sample must be a number and top a whole number: {options}")
+    if not 0 < sample <= 1:
+        raise ValueError(f"Profile sample must be a share of combinations in (0, 1]: {sample}")
+    if top < 1:
+        raise ValueError(f"Profile top must be at least 1: {top}")
+    sort = options.get('sort', 'cumulative')
+    if sort not in PROFILE_SORT_KEYS:
+        raise ValueError(f"Profile sort '{sort}' not found. Choose one of {PROFILE_SORT_KEYS}.")
+    return {"sample": sample, "top": top, "sort": sort}
+
+
+def is_sampled(params, sample):
+    if sample >= 1:
+        return True
+    digest = zlib.crc32(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest % 10000 < sample * 10000
+
+
+def worker_profile(profiler, combinations):
+    # The raw pstats table pickles; Stats objects do not
+    profiler.create_stats()
+    return {"pid": os.getpid(), "combinations": combinations, "stats": profiler.stats}
+
+
+def stats_from(raw):
+    # pstats.Stats loads anything with create_stats() and a stats table, as it does a Profile
+    return pstats.Stats(SimpleNamespace(create_stats=lambda: None, stats=raw))
+
+
+class RequestProfile:
+    # Profiles the request thread and merges the profiles of the workers' sampled combinations
+    def __init__(self, options, profile_id):
+        self.id = profile_id
+        self.sample = options["sample"]
+        self.top = options["top"]
+        self.sort = options["sort"]
+        self.profiler = cProfile.Profile()
+        self.workers = None
+        self.combinations = 0
+        self.pids = set()
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add_worker(self, profile):
+        if not profile["combinations"]:
+            return
+        stats = stats_from(profile["stats"])
+        with self.lock:
+            if self.workers is None:
+                self.workers = stats
+            else:
+                self.workers.add(stats)
+            self.combinations += profile["combinations"]
+            self.pids.add(profile["pid"])
+
+    def report(self, request_stats):
+        buffer = io.StringIO()
+        buffer.write(f"Profile {self.id}: request took {self.seconds:.2f}s\n\n")
+        buffer.write("== Request thread ==\n")
+        request_stats.stream = buffer
+        request_stats.sort_stats(self.sort).print_stats(self.top)
+        buffer.write(
+            f"== Workers: {self.combinations} sampled run_backtrader_sync calls "
+            f"({self.sample:.0%} of combinations) on {len(self.pids)} processes ==\n"
+        )
+        if self.workers is None:
+            buffer.write("No backtrader combinations were sampled.\n")
+        else:
+            self.workers.stream = buffer
+            self.workers.sort_stats(self.sort).print_stats(self.top)
+        return buffer.getvalue()
+
+    def save(self):
+        from components.telemetry import info
+        directory = profile_dir(self.id)
+        os.makedirs(directory, exist_ok=True)
+        request_stats = pstats.Stats(self.profiler)
+        request_stats.dump_stats(os.path.join(directory, PROFILE_FILES['request']))
+        if self.workers is not None:
+            self.workers.dump_stats(os.path.join(directory, PROFILE_FILES['workers']))
+        with open(os.path.join(directory, PROFILE_FILES['text']), 'w') as f:
+            f.write(self.report(request_stats))
+        info(f"Profile {self.id} saved to {directory}")
+        return directory
+
+
+def active_profile():
+    return getattr(_active, 'profile', None)
+
+
+def profiled(run, options, profile_id=None):
+    """Wrap run(data, progress) to profile it; the id defaults to the job id of its progress."""
+    def run_profiled(data, progress=None):
+        profile = RequestProfile(options, profile_id or progress.job_id)
+        _active.profile = profile
+        start_time = time.perf_counter()
+        profile.profiler.enable()
+        try:
+            return run(data, progress)
+        finally:
+            profile.profiler.disable()
+            profile.seconds = time.perf_counter() - start_time
+            _active.profile = None
+            profile.save()
+    return run_profiled
+
+
+def profile_dir(profile_id):
+    return os.path.join(PROFILE_DIR, profile_id)
+
+
+def has_profile(profile_id):
+    return os.path.exists(os.path.join(profile_dir(profile_id), PROFILE_FILES['text']))
+
+
+def profile_file(profile_id, fmt='text'):
+    """Path of a stored profile's report or pstats dump, or None if there is none."""
+    # Ids are uuid4 hex strings; anything else never names a profile directory
+    if fmt not in PROFILE_FILES or not re.fullmatch(r'[0-9a-f]{32}', profile_id):
+        return None
+    path = os.path.join(profile_dir(profile_id), PROFILE_FILES[fmt])
+    return path if os.path.exists(path) else None
@@ -0,0 +1,127 @@
+import heapq
+import numpy as np
+
+# Opt-in early abort of parameter sets that have clearly failed, so a sweep spends its CPU on
+# the ones that matter. The rules are checked on the portfolio value at the close of every bar
+# from the strategy's first trading bar:
+#   max_drawdown_pct - the value fell this far (in %) below its highest close so far
+#   min_equity_pct   - the value fell below this share (in %) of the initial capital
+#   top_k            - even the best possible rest of the run cannot reach the k-th best final
+#                      value of the sweep so far
+# A pruned run stops at that bar: it is reported with its value and metrics as of the stop and
+# a "Pruned" reason, is never picked as the best parameters and is not kept in the result cache.
+# The top-k bound takes the smaller of two ceilings on what the value can still gain:
+#   - cash never goes negative, so no leg of the price path (close to next open, open to close)
+#     can grow the value by more than that leg's rise in %
+#   - at most trade_size shares are bought per bar, so no more than the shares held plus one
+#     trade per bar left can ride each rising leg
+PRUNING_RULES = ('max_drawdown_pct', 'min_equity_pct', 'top_k')
+
+
+def pruning_rules(data):
+    """Read the pruning rules of a request body, or None when pruning is off."""
+    rules = data.get('pruning') or {}
+    unknown = sorted(set(rules) - set(PRUNING_RULES))
+    if unknown:
+        raise ValueError(f"Unknown pruning rules {unknown}. Choose from {PRUNING_RULES}.")
+    rules = {name: rules[name] for name in PRUNING_RULES if rules.get(name) is not None}
+    if rules.get('top_k') is not None and int(rules['top_k']) < 1:
+        raise ValueError("Pruning rule 'top_k' must be at least 1.")
+    return rules or None
+
+
+def is_pruned(row):
+    return bool(row.get("Pruned"))
+
+
+class TopValues:
+    # Final values of the k best unpruned runs so far
+    def __init__(self, k):
+        self.k = k
+        self.values = []
+
+    def add(self, rows):
+        for row in rows:
+            if is_pruned(row):
+                continue
+            value = float(row["Portfolio Value"])
+            if len(self.values) < self.k:
+                heapq.heappush(self.values, value)
+            elif value > self.values[0]:
+                heapq.heapreplace(self.values, value)
+
+    def threshold(self):
+        return self.values[0] if len(self.values) == self.k else -np.inf
+
+
+class Pruner:
+    # Checks the rules for the runs of one sweep over stock_data; reset() before every run
+    def __init__(self, rules, stock_data, initial_portfolio_value, threshold=-np.inf):
+        self.rules = rules
+        self.initial_portfolio_value = float(initial_portfolio_value)
+        self.close = stock_data['close'].to_numpy(dtype=float)
+        self.dates = stock_data.index
+        self.top_values = TopValues(int(rules['top_k'])) if rules.get('top_k') else None
+        # Workers get the sweep's threshold when their chunk is sent
+        self.fixed_threshold = threshold
+        if self.top_values is not None:
+            open_price = stock_data['open'].to_numpy(dtype=float)
+            # Legs after the close of bar i: close[i] -> open[i + 1] -> close[i + 1]
+            gap = open_price[1:] - self.close[:-1]
+            session = self.close[1:] - open_price[1:]
+            rise = np.maximum(gap, 0) + np.maximum(session, 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                growth = np.log1p(np.maximum(gap / self.close[:-1], 0)) + np.log1p(np.maximum(session / open_price[1:], 0))
+            # Suffix sums: what is still to come after the close of each bar
+            self.rise_after = np.concatenate((np.cumsum(rise[::-1])[::-1], [0.0]))
+            self.growth_after = np.concatenate((np.cumsum(np.nan_to_num(growth, posinf=np.inf)[::-1])[::-1], [0.0]))
+        self.reset()
+
+    def reset(self):
+        self.peak = self.initial_portfolio_value
+
+    def threshold(self):
+        if self.top_values is None:
+            return -np.inf
+        return max(self.fixed_threshold, self.top_values.threshold())
+
+    def record(self, rows):
+        if self.top_values is not None:
+            self.top_values.add(rows)
+
+    def check(self, first, last, cash, position, trade_size):
+        """Return (bar, reason) for the first of bars first..last that breaks a rule, or None."""
+        if last < first:
+            return None
+        value = cash + position * self.close[first:last + 1]
+        breaches = []
+        if 'max_drawdown_pct' in self.rules:
+            peak = np.maximum.accumulate(np.maximum(value, self.peak))
+            drawdown = (peak - value) / peak * 100
+            bars = np.flatnonzero(drawdown >= self.rules['max_drawdown_pct'])
+            if len(bars):
+                breaches.append((bars[0], f"max drawdown {drawdown[bars[0]]:.2f}%"))
+            self.peak = max(self.peak, float(value.max()))
+        if 'min_equity_pct' in self.rules:
+            floor = self.initial_portfolio_value * self.rules['min_equity_pct'] / 100
+            bars = np.flatnonzero(value < floor)
+            if len(bars):
+                breaches.append((bars[0], f"value {value[bars[0]]:.2f} under floor {floor:.2f}"))
+        threshold = self.threshold()
+        if threshold > -np.inf:
+            bar = np.arange(first, last + 1)
+            last_bar = len(self.close) - 1
+            by_cash = value * np.exp(self.growth_after[bar])
+            by_shares = value + (position + trade_size * (last_bar - bar)) * self.rise_after[bar]
+            bars = np.flatnonzero(np.minimum(by_cash, by_shares) < threshold)
+            if len(bars):
+                breaches.append((bars[0], f"cannot reach top {self.top_values.k} value {threshold:.2f}"))
+        if not breaches:
+            return None
+        offset, reason = min(breaches, key=lambda breach: breach[0])
+        bar = first + int(offset)
+        return bar, f"{reason} on {self.dates[bar].date()}"
+
+
+def pruning_stats(rules, rows):
+    return {"rules": rules, "pruned": sum(is_pruned(row) for row in rows)}
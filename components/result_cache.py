@@ -0,0 +1,173 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# On-disk store of sweep result rows, so a repeated request is served without replaying the grid.
+# Rows are keyed by the symbol, interval, price data fingerprint, strategy, parameters (which
+# include the trade size), initial capital and engine version. New bars change the data
+# fingerprint, so results for an older history are never served; they are purged when results
+# for the new history of the same symbol are stored by the same strategy, capital and engine.
+# BACKTEST_RESULT_CACHE=0 disables the store and BACKTEST_RESULT_CACHE_MB caps its size; the
+# least recently used rows are evicted first.
+RESULT_CACHE_PATH = os.environ.get('BACKTEST_RESULT_CACHE_PATH', os.path.join('stock_data', 'result_cache.sqlite'))
+RESULT_CACHE_ENABLED = os.environ.get('BACKTEST_RESULT_CACHE', '1') != '0'
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get('BACKTEST_RESULT_CACHE_MB', 256)) * 1024 * 1024)
+
+# Bump an engine's version whenever its result rows change, so stale rows stop matching
+ENGINE_VERSIONS = {
+    'backtrader': 1,
+    'vectorized': 1,
+    'batch': 1,
+}
+METRIC_KEYS = {"Win Rate", "Sharpe Ratio", "Max Drawdown", "IRR", "Portfolio Value", "Pruned"}
+# Keeps IN (...) lists under SQLite's bound parameter limit
+QUERY_BATCH = 500
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+@contextlib.contextmanager
+def open_store(path=None):
+    path = path or RESULT_CACHE_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        with _schema_lock:
+            if path not in _schema_ready:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS results ('
+                    'key TEXT PRIMARY KEY, symbol TEXT, interval TEXT, fingerprint TEXT, strategy TEXT, '
+                    'engine TEXT, result TEXT, size INTEGER, last_used REAL, capital TEXT)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS results_history ON results (symbol, interval, fingerprint)')
+                connection.execute(
+                    'CREATE INDEX IF NOT EXISTS results_sweep ON results (symbol, interval, strategy, engine, capital)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+                connection.commit()
+                _schema_ready.add(path)
+        # Commits on success and rolls back on error
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def batched(values):
+    for start in range(0, len(values), QUERY_BATCH):
+        yield values[start:start + QUERY_BATCH]
+
+
+class ResultCache:
+    # Per-sweep view of the store for one strategy, dataset, capital and engine
+    def __init__(self, stock_data, strategy_name, initial_portfolio_value, engine, path=None):
+        from components.indicator_cache import data_fingerprint
+        self.enabled = RESULT_CACHE_ENABLED
+        self.path = path or RESULT_CACHE_PATH
+        self.symbol = stock_data.attrs.get('symbol')
+        self.interval = stock_data.attrs.get('interval')
+        self.fingerprint = data_fingerprint(stock_data)
+        self.strategy_name = strategy_name
+        self.initial_portfolio_value = initial_portfolio_value
+        # Encoded as the key encodes it, so 100000 and "100000" stay different sweeps
+        self.capital = json.dumps(initial_portfolio_value, default=str)
+        self.engine = f"{engine}-{ENGINE_VERSIONS[engine]}"
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, params):
+        identity = [
+            self.symbol, self.interval, self.fingerprint, self.strategy_name,
+            params, self.initial_portfolio_value, self.engine,
+        ]
+        return hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+    def split(self, combinations):
+        from components.telemetry import count
+        """Return the stored rows for combinations and the combinations still to run."""
+        if not self.enabled:
+            self.misses += len(combinations)
+            count('cache_misses', len(combinations), cache='result')
+            return [], list(combinations)
+        keys = [self.key(params) for params in combinations]
+        stored = {}
+        with open_store(self.path) as connection:
+            for chunk in batched(keys):
+                placeholders = ','.join('?' * len(chunk))
+                stored.update(connection.execute(
+                    f'SELECT key, result FROM results WHERE key IN ({placeholders})', chunk
+                ).fetchall())
+                connection.execute(
+                    f'UPDATE results SET last_used = ? WHERE key IN ({placeholders})', [time.time(), *chunk]
+                )
+        cached = [json.loads(stored[key]) for key in keys if key in stored]
+        pending = [params for key, params in zip(keys, combinations) if key not in stored]
+        self.hits += len(cached)
+        self.misses += len(pending)
+        count('cache_hits', len(cached), cache='result')
+        count('cache_misses', len(pending), cache='result')
+        return cached, pending
+
+    def store(self, results):
+        if not self.enabled or not results:
+            return
+        now = time.time()
+        rows = []
+        for result in results:
+            if result.get("Pruned"):
+                continue  # Stopped early under this request's pruning rules, not a full run
+            params = {key: value for key, value in result.items() if key not in METRIC_KEYS}
+            # A finished run is stored without the pruning column, as an unpruned sweep returns it
+            encoded = json.dumps({key: value for key, value in result.items() if key != "Pruned"})
+            rows.append((
+                self.key(params), self.symbol, self.interval, self.fingerprint, self.strategy_name,
+                self.engine, encoded, len(encoded), now, self.capital,
+            ))
+        with open_store(self.path) as connection:
+            if self.symbol is not None:
+                # This sweep's rows for an older history of the symbol can no longer be hit
+                connection.execute(
+                    'DELETE FROM results WHERE symbol = ? AND interval IS ? AND strategy = ? AND engine = ? '
+                    'AND capital = ? AND fingerprint != ?',
+                    (self.symbol, self.interval, self.strategy_name, self.engine, self.capital, self.fingerprint)
+                )
+            connection.executemany(
+                'INSERT OR REPLACE INTO results (key, symbol, interval, fingerprint, strategy, engine, result, size, '
+                'last_used, capital) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+            evict(connection)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def evict(connection, max_bytes=None):
+    from components.telemetry import info
+    max_bytes = RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    # Drop the least recently used rows until the store is back to 90% of the cap
+    target = total - int(max_bytes * 0.9)
+    freed = 0
+    evicted = []
+    for key, size in connection.execute('SELECT key, size FROM results ORDER BY last_used'):
+        evicted.append(key)
+        freed += size
+        if freed >= target:
+            break
+    for chunk in batched(evicted):
+        connection.execute(f"DELETE FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+    info(f"Result cache evicted {len(evicted)} rows ({freed} bytes)")
+    return len(evicted)
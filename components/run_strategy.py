@@ -1,72 +1,57 @@
-import concurrent.futures
-import base64
-import os
+import csv
+import io
 import backtrader as bt
 import pandas as pd
-import concurrent
 
 
-def run_strategy(strategy_name, trade_size, data_feed, initial_portfolio_value, stock_data, start_date):
-    from components.backtrader_sync import run_backtrader_sync
-    from components.parameter_combinations import get_parameter_combinations
-    from components.folder_name import UPLOAD_FOLDER
+def run_best_params(strategy_name, data_feed, initial_portfolio_value, best_params, chart_format='png'):
     from components.strategy_class import create_strategy_class
+    from components.artifacts import encode
+    from components.telemetry import span
+    """Replay the best parameters for the trade log (and the chart, unless chart_format is None) and encode them."""
+    with span('best_replay'):
+        cerebro = bt.Cerebro()
+        cerebro.adddata(data_feed)
+        cerebro.broker.setcash(initial_portfolio_value)
+        Graph = create_strategy_class(strategy_name=strategy_name, stop_logic='stop_logic')
+        cerebro.addstrategy(Graph, params=best_params, chart_format=chart_format)
+        strategy = cerebro.run()[0]
 
-    results = []
-    param_names, param_combinations = get_parameter_combinations(strategy_name)
-    valid_combinations = [
-        dict(zip(param_names, combo)) for combo in param_combinations if combo[0] > combo[1]
-    ]
-    for params in valid_combinations:
-        params['Trade Size'] = trade_size
-
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        futures = {
-            executor.submit(
-                run_backtrader_sync, data_feed, strategy_name, params, initial_portfolio_value, stock_data
-            ): params for params in valid_combinations
-        }
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            results.append(result)
-
-    log_df = pd.DataFrame(results)
-    csv_robustness = f'robustness_test_{strategy_name}.csv'
-    csv_path = os.path.join(UPLOAD_FOLDER, csv_robustness)
-    log_df.to_csv(csv_path, index=False)
-
-    # Get best strategy
-    sorted_results = sorted(results, key=lambda x: float(x["Portfolio Value"]), reverse=True)
+    # The stop logic leaves the trade log and graph on the strategy as bytes
+    return encode(strategy.trade_log_csv), encode(strategy.graph_image)
+
+
+def summarize_sweep(strategy_name, results):
+    from components.artifacts import frame_csv
+    from components.telemetry import info
+    """Build the robustness CSV for a finished sweep and pick its best parameters."""
+    robustness_csv = frame_csv(pd.DataFrame(results))
+
+    filtered_params, _ = best_result(results)
+    info("Best Params:", filtered_params)
+    return robustness_csv, filtered_params
+
+
+def best_result(results):
+    # Get best strategy: the parameters and metrics of the highest final portfolio value.
+    # Runs stopped by pruning are only considered when every run was pruned.
+    finished = [result for result in results if not result.get("Pruned")] or results
+    sorted_results = sorted(finished, key=lambda x: float(x["Portfolio Value"]), reverse=True)
     highest_result = sorted_results[0]
     exclude_keys = {"Win Rate", "Sharpe Ratio", "Max Drawdown", "IRR", "Portfolio Value"}
-    filtered_params = {key: value for key, value in highest_result.items() if key not in exclude_keys}
-
-    # Backtest the best strategy
-    cerebro = bt.Cerebro()
-    cerebro.adddata(data_feed)
-    cerebro.broker.setcash(initial_portfolio_value)
-    Graph = create_strategy_class(strategy_name=strategy_name, stop_logic='stop_logic')
-    cerebro.addstrategy(Graph, params=filtered_params)
-    strategy = cerebro.run()
-
-    # Check if the file exists
-    csv_trade_log = f'static/files/trade_log_{strategy_name}.csv'
-    if os.path.exists(csv_trade_log):
-        # Read the file and encode it as Base64
-        with open(csv_trade_log, 'rb') as f:
-            encoded_trade_log = base64.b64encode(f.read()).decode('utf-8')
-    
-    graph_img = f'static/files/{strategy_name}_strategy_graph.png'
-    if os.path.exists(graph_img):
-        with open(graph_img, "rb") as image_file:
-            encoded_graph = base64.b64encode(image_file.read()).decode('utf-8')
-
-    # Encode CSV file as base64
-    csv_robustness = f'static/files/robustness_test_{strategy_name}.csv'
-    if os.path.exists(graph_img):
-        with open(csv_robustness, "rb") as f:
-            encoded_robustness_logs = base64.b64encode(f.read()).decode('utf-8')
-        
+    filtered_params = {
+        key: value for key, value in highest_result.items() if key not in exclude_keys and key != "Pruned"
+    }
+    metrics = {key: value for key, value in highest_result.items() if key in exclude_keys}
+    return filtered_params, metrics
+
+
+def strategy_report(strategy_name, trade_size, start_date, robustness_csv, artifacts, sweep_stats, chart=None):
+    from components.artifacts import encode
+    encoded_trade_log, encoded_graph = artifacts
+    # Encode CSV bytes as base64
+    encoded_robustness_logs = encode(robustness_csv)
+
     backtest_results = {
         "Strategy name": strategy_name,
         "Start Date": start_date,
@@ -74,5 +59,75 @@ def run_strategy(strategy_name, trade_size, data_feed, initial_portfolio_value,
         "Robustness Test": encoded_robustness_logs,
         "Trade Log": encoded_trade_log,
         "Graph Img": encoded_graph,
+        "Chart": chart,
+        **sweep_stats,
     }
-    return backtest_results
\ No newline at end of file
+    return backtest_results
+
+
+def run_strategy(strategy_name, trade_size, data_feed, initial_portfolio_value, stock_data, start_date, engine='backtrader',
+                 progress=None, search=None, chart='handle'):
+    from components.run_sweep import run_sweep
+    from components.worker_pool import submit_to_pool
+    from components.charts import register_chart
+    from components.telemetry import run_traced, collect, info
+
+    results, sweep_stats = run_sweep(
+        strategy_name, trade_size, data_feed, initial_portfolio_value, stock_data, engine, progress, search
+    )
+    robustness_csv, best_params = summarize_sweep(strategy_name, results)
+    if progress is not None:
+        progress.check()
+
+    # Backtest the best strategy on the shared pool: the stop logic draws with pyplot, which
+    # is not thread safe, and the worker already has backtrader and matplotlib imported.
+    # Unless the chart is wanted inline it is only drawn when its handle is fetched.
+    artifacts = collect(submit_to_pool(
+        run_traced, run_best_params, strategy_name, data_feed, initial_portfolio_value, best_params,
+        'png' if chart == 'inline' else None
+    ))
+    chart_link = register_chart(stock_data, strategy_name, initial_portfolio_value, best_params)
+    return strategy_report(strategy_name, trade_size, start_date, robustness_csv, artifacts, sweep_stats, chart_link)
+
+
+def stream_strategy(strategy_name, trade_size, data_feed, initial_portfolio_value, stock_data, start_date,
+                    engine='backtrader', progress=None, search=None, chart='handle'):
+    from components.run_sweep import stream_sweep
+    from components.worker_pool import submit_to_pool
+    from components.charts import register_chart
+    from components.telemetry import run_traced, collect, info
+    """Yield a "result" event per sweep row as it finishes, then a "summary" event with the report."""
+    # Rows go straight into the robustness CSV buffer and only the best one is kept as a dict
+    sweep_stats = {}
+    best = None
+    combinations = 0
+    with io.StringIO() as f:
+        writer = None
+        for batch in stream_sweep(
+            strategy_name, trade_size, initial_portfolio_value, stock_data, engine, sweep_stats, progress, search
+        ):
+            for row in batch:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row), lineterminator='\n')
+                    writer.writeheader()
+                writer.writerow(row)
+                # Strictly greater keeps the first of equal rows, as best_result does; finished runs beat pruned ones
+                if best is None or (not row.get("Pruned"), float(row["Portfolio Value"])) > (
+                    not best.get("Pruned"), float(best["Portfolio Value"])
+                ):
+                    best = row
+                combinations += 1
+                yield {"event": "result", "row": row}
+        robustness_csv = f.getvalue().encode('utf-8')
+
+    best_params, metrics = best_result([best])
+    info("Best Params:", best_params)
+    if progress is not None:
+        progress.check()
+    artifacts = collect(submit_to_pool(
+        run_traced, run_best_params, strategy_name, data_feed, initial_portfolio_value, best_params,
+        'png' if chart == 'inline' else None
+    ))
+    chart_link = register_chart(stock_data, strategy_name, initial_portfolio_value, best_params)
+    report = strategy_report(strategy_name, trade_size, start_date, robustness_csv, artifacts, sweep_stats, chart_link)
+    yield {"event": "summary", "Combinations": combinations, "Best Params": best_params, **metrics, **report}
@@ -0,0 +1,268 @@
+import collections
+import concurrent.futures
+import math
+import time
+
+SWEEP_ENGINES = ('backtrader', 'vectorized', 'batch')
+
+# Backtrader sweeps send combinations to the workers in chunks sized to take about
+# TARGET_CHUNK_SECONDS, using the per-combination runtime measured for each strategy
+TARGET_CHUNK_SECONDS = 0.5
+INITIAL_CHUNK_SIZE = 2
+MAX_CHUNK_SIZE = 64
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+# {(strategy_name, engine): seconds per combination}, also used to order the sweeps of a request
+combo_seconds = {}
+# Vectorized sweeps hand back this many combinations at a time
+VECTORIZED_BATCH_SIZE = 32
+
+
+def chunk_size(strategy_name, unsubmitted, workers):
+    seconds = combo_seconds.get((strategy_name, 'backtrader'))
+    if seconds is None:
+        return INITIAL_CHUNK_SIZE  # Small first chunks measure the strategy quickly
+    size = min(MAX_CHUNK_SIZE, max(1, int(TARGET_CHUNK_SECONDS / max(seconds, 1e-6))))
+    # Near the end of the sweep, split what is left so every worker gets a share
+    return max(1, min(size, math.ceil(unsubmitted / workers)))
+
+
+def record_chunk_runtime(strategy_name, elapsed, combos, engine='backtrader'):
+    if not combos:
+        return
+    seconds = elapsed / combos
+    previous = combo_seconds.get((strategy_name, engine))
+    combo_seconds[(strategy_name, engine)] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+
+
+def dispatch_sweeps(executor, sweeps, initial_portfolio_value, on_error=None, progress=None, pruning=None,
+                    scored=None):
+    from components.backtrader_sync import run_backtrader_chunk
+    from components.pruning import TopValues
+    from components.telemetry import observe, run_traced, collect
+    from components.profiling import active_profile
+    """Run (key, strategy_name, combinations, price_handle) sweeps on the pool in chunks, yielding (key, results) per chunk."""
+    # A failing chunk raises, unless on_error is given: then on_error(key, exception) is called
+    # and the rest of that sweep is dropped while the other sweeps carry on.
+    # A cancelled job's progress stops the dispatch: queued chunks are cancelled and JobCancelled raised.
+    # With pruning rules, every chunk is sent with its sweep's top-k threshold so far; scored
+    # gives the rows each sweep already has (e.g. from the result cache) to start the top-k from.
+    # A profiled request has the workers profile a sample of the combinations of every chunk.
+    # The workers' combo spans come back with each chunk; the sweep's wall time is one dispatch span
+    start_time = time.perf_counter()
+    profile = active_profile()
+    profiling = {'profile_sample': profile.sample} if profile is not None else {}
+    pending = collections.deque(sweep for sweep in sweeps if sweep[2])
+    unsubmitted = sum(len(combinations) for _, _, combinations, _ in pending)
+    workers = executor.max_workers
+    in_flight = {}
+    failed = set()
+    top_values = {}
+    if pruning and pruning.get('top_k'):
+        for key, _, _, _ in pending:
+            top_values[key] = TopValues(int(pruning['top_k']))
+            top_values[key].add((scored or {}).get(key, []))
+    while pending or in_flight:
+        if progress is not None and progress.cancelled():
+            for future in in_flight:
+                future.cancel()
+            progress.check()
+        # Only a few chunks are queued per worker, so sizes follow the latest measurements and
+        # work submitted later (like a best-params replay) does not wait behind the whole grid
+        while pending and len(in_flight) < workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+            key, name, combinations, price_handle = pending.popleft()
+            size = chunk_size(name, unsubmitted, workers)
+            chunk, rest = combinations[:size], combinations[size:]
+            if rest:
+                pending.appendleft((key, name, rest, price_handle))
+            unsubmitted -= len(chunk)
+            if pruning:
+                threshold = top_values[key].threshold() if key in top_values else -math.inf
+                future = executor.submit(
+                    run_traced, run_backtrader_chunk, price_handle, name, chunk, initial_portfolio_value, pruning,
+                    threshold, **profiling
+                )
+            else:
+                future = executor.submit(
+                    run_traced, run_backtrader_chunk, price_handle, name, chunk, initial_portfolio_value, **profiling
+                )
+            in_flight[future] = (key, name)
+
+        done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            key, name = in_flight.pop(future)
+            try:
+                if profile is not None:
+                    results, elapsed, worker_profile = collect(future)
+                    profile.add_worker(worker_profile)
+                else:
+                    results, elapsed = collect(future)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                if key not in failed:
+                    failed.add(key)
+                    unsubmitted -= sum(len(sweep[2]) for sweep in pending if sweep[0] == key)
+                    pending = collections.deque(sweep for sweep in pending if sweep[0] != key)
+                    on_error(key, e)
+                continue
+            if key in failed:
+                continue
+            record_chunk_runtime(name, elapsed, len(results))
+            if key in top_values:
+                top_values[key].add(results)
+            if progress is not None:
+                progress.advance(len(results))
+            yield key, results
+    observe('dispatch', time.perf_counter() - start_time, engine='backtrader')
+
+
+def run_sweep(strategy_name, trade_size, data_feed, initial_portfolio_value, stock_data, engine='backtrader',
+              progress=None, search=None):
+    """Run the whole grid (or the budgeted search in search) and return (results, sweep_stats)."""
+    sweep_stats = {}
+    results = []
+    for batch in stream_sweep(
+        strategy_name, trade_size, initial_portfolio_value, stock_data, engine, sweep_stats, progress, search
+    ):
+        results.extend(batch)
+    return results, sweep_stats
+
+
+def stream_sweep(strategy_name, trade_size, initial_portfolio_value, stock_data, engine, sweep_stats, progress=None,
+                 search=None):
+    from components.parameter_combinations import get_valid_combinations
+    from components.result_cache import ResultCache
+    from components.optimizers import is_search, stream_search, strategy_ranges
+    from components.pruning import pruning_stats
+    from components.telemetry import info
+    """Yield the grid's result rows in batches as they finish, cached rows first; sweep_stats is filled in at the end."""
+    if engine not in SWEEP_ENGINES:
+        raise ValueError(f"Sweep engine '{engine}' not found. Choose one of {SWEEP_ENGINES}.")
+    if is_search(search):
+        yield from stream_search(
+            strategy_name, trade_size, initial_portfolio_value, stock_data, engine, sweep_stats, search, progress
+        )
+        return
+    pruning = (search or {}).get('pruning')
+    scored = []
+
+    valid_combinations = get_valid_combinations(strategy_name, trade_size, strategy_ranges(search, strategy_name))
+    # Combinations already scored on this exact price history are read back from disk
+    result_cache = ResultCache(stock_data, strategy_name, initial_portfolio_value, engine)
+    cached, pending = result_cache.split(valid_combinations)
+    if progress is not None:
+        progress.add_total(len(valid_combinations))
+        progress.advance(len(cached))
+    if cached:
+        if pruning:
+            # Cached rows ran to the end; the column is filled in so every row has the same fields
+            for row in cached:
+                row.setdefault("Pruned", "")
+            scored.extend(cached)
+        yield cached
+    if pending:
+        for batch in iter_combinations(
+            strategy_name, pending, initial_portfolio_value, stock_data, engine, sweep_stats, progress, pruning,
+            cached
+        ):
+            result_cache.store(batch)
+            if pruning:
+                for row in batch:
+                    row.setdefault("Pruned", "")
+                scored.extend(batch)
+            yield batch
+    if pruning:
+        sweep_stats["Pruning"] = pruning_stats(pruning, scored)
+        info(f"Pruning for {strategy_name}: {sweep_stats['Pruning']}")
+    sweep_stats["Result Cache"] = result_cache.stats()
+    info(f"Result cache for {strategy_name}: {sweep_stats['Result Cache']}")
+
+
+def iter_combinations(strategy_name, valid_combinations, initial_portfolio_value, stock_data, engine, sweep_stats,
+                      progress=None, pruning=None, scored=()):
+    from components.vectorized_sync import run_vectorized_sync
+    from components.batch_sweep import run_batch_sweep
+    from components.indicator_cache import IndicatorCache
+    from components.formulas import metrics_context
+    from components.worker_pool import leased_worker_pool
+    from components.shared_prices import shared_prices
+    from components.pruning import Pruner
+    from components.telemetry import observe, count, info
+    """Yield result rows of valid_combinations in batches as they finish; sweep_stats is filled in at the end."""
+    # pruning rules stop hopeless runs early (the batch engine scores whole grids in lockstep and
+    # ignores them); scored holds rows the sweep already has, to start the top-k from
+
+    if engine == 'vectorized':
+        # A NumPy combo costs milliseconds, less than shipping it to a worker process,
+        # so the whole sweep reads from one indicator cache in this process
+        indicator_cache = IndicatorCache(stock_data)
+        context = metrics_context(stock_data)
+        pruner = None
+        if pruning:
+            pruner = Pruner(pruning, stock_data, initial_portfolio_value)
+            pruner.record(scored)
+        start_time = time.perf_counter()
+        compute_seconds = 0.0
+        for start in range(0, len(valid_combinations), VECTORIZED_BATCH_SIZE):
+            batch_combinations = valid_combinations[start:start + VECTORIZED_BATCH_SIZE]
+            results = []
+            for params in batch_combinations:
+                if progress is not None:
+                    progress.check()
+                combo_start = time.perf_counter()
+                result = run_vectorized_sync(
+                    stock_data, strategy_name, params, initial_portfolio_value, indicator_cache, context, pruner=pruner
+                )
+                compute_seconds += time.perf_counter() - combo_start
+                if pruner is not None:
+                    pruner.record([result])
+                results.append(result)
+                if progress is not None:
+                    progress.advance(1)
+            yield results
+        observe('dispatch', time.perf_counter() - start_time, engine=engine)
+        record_chunk_runtime(strategy_name, compute_seconds, len(valid_combinations), engine)
+        sweep_stats["Indicator Cache"] = indicator_cache.stats()
+        count('cache_hits', indicator_cache.hits, cache='indicator')
+        count('cache_misses', indicator_cache.misses, cache='indicator')
+        info(f"Indicator cache for {strategy_name}: {sweep_stats['Indicator Cache']}")
+        return
+
+    if engine == 'batch':
+        # The whole grid is scored as (combos x bars) matrices, chunked under a memory cap
+        if progress is not None:
+            progress.check()
+        if pruning:
+            info(f"Pruning is not applied by the batch engine; {strategy_name} runs every bar")
+        indicator_cache = IndicatorCache(stock_data)
+        start_time = time.perf_counter()
+        results, sweep_stats["Batch"] = run_batch_sweep(
+            stock_data, strategy_name, valid_combinations, initial_portfolio_value, indicator_cache
+        )
+        elapsed = time.perf_counter() - start_time
+        observe('dispatch', elapsed, engine=engine)
+        record_chunk_runtime(strategy_name, elapsed, len(results), engine)
+        count('combos', len(results), engine=engine)
+        if progress is not None:
+            progress.advance(len(results))
+        sweep_stats["Indicator Cache"] = indicator_cache.stats()
+        count('cache_hits', indicator_cache.hits, cache='indicator')
+        count('cache_misses', indicator_cache.misses, cache='indicator')
+        info(f"Batch sweep for {strategy_name}: {sweep_stats}")
+        yield results
+        return
+
+    # The prices are published once for the sweep; each chunk only pickles a small handle
+    chunks = 0
+    combos = 0
+    with leased_worker_pool() as executor, shared_prices(stock_data) as price_handle:
+        sweeps = [(strategy_name, strategy_name, valid_combinations, price_handle)]
+        for _, chunk_results in dispatch_sweeps(
+            executor, sweeps, initial_portfolio_value, progress=progress, pruning=pruning,
+            scored={strategy_name: list(scored)}
+        ):
+            chunks += 1
+            combos += len(chunk_results)
+            yield chunk_results
+    sweep_stats["Dispatch"] = {"chunks": chunks, "combos_per_chunk": round(combos / chunks, 2) if chunks else 0}
+    info(f"Dispatch for {strategy_name}: {sweep_stats['Dispatch']}")
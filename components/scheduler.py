@@ -0,0 +1,109 @@
+import concurrent.futures
+
+# Runs several strategies over the same stock data on the shared worker pool.
+# Every (strategy, combination) task goes into the one pool, in chunks, with the costliest
+# sweeps first so the long ones are not left running alone at the end. As soon as a
+# strategy's last combination finishes, its best parameters are replayed for the trade log
+# and graph while the other sweeps keep the remaining workers busy.
+
+
+def sweep_cost(strategy_name, valid_combinations, engine='backtrader'):
+    from components.run_sweep import combo_seconds
+    # Estimated seconds: the grid size times the per-combination runtime measured for the strategy
+    # on this engine. A strategy not measured yet is assumed to cost the average of those that were.
+    measured = [seconds for (_, other), seconds in combo_seconds.items() if other == engine]
+    default = sum(measured) / len(measured) if measured else 1.0
+    return len(valid_combinations) * combo_seconds.get((strategy_name, engine), default)
+
+
+def run_all_strategies(strategy_names, trade_size, data_feed, initial_portfolio_value, stock_data, start_date,
+                       engine='backtrader', progress=None, search=None, chart='handle'):
+    from components.parameter_combinations import get_valid_combinations
+    from components.optimizers import is_search, strategy_ranges
+    from components.pruning import pruning_stats
+    from components.charts import register_chart
+    from components.run_sweep import run_sweep, dispatch_sweeps, SWEEP_ENGINES
+    from components.run_strategy import run_best_params, summarize_sweep, strategy_report
+    from components.shared_prices import shared_prices
+    from components.result_cache import ResultCache
+    from components.worker_pool import leased_worker_pool, submit_to_pool
+    from components.telemetry import run_traced, collect, info
+    """Sweep every strategy through one scheduler and return their reports in completion order."""
+    if engine not in SWEEP_ENGINES:
+        raise ValueError(f"Sweep engine '{engine}' not found. Choose one of {SWEEP_ENGINES}.")
+
+    grids = {
+        name: get_valid_combinations(name, trade_size, strategy_ranges(search, name)) for name in strategy_names
+    }
+    order = sorted(strategy_names, key=lambda name: sweep_cost(name, grids[name], engine), reverse=True)
+    info(f"Scheduling strategies: {[(name, len(grids[name])) for name in order]}")
+
+    finalising = {}
+    sweeps = {}
+
+    def finalise(strategy_name, results, sweep_stats):
+        robustness_csv, best_params = summarize_sweep(strategy_name, results)
+        future = submit_to_pool(
+            run_traced, run_best_params, strategy_name, data_feed, initial_portfolio_value, best_params,
+            'png' if chart == 'inline' else None
+        )
+        finalising[future] = strategy_name
+        chart_link = register_chart(stock_data, strategy_name, initial_portfolio_value, best_params)
+        sweeps[strategy_name] = (robustness_csv, sweep_stats, chart_link)
+
+    if engine == 'backtrader' and not is_search(search):
+        # Rows already scored on this price history come from the result cache; only the rest is queued
+        caches = {name: ResultCache(stock_data, name, initial_portfolio_value, engine) for name in order}
+        stored, pending = {}, {}
+        for name in order:
+            stored[name], pending[name] = caches[name].split(grids[name])
+        pruning = (search or {}).get('pruning')
+        if progress is not None:
+            progress.add_total(sum(len(grids[name]) for name in order))
+            progress.advance(sum(len(stored[name]) for name in order))
+        fresh = {name: [] for name in order}
+        chunks = {name: 0 for name in order}
+
+        def sweep_done(name):
+            caches[name].store(fresh[name])
+            sweep_stats = {}
+            if chunks[name]:
+                sweep_stats["Dispatch"] = {"chunks": chunks[name], "combos_per_chunk": round(len(fresh[name]) / chunks[name], 2)}
+            if pruning:
+                sweep_stats["Pruning"] = pruning_stats(pruning, fresh[name])
+            sweep_stats["Result Cache"] = caches[name].stats()
+            finalise(name, stored[name] + fresh[name], sweep_stats)
+
+        # Rank by the work left once cached rows are taken out
+        queued = sorted(
+            (name for name in order if pending[name]),
+            key=lambda name: sweep_cost(name, pending[name], engine), reverse=True
+        )
+        for name in order:
+            if not pending[name]:
+                sweep_done(name)
+        if queued:
+            with leased_worker_pool() as executor, shared_prices(stock_data) as price_handle:
+                queue = [(name, name, pending[name], price_handle) for name in queued]
+                for name, chunk_results in dispatch_sweeps(
+                    executor, queue, initial_portfolio_value, progress=progress, pruning=pruning, scored=stored
+                ):
+                    fresh[name].extend(chunk_results)
+                    chunks[name] += 1
+                    if len(fresh[name]) == len(pending[name]):
+                        sweep_done(name)
+    else:
+        # The NumPy engines and budgeted searches sweep one strategy at a time; each replay runs on the pool meanwhile
+        for name in order:
+            finalise(name, *run_sweep(
+                name, trade_size, data_feed, initial_portfolio_value, stock_data, engine, progress, search
+            ))
+
+    master_results = []
+    for future in concurrent.futures.as_completed(finalising):
+        name = finalising[future]
+        robustness_csv, sweep_stats, chart_link = sweeps[name]
+        master_results.append(strategy_report(
+            name, trade_size, start_date, robustness_csv, collect(future), sweep_stats, chart_link
+        ))
+    return master_results
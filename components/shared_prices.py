@@ -0,0 +1,80 @@
+import contextlib
+import gc
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+# Price history handed to sweep workers through one shared memory block per sweep.
+# The block holds the datetime index as int64 nanoseconds followed by every price column
+# as float64, one row per column, so each column is a contiguous slice. Tasks only carry a
+# small handle; a worker maps the block for each chunk, rebuilds the DataFrame around it without
+# copying and unmaps it when the chunk is done, so nothing stays mapped once the sweep ends.
+
+
+def publish_prices(stock_data):
+    columns = list(stock_data.columns)
+    rows = len(stock_data)
+    index = stock_data.index
+    block = shared_memory.SharedMemory(create=True, size=max(1, (len(columns) + 1) * rows * 8))
+    index_values = np.ndarray((rows,), dtype=np.int64, buffer=block.buf)
+    index_values[:] = index.asi8
+    values = np.ndarray((len(columns), rows), dtype=np.float64, buffer=block.buf, offset=rows * 8)
+    for position, column in enumerate(columns):
+        values[position] = stock_data[column].to_numpy(dtype=float)
+
+    handle = {
+        "name": block.name,
+        "rows": rows,
+        "columns": columns,
+        "index_name": index.name,
+        "tz": str(index.tz) if getattr(index, 'tz', None) is not None else None,
+    }
+    return block, handle
+
+
+def release_prices(block):
+    block.close()
+    block.unlink()
+
+
+@contextlib.contextmanager
+def shared_prices(stock_data):
+    from components.telemetry import debug
+    """Publish stock_data for the duration of a sweep and free it afterwards."""
+    block, handle = publish_prices(stock_data)
+    debug(f"Published {block.size} bytes of price data as {block.name}")
+    try:
+        yield handle
+    finally:
+        release_prices(block)
+
+
+def frame_from_block(block, handle):
+    rows, columns = handle["rows"], handle["columns"]
+    index_values = np.ndarray((rows,), dtype=np.int64, buffer=block.buf)
+    index = pd.DatetimeIndex(index_values.view('datetime64[ns]'), name=handle["index_name"])
+    if handle["tz"]:
+        index = index.tz_localize('UTC').tz_convert(handle["tz"])
+    values = np.ndarray((len(columns), rows), dtype=np.float64, buffer=block.buf, offset=rows * 8)
+    # The transposed view becomes the frame's single float block as is
+    return pd.DataFrame(values.T, index=index, columns=columns, copy=False)
+
+
+def with_attached_prices(handle, fn, *args, **kwargs):
+    """Call fn(stock_data, *args, **kwargs) on the published prices and unmap them afterwards."""
+    block = shared_memory.SharedMemory(name=handle["name"])
+    try:
+        stock_data = frame_from_block(block, handle)
+        result = fn(stock_data, *args, **kwargs)
+        del stock_data
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            # Backtrader's feeds and cerebros keep views on the block in reference cycles
+            gc.collect()
+            try:
+                block.close()
+            except BufferError:
+                pass  # A view outlived the chunk; the block is unmapped when it is collected
+    return result
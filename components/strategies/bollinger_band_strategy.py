@@ -1,14 +1,12 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals
+import components.vectorized_indicators as vi
 
 # Bollinger Bands Strategy
 bollingerband_parameter_ranges = {
@@ -44,21 +42,23 @@ def bollingerband_next_logic(self):
         elif self.position and close > upper_band:
             self.order = self.sell(size=self.position.size)
 
+def bollingerband_vectorized_logic(cache, params):
+    close = cache.line('close')
+    mid_band = cache.get('sma', params["Window Period"])
+    stddev = params["Devfactor"] * cache.get('stddev', params["Window Period"])
+    return {
+        "buy": close < mid_band - stddev,
+        "sell": close > mid_band + stddev,
+        "start": params["Window Period"] - 1,
+        "accumulate": True,
+    }
+
 def bollingerband_stop_logic(self):
         # This method is used for visualization after the strategy finishes
-        # print(f"Upper band: {self.bb.lines.top.array}")
-        data = pd.DataFrame({
-            'Close': self.data.close.array,
-            'Upper Band': self.bb.lines.top.array,
-            'Lower Band': self.bb.lines.bot.array
-        }, index=self.data.datetime.array)
-        # print(f"before line 203: {data.index}")
-        data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
-        # print(f"after line 203: {data.index}")
+        data = decimate(plot_frame(self, {'Upper Band': self.bb.lines.top, 'Lower Band': self.bb.lines.bot}))
 
         # Extract buy and sell signal data points
-        buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-        sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
+        buy_signals, sell_signals = trade_signals(self.log_data)
 
         plt.figure(figsize=(12, 6))
         plt.plot(data.index, data['Close'], label='Close Price', color='blue', linewidth=0.3)
@@ -83,9 +83,5 @@ def bollingerband_stop_logic(self):
         plt.title(f'Bollinger Band Strategy (Window Period: {self.params["Window Period"]}, Devfactor: {self.params["Devfactor"]})')
         plt.legend()
         plt.tight_layout()
-        # Save the figure to a file
-        output_filename = f'bollinger_band_strategy_graph.png'
-        graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        plt.savefig(graph_path, dpi=100)
-        print(f"Plot saved to {output_filename}")
-        plt.close()  # Free memory
\ No newline at end of file
+        # Keep the figure as image bytes for the report
+        self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
@@ -1,14 +1,12 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals
+import components.vectorized_indicators as vi
 
 # Ichimoku Clouds Strategy
 ichimoku_parameter_ranges = {
@@ -46,25 +44,34 @@ def ichimoku_next_logic(self):
             if self.position:
                 self.order = self.sell(size=self.position.size)
 
-def ichimoku_stop_logic(self):
-        # This method is used for visualization after the strategy finishes
-        data = pd.DataFrame({
-            'Close': self.data.close.array,
-            'Conversion Line': self.lines.conversion_line.array,
-            'Base Line': self.lines.base_line.array,
-            'Leading Span A': self.lines.leading_span_a.array,
-            'Leading Span B': self.lines.leading_span_b.array,
-        }, index=self.data.datetime.array)
-        # print(data)
+def ichimoku_vectorized_logic(cache, params):
+    close = cache.line('close')
+
+    def midpoint(period):
+        return (cache.get('highest', period, 'high') + cache.get('lowest', period, 'low')) / 2
 
-        data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
-        # print(data.index)
+    conversion_line = midpoint(params["Conversion Line Period"])
+    base_line = midpoint(params["Base Line Period"])
+    leading_span_a = (conversion_line + base_line) / 2
+    leading_span_b = midpoint(params["Leading Span B Period"])
+    return {
+        "buy": (close > leading_span_a) & (close > leading_span_b),
+        "sell": (close < leading_span_a) & (close < leading_span_b),
+        "start": max(params["Base Line Period"], params["Conversion Line Period"], params["Leading Span B Period"]) - 1,
+        "accumulate": False,
+    }
 
-        data = data.dropna(subset=['Leading Span A', 'Leading Span B'])
+def ichimoku_stop_logic(self):
+        # This method is used for visualization after the strategy finishes
+        data = decimate(plot_frame(self, {
+            'Conversion Line': self.lines.conversion_line,
+            'Base Line': self.lines.base_line,
+            'Leading Span A': self.lines.leading_span_a,
+            'Leading Span B': self.lines.leading_span_b,
+        }, dropna=['Leading Span A', 'Leading Span B']))
 
         # Extract buy and sell signal data points
-        buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-        sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
+        buy_signals, sell_signals = trade_signals(self.log_data)
 
         plt.figure(figsize=(12, 6))
         plt.plot(data.index, data['Close'], label='Close Price', color='blue', linewidth=0.9)
@@ -115,9 +122,5 @@ def ichimoku_stop_logic(self):
         plt.title(f"Ichimoku Clouds Strategy (Base Line: {self.params['Base Line Period']}, Conversion Line: {self.params['Conversion Line Period']}, Leading Span B: {self.params['Leading Span B Period']})")
         plt.legend()
         plt.tight_layout()
-        # Save the figure to a file
-        output_filename = f'ichimoku_clouds_strategy_graph.png'
-        graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        plt.savefig(graph_path, dpi=100)
-        print(f"Plot saved to {output_filename}")
-        plt.close()  # Free memory
\ No newline at end of file
+        # Keep the figure as image bytes for the report
+        self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
@@ -1,14 +1,13 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals, indicator_signals
+from components.telemetry import debug
+import components.vectorized_indicators as vi
 
 # Define parameter ranges
 macd_parameter_ranges = {
@@ -40,34 +39,33 @@ def macd_next_logic(self):
         self.order = self.sell(size=self.position.size)
         self.macd_signals.append({'Date': self.datas[0].datetime.date(0), 'Type': 'SELL', 'MACD': self.indicators["macd"][0]})
 
-def macd_stop_logic(self):
-    # Create a DataFrame for MACD and signals
-    data = pd.DataFrame({
-        'Close': self.data.close.array,
-        'MACD': self.indicators["macd"].array,
-        'Signal': self.indicators["signal"].array,
-        'Histogram': self.indicators["histogram"].array
-    }, index=self.data.datetime.array)
-    data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
+def macd_vectorized_logic(cache, params):
+    fast, slow, signal = params["Fast Window Period"], params["Slow Window Period"], params["Signal Window Period"]
+    macd_source = f"macd({fast},{slow})"
+    macd_line = cache.derive(macd_source, lambda: cache.get('ema', fast) - cache.get('ema', slow))
+    signal_line = cache.get('ema', signal, macd_source)
+    previous_macd, previous_signal = vi.shift(macd_line), vi.shift(signal_line)
+    return {
+        "buy": (macd_line > signal_line) & (previous_macd <= previous_signal) & (macd_line < 0),
+        "sell": (macd_line < signal_line) & (previous_macd >= previous_signal) & (macd_line > 0),
+        "start": slow + signal - 2,
+        "accumulate": True,
+    }
 
-    data = data.dropna(subset=['MACD'])
-    logged_trade_dates = {entry['Date'] for entry in self.log_data}
+def macd_stop_logic(self):
+    # Close and MACD lines by bar date, thinned for drawing
+    data = decimate(plot_frame(self, {
+        'MACD': self.indicators["macd"],
+        'Signal': self.indicators["signal"],
+        'Histogram': self.indicators["histogram"],
+    }, dropna=['MACD']))
 
     # Extract buy and sell signal data points
-    buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-    sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
-
-    buy_signals_macd = pd.DataFrame([
-        {'Date': entry['Date'], 'MACD': entry['MACD']} 
-        for entry in self.macd_signals if entry['Type'] == 'BUY'
-    ])
-    sell_signals_macd = pd.DataFrame([
-        {'Date': entry['Date'], 'MACD': entry['MACD']} 
-        for entry in self.macd_signals if entry['Type'] == 'SELL'
-    ])
-    print(f"sell signal: {sell_signals_macd}")
+    buy_signals, sell_signals = trade_signals(self.log_data)
+    buy_signals_macd = indicator_signals(self.macd_signals, 'MACD', 'BUY')
+    sell_signals_macd = indicator_signals(self.macd_signals, 'MACD', 'SELL')
+    debug("sell signal:", sell_signals_macd)
 
-    # print(f"buy signal macd: {buy_signals_macd}")
     plt.figure(figsize=(12, 6))
 
     # Plot stock close price
@@ -101,9 +99,5 @@ def macd_stop_logic(self):
     plt.title(f"MACD and Signal Line with Buy/Sell Signals (Slow window: {self.params['Slow Window Period']}, Fast window: {self.params['Fast Window Period']}, Signal window: {self.params['Signal Window Period']})")
     plt.legend()
     plt.tight_layout()
-    # Save the figure to a file
-    output_filename = f'macd_strategy_graph.png'
-    graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-    plt.savefig(graph_path, dpi=100)
-    print(f"Plot saved to {output_filename}")
-    plt.close()  # Free memory
\ No newline at end of file
+    # Keep the figure as image bytes for the report
+    self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
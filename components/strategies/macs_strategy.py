@@ -1,14 +1,12 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals
+import components.vectorized_indicators as vi
 
 # Define parameter ranges
 macs_parameter_ranges = {
@@ -34,21 +32,22 @@ def macs_next_logic(self):
         elif self.crossover < 0 and self.position:
             self.order = self.sell(size=self.position.size)
 
+def macs_vectorized_logic(cache, params):
+    crossover = vi.crossover(cache.get('sma', params["Short Term"]), cache.get('sma', params["Long Term"]))
+    return {
+        "buy": crossover > 0,
+        "sell": crossover < 0,
+        # CrossOver looks one bar back, so it needs one bar more than the long MA
+        "start": params["Long Term"],
+        "accumulate": True,
+    }
+
 def macs_stop_logic(self):
         # This method is used for visualization after the strategy finishes
-        data = pd.DataFrame({
-            'Close': self.data.close.array,
-            'Short MA': self.short_ma.array,
-            'Long MA': self.long_ma.array,
-        }, index=self.data.datetime.array)
-        # print(data)
-
-        data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
-        # print(data.index)
+        data = decimate(plot_frame(self, {'Short MA': self.short_ma, 'Long MA': self.long_ma}))
 
         # Extract buy and sell signal data points
-        buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-        sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
+        buy_signals, sell_signals = trade_signals(self.log_data)
 
         plt.figure(figsize=(12, 6))
         plt.plot(data.index, data['Close'], label='Close Price', color='blue', linewidth=0.3)
@@ -71,9 +70,5 @@ def macs_stop_logic(self):
         plt.title(f"Moving Average Crossover Strategy(Long Term: {self.params['Long Term']}, Short Term: {self.params['Short Term']})")
         plt.legend()
         plt.tight_layout()
-        # Save the figure to a file
-        output_filename = f'macs_strategy_graph.png'
-        graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        plt.savefig(graph_path, dpi=100)
-        print(f"Plot saved to {output_filename}")
-        plt.close()  # Free memory
\ No newline at end of file
+        # Keep the figure as image bytes for the report
+        self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
@@ -1,14 +1,12 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals
+import components.vectorized_indicators as vi
 
 # Parabolic SAR
 parabolic_sar_parameter_ranges = {
@@ -32,22 +30,26 @@ def parabolic_sar_next_logic(self):
         if self.data.close[0] < self.sar[0] and self.position:
             self.order = self.sell(size=self.position.size)
 
-def parabolic_sar_stop_logic(self):
-    data = pd.DataFrame({
-        'Close': self.data.close.array,
-        'Parabolic SAR': self.sar.array,
-     }, index=self.data.datetime.array)
-    # print(data)
-
-    data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
-    # print(data.index)
+def parabolic_sar_vectorized_logic(cache, params):
+    close = cache.line('close')
+    af, afmax = params["Acceleration Factor Period"], params["Maximum Acceleration Factor Period"]
+    sar = cache.derive(
+        f"psar({af},{afmax})",
+        lambda: vi.parabolic_sar(cache.line('high'), cache.line('low'), close, af=af, afmax=afmax)
+    )
+    return {
+        "buy": close > sar,
+        "sell": close < sar,
+        "start": 1,
+        "accumulate": False,
+    }
 
-    # data = data.dropna(subset=['Leading Span A', 'Leading SpanB'])
+def parabolic_sar_stop_logic(self):
+    data = decimate(plot_frame(self, {'Parabolic SAR': self.sar}))
 
     # Extract buy and sell signal data points
-    buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-    sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
-    
+    buy_signals, sell_signals = trade_signals(self.log_data)
+
     plt.figure(figsize=(12, 6))
     plt.plot(data.index, data["Close"], label="Close Price", color="blue", linewidth=0.5)
     plt.scatter(data.index, data["Parabolic SAR"], label="Parabolic SAR", color="red", s=3, marker="o")
@@ -55,9 +57,5 @@ def parabolic_sar_stop_logic(self):
     plt.scatter(sell_signals['Date'], sell_signals['Price'], label='Sell Signal', marker='v', color='red', alpha=1)
     plt.title(f"Parabolic SAR (Maximum Acceleration Factor: {self.params['Maximum Acceleration Factor Period']}, Acceleration Factor: {self.params['Acceleration Factor Period']})")
     plt.legend()
-    # Save the figure to a file
-    output_filename = f'parabolic_sar_strategy_graph.png'
-    graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-    plt.savefig(graph_path, dpi=100)
-    print(f"Plot saved to {output_filename}")
-    plt.close()  # Free memory
\ No newline at end of file
+    # Keep the figure as image bytes for the report
+    self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
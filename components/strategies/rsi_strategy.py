@@ -1,13 +1,11 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals, indicator_signals
+import components.vectorized_indicators as vi
 
 # RSI Strategy
 rsi_parameter_ranges = {
@@ -35,31 +33,23 @@ def rsi_next_logic(self):
             self.order = self.sell(size=self.position.size)
             self.rsi_signal.append({'Date': self.datas[0].datetime.date(0), 'Type': 'SELL', 'RSI': self.rsi[0]})
 
-def rsi_stop_logic(self):
-    data = pd.DataFrame({
-        'Close': self.data.close.array,
-        'RSI': self.rsi.array,
-    }, index=self.data.datetime.array)
-    # print(data)
-
-    data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
-    # print(data.index)
+def rsi_vectorized_logic(cache, params):
+    rsi = cache.get('rsi', params["RSI Period"])
+    return {
+        "buy": rsi < params["Oversold"],
+        "sell": rsi > params["Overbought"],
+        "start": params["RSI Period"],
+        "accumulate": False,
+    }
 
-    data = data.dropna(subset=['RSI'])
-    logged_trade_dates = {entry['Date'] for entry in self.log_data}
+def rsi_stop_logic(self):
+    data = decimate(plot_frame(self, {'RSI': self.rsi}, dropna=['RSI']))
 
     # Extract buy and sell signal data points
-    buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-    sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
-    buy_signals_rsi = pd.DataFrame([
-        {'Date': entry['Date'], 'RSI': entry['RSI']} 
-        for entry in self.rsi_signal if entry['Type'] == 'BUY'
-    ])
-    sell_signals_rsi = pd.DataFrame([
-        {'Date': entry['Date'], 'RSI': entry['RSI']} 
-        for entry in self.rsi_signal if entry['Type'] == 'SELL'
-    ])
-    
+    buy_signals, sell_signals = trade_signals(self.log_data)
+    buy_signals_rsi = indicator_signals(self.rsi_signal, 'RSI', 'BUY')
+    sell_signals_rsi = indicator_signals(self.rsi_signal, 'RSI', 'SELL')
+
     plt.figure(figsize=(12,6))
 
     plt.subplot(3, 1, (1, 2))
@@ -89,9 +79,5 @@ def rsi_stop_logic(self):
     if not sell_signals_rsi.empty:
         plt.scatter(sell_signals_rsi['Date'], sell_signals_rsi['RSI'], label='Sell Signal', marker='v', color='red', alpha=1)
     plt.legend()
-    # Save the figure to a file
-    output_filename = f'rsi_strategy_graph.png'
-    graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-    plt.savefig(graph_path, dpi=100)
-    print(f"Plot saved to {output_filename}")
-    plt.close()  # Free memory
\ No newline at end of file
+    # Keep the figure as image bytes for the report
+    self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
@@ -1,14 +1,12 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-from components.folder_name import UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_ledger, trade_signals, indicator_signals
+import components.vectorized_indicators as vi
 
 # Stochastic Strategy
 stochastic_parameter_ranges = {
@@ -62,29 +60,36 @@ def stochastic_next_logic(self):
 
     # print(f'stochastic_sell_next: {self.stochastic_sell}')
 
-def stochastic_stop_logic(self):
-    data = pd.DataFrame({
-        'Close': self.data.close.array,
-        'Stochastic Line': self.stochastic.percK.array,
-        'Signal Line': self.stochastic.percD.array,
-    }, index=self.data.datetime.array)
-    data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
+def stochastic_vectorized_logic(cache, params):
+    period, period_dfast = params["Stochastic Oscillator Period"], params["Signal Period"]
+    k_source = f"stochastic_k({period})"
+    cache.derive(k_source, lambda: vi.stochastic_k(
+        cache.line('close'), cache.get('highest', period, 'high'), cache.get('lowest', period, 'low')
+    ))
+    percK_source = f"stochastic_percK({period},{period_dfast})"
+    stochastic_line = cache.derive(percK_source, lambda: cache.get('sma', period_dfast, k_source))
+    signal_line = cache.get('sma', 3, percK_source)
+    previous_stochastic, previous_signal = vi.shift(stochastic_line), vi.shift(signal_line)
+    return {
+        "buy": (stochastic_line > signal_line) & (stochastic_line < params["Oversold"]) & (previous_stochastic < previous_signal),
+        "sell": (stochastic_line < signal_line) & (stochastic_line > params["Overbought"]) & (previous_stochastic > previous_signal),
+        # %D is an SMA(3) of %K, which is itself an SMA of the raw %K
+        "start": period + period_dfast,
+        "accumulate": True,
+    }
 
-    data = data.dropna(subset=['Stochastic Line', 'Signal Line'])
+def stochastic_stop_logic(self):
+    data = decimate(plot_frame(self, {
+        'Stochastic Line': self.stochastic.percK,
+        'Signal Line': self.stochastic.percD,
+    }, dropna=['Stochastic Line', 'Signal Line']))
 
-    logged_trade_dates = {entry['Date'] for entry in self.log_data}
     # Extract buy and sell signal data points
-    buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-    sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
-    # print(f'self.stochastic_sell: {self.stochastic_sell}')
-    buy_signals_stochastic = pd.DataFrame([
-        {'Date': entry['Date'], 'Stochastic': entry['Stochastic']} 
-        for entry in self.stochastic_buy if entry['Type'] == 'BUY' and entry['Date'] in logged_trade_dates
-    ])
-    sell_signals_stochastic = pd.DataFrame([
-        {'Date': entry['Date'], 'Stochastic': entry['Stochastic']} 
-        for entry in self.stochastic_sell if entry['Type'] == 'SELL' and entry['Date'] in logged_trade_dates
-    ])
+    buy_signals, sell_signals = trade_signals(self.log_data)
+    # Only the oscillator readings of signals that led to a trade are marked
+    logged_trade_dates = trade_ledger(self.log_data)['Date']
+    buy_signals_stochastic = indicator_signals(self.stochastic_buy, 'Stochastic', 'BUY', logged_trade_dates)
+    sell_signals_stochastic = indicator_signals(self.stochastic_sell, 'Stochastic', 'SELL', logged_trade_dates)
 
     plt.figure(figsize=(12, 6))
 
@@ -127,9 +132,5 @@ def stochastic_stop_logic(self):
     plt.legend()
 
     plt.tight_layout()
-    # Save the figure to a file
-    output_filename = f'stochastic_strategy_graph.png'
-    graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-    plt.savefig(graph_path, dpi=100)
-    print(f"Plot saved to {output_filename}")
-    plt.close()  # Free memory
\ No newline at end of file
+    # Keep the figure as image bytes for the report
+    self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
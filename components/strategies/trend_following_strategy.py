@@ -1,14 +1,12 @@
 import backtrader as bt
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import numpy as np
-import os
-from components.folder_name import UPLOAD_FOLDER
+from components.artifacts import figure_image
+from components.plot_data import decimate, plot_frame, trade_signals
+import components.vectorized_indicators as vi
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Donchain Strategy
 trend_following_parameter_ranges = {
@@ -42,28 +40,36 @@ def trend_following_next_logic(self):
         elif self.position and close < lower_band and close_yesterday >= lower_band:
             self.order = self.sell(size=self.position.size)
 
+def trend_following_vectorized_logic(cache, params):
+    close = cache.line('close')
+    # next_logic compares against the previous bar's channel
+    upper_band = vi.shift(cache.get('highest', params["High Period"], 'high'))
+    lower_band = vi.shift(cache.get('lowest', params["Lower Period"], 'low'))
+    close_yesterday = vi.shift(close)
+    return {
+        "buy": (close > upper_band) & (close_yesterday <= upper_band),
+        "sell": (close < lower_band) & (close_yesterday >= lower_band),
+        "start": max(params["High Period"], params["Lower Period"]) - 1,
+        "accumulate": True,
+    }
+
 def trend_following_stop_logic(self):
         # This method is used for visualization after the strategy finishes
-        data = pd.DataFrame({
-            'Close': self.data.close.array,
-            'High Period': self.upper_band.array,
-            'Mid Period': self.mid_band.array,
-            'Low Period': self.lower_band.array
-        }, index=self.data.datetime.array)
-        # print(data)
-
-        data.index = pd.to_datetime(data.index.map(lambda x: datetime.fromordinal(int(x)) + timedelta(days=x % 1)))
+        data = plot_frame(self, {
+            'High Period': self.upper_band,
+            'Mid Period': self.mid_band,
+            'Low Period': self.lower_band,
+        })
 
         # Shift the bands **to the right**
         shift_value = -1  # Adjust this as needed
         data['High Period'] = data['High Period'].shift(-shift_value)
         data['Mid Period'] = data['Mid Period'].shift(-shift_value)
         data['Low Period'] = data['Low Period'].shift(-shift_value)
-        # print(data.index)
+        data = decimate(data)
 
         # Extract buy and sell signal data points
-        buy_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'BUY'], columns=['Date', 'Price', 'Type'])
-        sell_signals = pd.DataFrame([entry for entry in self.log_data if entry['Type'] == 'SELL'], columns=['Date', 'Price', 'Type'])
+        buy_signals, sell_signals = trade_signals(self.log_data)
 
         plt.figure(figsize=(12, 6))
         plt.plot(data.index, data['Close'], label='Close Price', color='blue', linewidth=0.3)
@@ -87,9 +93,5 @@ def trend_following_stop_logic(self):
         plt.title(f"Trend Following Strategy (High Period: {self.params['High Period']}, Lower Period: {self.params['Lower Period']})")
         plt.legend()
         plt.tight_layout()
-        # Save the figure to a file
-        output_filename = f'trend_following_strategy_graph.png'
-        graph_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        plt.savefig(graph_path, dpi=100)
-        print(f"Plot saved to {output_filename}")
-        plt.close()  # Free memory
\ No newline at end of file
+        # Keep the figure as image bytes for the report
+        self.graph_image = figure_image(self.chart_format)
\ No newline at end of file
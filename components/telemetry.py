@@ -0,0 +1,185 @@
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+# Timing spans and counters for the request path, served in the Prometheus text format on /metrics.
+# Spans are aggregated into one histogram, backtest_phase_seconds, labelled by phase:
+#   request      - a whole /backtest, /backtest/stream, /execute-strategies or /universe-sweep call
+#   fetch        - loading (or downloading) the price histories
+#   grid         - expanding a strategy's parameter grid
+#   dispatch     - a sweep from its first combination to its last, per engine
+#   combo        - one parameter combination, per engine
+#   metrics      - the cash flows, IRR and metrics of one combination
+#   best_replay  - replaying the best parameters for the trade log
+#   chart_render - drawing a chart and saving it as an image
+#   encode       - turning artifacts into CSV and base64
+# Work on the worker pool is submitted through run_traced, which hands the spans and counters the
+# worker recorded back with the task's result; collect() merges them into this process.
+# BACKTEST_LOG_LEVEL (debug, info, warning, error; default info) gates the request-path logging:
+# full DataFrames, request bodies and per-combination lines are only printed at debug, per-sweep
+# summaries at info and failures the request survives at warning.
+LOG_LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+LOG_LEVEL = os.environ.get('BACKTEST_LOG_LEVEL', 'info').lower()
+if LOG_LEVEL not in LOG_LEVELS:
+    print(f"Log level '{LOG_LEVEL}' not found, using info. Choose one of {list(LOG_LEVELS)}.")
+    LOG_LEVEL = 'info'
+# Upper bounds in seconds; combos take milliseconds, whole sweeps minutes
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+METRIC_PREFIX = 'backtest'
+
+_lock = threading.Lock()
+# {(phase, labels): [bucket counts..., +Inf count], sum}
+_histograms = {}
+# {(name, labels): value}
+_counters = {}
+
+
+def log_enabled(level):
+    return LOG_LEVELS[level] >= LOG_LEVELS[LOG_LEVEL]
+
+
+def debug(*values):
+    # The values are only turned into text when debug logging is on
+    if log_enabled('debug'):
+        print(*values)
+
+
+def info(*values):
+    if log_enabled('info'):
+        print(*values)
+
+
+def warning(*values):
+    if log_enabled('warning'):
+        print(*values)
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def observe(phase, seconds, **labels):
+    key = (phase, label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(HISTOGRAM_BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+
+@contextlib.contextmanager
+def span(phase, **labels):
+    """Time the block (also when it raises) into the phase's histogram."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(phase, time.perf_counter() - start_time, **labels)
+
+
+def count(name, value=1, **labels):
+    if not value:
+        return
+    key = (name, label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def drain():
+    """Return what this process recorded since the last drain and start afresh."""
+    global _histograms, _counters
+    with _lock:
+        snapshot = {"histograms": _histograms, "counters": _counters}
+        _histograms, _counters = {}, {}
+    return snapshot
+
+
+def merge(snapshot):
+    with _lock:
+        for key, (buckets, total) in snapshot["histograms"].items():
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = [[0] * (len(HISTOGRAM_BUCKETS) + 1), 0.0]
+            histogram[0] = [mine + theirs for mine, theirs in zip(histogram[0], buckets)]
+            histogram[1] += total
+        for key, value in snapshot["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def run_traced(fn, *args, **kwargs):
+    # Runs on a worker: the task's result travels back with the telemetry it recorded
+    drain()  # Anything left over from untraced tasks is not this task's
+    result = fn(*args, **kwargs)
+    return result, drain()
+
+
+def collect(future):
+    """The result of a run_traced future, merging its worker's telemetry here."""
+    result, snapshot = future.result()
+    merge(snapshot)
+    return result
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def process_counters():
+    from components.frame_cache import frame_cache_report
+    from components.worker_pool import pool_stats
+    # Stats other modules already keep, read when scraped
+    frames = frame_cache_report()
+    counters = {
+        ('cache_hits', (('cache', 'frame'),)): frames["hits"],
+        ('cache_misses', (('cache', 'frame'),)): frames["misses"],
+        ('cache_evictions', (('cache', 'frame'),)): frames["evictions"],
+        ('worker_pool_starts', ()): pool_stats["starts"],
+        ('worker_pool_restarts', ()): pool_stats["restarts"],
+        ('worker_pool_recycles', ()): pool_stats["recycles"],
+    }
+    gauges = {
+        ('frame_cache_bytes', ()): frames["bytes"],
+        ('frame_cache_entries', ()): frames["entries"],
+        ('worker_pool_workers', ()): pool_stats["workers"],
+    }
+    return counters, gauges
+
+
+def render_metrics():
+    """All histograms, counters and gauges in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: (list(buckets), total) for key, (buckets, total) in _histograms.items()}
+        counters = dict(_counters)
+    extra_counters, gauges = process_counters()
+    counters.update(extra_counters)
+
+    lines = []
+    name = f"{METRIC_PREFIX}_phase_seconds"
+    lines.append(f"# HELP {name} Time spent per request phase.")
+    lines.append(f"# TYPE {name} histogram")
+    for (phase, labels), (buckets, total) in sorted(histograms.items()):
+        labels = (('phase', phase),) + labels
+        cumulative = 0
+        for bound, bucket in zip(HISTOGRAM_BUCKETS + ('+Inf',), buckets):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+
+    for counter in sorted({counter for counter, _ in counters}):
+        name = f"{METRIC_PREFIX}_{counter}_total"
+        lines.append(f"# TYPE {name} counter")
+        for (other, labels), value in sorted(counters.items()):
+            if other == counter:
+                lines.append(f"{name}{format_labels(labels)} {value}")
+    for (gauge, labels), value in sorted(gauges.items()):
+        name = f"{METRIC_PREFIX}_{gauge}"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
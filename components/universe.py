@@ -0,0 +1,123 @@
+import contextlib
+
+# Sweeps a list of strategies over a universe of symbols in one request.
+# Every (symbol, strategy) grid goes through the shared worker pool as one scheduler queue, largest
+# pending grids first, with each symbol's prices published to shared memory once. The result is a
+# compact table with the best parameters and their metrics per (symbol, strategy); no trade logs
+# or charts are drawn. A symbol whose data or sweep fails gets an error row and the rest of the
+# batch carries on.
+UNIVERSE_COLUMNS = [
+    "Symbol", "Strategy", "Combinations", "Best Params",
+    "Portfolio Value", "Sharpe Ratio", "Max Drawdown", "Win Rate", "IRR", "Error",
+]
+
+
+def universe_row(stock_symbol, strategy_name, results=None, error=None):
+    from components.run_strategy import best_result
+    row = dict.fromkeys(UNIVERSE_COLUMNS)
+    row.update({"Symbol": stock_symbol, "Strategy": strategy_name})
+    if error is not None:
+        row["Error"] = f"{type(error).__name__}: {error}"
+    elif results:
+        best_params, metrics = best_result(results)
+        row.update(metrics)
+        row["Combinations"] = len(results)
+        row["Best Params"] = best_params
+    return [row[column] for column in UNIVERSE_COLUMNS]
+
+
+def run_universe(stock_symbols, strategy_names, trade_size, initial_portfolio_value, start_date, interval='1d',
+                 engine='backtrader', progress=None, search=None):
+    from components.fetch_data import fetch_many_stock_data
+    from components.parameter_combinations import get_valid_combinations
+    from components.optimizers import is_search, strategy_ranges
+    from components.run_sweep import run_sweep, dispatch_sweeps, SWEEP_ENGINES
+    from components.scheduler import sweep_cost
+    from components.shared_prices import shared_prices
+    from components.result_cache import ResultCache
+    from components.worker_pool import leased_worker_pool
+    from components.jobs import JobCancelled
+    from components.telemetry import warning
+    """Sweep every strategy on every symbol and return {"columns", "rows", "stats"}."""
+    if engine not in SWEEP_ENGINES:
+        raise ValueError(f"Sweep engine '{engine}' not found. Choose one of {SWEEP_ENGINES}.")
+
+    frames, fetch_errors = fetch_many_stock_data(stock_symbols, start_date, interval)
+    grids = {
+        name: get_valid_combinations(name, trade_size, strategy_ranges(search, name)) for name in strategy_names
+    }
+    rows = {}
+    for stock_symbol, e in fetch_errors.items():
+        for name in strategy_names:
+            rows[(stock_symbol, name)] = universe_row(stock_symbol, name, error=e)
+
+    if engine == 'backtrader' and not is_search(search):
+        # Rows already scored on each symbol's history come from the result cache; only the rest is queued
+        pruning = (search or {}).get('pruning')
+        caches, stored, pending = {}, {}, {}
+        for stock_symbol, stock_data in frames.items():
+            for name in strategy_names:
+                key = (stock_symbol, name)
+                caches[key] = ResultCache(stock_data, name, initial_portfolio_value, engine)
+                stored[key], pending[key] = caches[key].split(grids[name])
+        fresh = {key: [] for key in pending}
+        if progress is not None:
+            progress.add_total(sum(len(grids[key[1]]) for key in pending))
+            progress.advance(sum(len(stored[key]) for key in pending))
+
+        def sweep_done(key):
+            caches[key].store(fresh[key])
+            rows[key] = universe_row(*key, results=stored[key] + fresh[key])
+
+        def sweep_failed(key, e):
+            warning(f"Sweep of {key[1]} on {key[0]} failed: {e}")
+            rows[key] = universe_row(*key, error=e)
+
+        for key in pending:
+            if not pending[key]:
+                sweep_done(key)
+        queued = sorted(
+            (key for key in pending if pending[key]),
+            key=lambda key: sweep_cost(key[1], pending[key], engine), reverse=True
+        )
+        if queued:
+            with contextlib.ExitStack() as published:
+                executor = published.enter_context(leased_worker_pool())
+                handles = {
+                    stock_symbol: published.enter_context(shared_prices(frames[stock_symbol]))
+                    for stock_symbol in sorted({key[0] for key in queued})
+                }
+                sweeps = [(key, key[1], pending[key], handles[key[0]]) for key in queued]
+                for key, chunk_results in dispatch_sweeps(
+                    executor, sweeps, initial_portfolio_value, on_error=sweep_failed, progress=progress,
+                    pruning=pruning, scored=stored
+                ):
+                    fresh[key].extend(chunk_results)
+                    if len(fresh[key]) == len(pending[key]):
+                        sweep_done(key)
+    else:
+        # The NumPy engines and budgeted searches sweep one grid after the other
+        for stock_symbol, stock_data in frames.items():
+            for name in strategy_names:
+                try:
+                    results, _ = run_sweep(
+                        name, trade_size, None, initial_portfolio_value, stock_data, engine, progress, search
+                    )
+                    rows[(stock_symbol, name)] = universe_row(stock_symbol, name, results=results)
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    warning(f"Sweep of {name} on {stock_symbol} failed: {e}")
+                    rows[(stock_symbol, name)] = universe_row(stock_symbol, name, error=e)
+
+    ordered = [rows[key] for key in sorted(rows)]
+    failed_symbols = sorted({row[0] for row in ordered if row[-1] is not None})
+    return {
+        "columns": UNIVERSE_COLUMNS,
+        "rows": ordered,
+        "stats": {
+            "symbols": len(set(stock_symbols)),
+            "strategies": len(strategy_names),
+            "failed_symbols": failed_symbols,
+        },
+    }
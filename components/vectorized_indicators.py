@@ -0,0 +1,143 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# NumPy ports of the backtrader indicators used in strategy_tree.
+# Every function takes 1-D float arrays and returns an array of the same length,
+# with NaN for the warm-up bars exactly where backtrader leaves them unset.
+
+
+def first_valid_index(values):
+    valid = np.flatnonzero(~np.isnan(values))
+    return int(valid[0]) if len(valid) else len(values)
+
+
+def _rolling(values, period, reducer):
+    output = np.full(len(values), np.nan)
+    if len(values) >= period:
+        output[period - 1:] = reducer(sliding_window_view(values, period), axis=1)
+    return output
+
+
+def sma(values, period):
+    # Windows that touch a NaN warm-up bar stay NaN, same as backtrader's minperiod
+    return _rolling(values, period, np.sum) / period
+
+
+def highest(values, period):
+    return _rolling(values, period, np.max)
+
+
+def lowest(values, period):
+    return _rolling(values, period, np.min)
+
+
+def exponential_smoothing(values, period, alpha):
+    output = np.full(len(values), np.nan)
+    seed_index = first_valid_index(values) + period - 1
+    if seed_index >= len(values):
+        return output
+
+    # Seed with the arithmetic mean of the first period values, then smooth forward.
+    # The recursion keeps backtrader's operation order so the series match bit for bit.
+    alpha1 = 1.0 - alpha
+    prev = math.fsum(values[seed_index - period + 1:seed_index + 1]) / period
+    smoothed = [prev]
+    for value in values[seed_index + 1:].tolist():
+        prev = prev * alpha1 + value * alpha
+        smoothed.append(prev)
+    output[seed_index:] = smoothed
+    return output
+
+
+def ema(values, period):
+    return exponential_smoothing(values, period, alpha=2.0 / (1.0 + period))
+
+
+def smma(values, period):
+    # Wilder's smoothed moving average used by RSI
+    return exponential_smoothing(values, period, alpha=1.0 / period)
+
+
+def shift(values, periods=1):
+    output = np.full(len(values), np.nan)
+    output[periods:] = values[:-periods]
+    return output
+
+
+def stddev(values, period):
+    meansq = sma(values ** 2, period)
+    return np.abs(meansq - sma(values, period) ** 2) ** 0.5
+
+
+def rsi(close, period):
+    previous_close = shift(close)
+    upday = np.maximum(close - previous_close, 0.0)
+    downday = np.maximum(previous_close - close, 0.0)
+    upday[0] = downday[0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = smma(upday, period) / smma(downday, period)
+    return 100.0 - 100.0 / (1.0 + rs)
+
+
+def stochastic_k(close, highest_high, lowest_low):
+    # Raw %K; the slow stochastic smooths it into %K and then %D with SMAs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 * ((close - lowest_low) / (highest_high - lowest_low))
+
+
+def crossover(line0, line1):
+    # CrossOver keeps the last non-zero difference so touching lines do not count as a cross
+    difference = line0 - line1
+    bars = np.arange(len(difference))
+    start = first_valid_index(difference)
+    source = np.where((bars == start) | ((bars > start) & (difference != 0)), bars, 0)
+    nzd = difference[np.maximum.accumulate(source)]
+    nzd[:start] = np.nan
+
+    previous_nzd = shift(nzd)
+    upcross = (previous_nzd < 0.0) & (line0 > line1)
+    downcross = (previous_nzd > 0.0) & (line0 < line1)
+    return upcross.astype(float) - downcross.astype(float)
+
+
+def parabolic_sar(high, low, close, af, afmax):
+    output = np.full(len(close), np.nan)
+    if len(close) < 2:
+        return output
+
+    # The SAR is a path dependent state machine, so it is stepped bar by bar
+    high, low, close = high.tolist(), low.tolist(), close.tolist()
+    sar = (high[1] + low[1]) / 2.0
+    acceleration = af
+    if close[1] >= close[0]:
+        trend, extreme = False, low[0]
+    else:
+        trend, extreme = True, high[0]
+
+    for i in range(1, len(close)):
+        hi, lo = high[i], low[i]
+        if (trend and sar >= lo) or (not trend and sar <= hi):
+            trend = not trend
+            sar = extreme
+            extreme = hi if trend else lo
+            acceleration = af
+
+        output[i] = sar
+        if trend:
+            if hi > extreme:
+                extreme = hi
+                acceleration = min(acceleration + af, afmax)
+        else:
+            if lo < extreme:
+                extreme = lo
+                acceleration = min(acceleration + af, afmax)
+
+        sar = sar + acceleration * (extreme - sar)
+        if trend:
+            if sar > lo or sar > low[i - 1]:
+                sar = min(lo, low[i - 1])
+        else:
+            if sar < hi or sar < high[i - 1]:
+                sar = max(hi, high[i - 1])
+    return output
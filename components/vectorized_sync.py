@@ -0,0 +1,115 @@
+import time
+import numpy as np
+import pandas as pd
+import numpy_financial as npf
+from types import SimpleNamespace
+
+# NumPy sweep engine. Indicators and entry/exit signals are computed as whole arrays and
+# only the bars that carry a signal are walked to replay backtrader's default broker:
+#   - a market order placed on bar i fills at the open of bar i + 1 (never on the last bar)
+#   - a buy is rejected when cash cannot cover it at the signal close or at the fill open
+#   - a sell always closes the whole position
+# Result rows match run_backtrader_sync exactly for the formatted precision we report.
+# The only differences come from summing SMA/Highest windows with NumPy instead of
+# math.fsum (relative error around 1e-15), which can flip a signal only when two
+# indicator values are equal to the last bit.
+
+
+def simulate_long_only(prices, dates, signals, trade_size, initial_portfolio_value, pruner=None):
+    open_price, close = prices["open"], prices["close"]
+    buy, sell = signals["buy"], signals["sell"]
+    start, accumulate = signals["start"], signals["accumulate"]
+    last_bar = len(close) - 1
+
+    cash = initial_portfolio_value
+    position = 0
+    log_data = []
+    if pruner is not None:
+        pruner.reset()
+    # With a pruner, the value on every bar up to a signal is checked before the signal is acted on,
+    # as backtrader's next() sees it; a pruned run ends at the close of the breaking bar
+    pruned = None
+    checked = start
+    for i in np.flatnonzero(buy[start:] | sell[start:]) + start:
+        if i >= last_bar:
+            break  # orders placed on the last bar are never filled
+        if pruner is not None:
+            pruned = pruner.check(checked, i, cash, position, trade_size)
+            if pruned:
+                break
+            checked = i + 1
+        fill_price = open_price[i + 1]
+        if buy[i] and (accumulate or not position):
+            if cash < trade_size * close[i] or cash < trade_size * fill_price:
+                continue  # Margin: the broker rejects the order
+            cash -= trade_size * fill_price
+            position += trade_size
+            log_type, log_size = 'BUY', trade_size
+        elif sell[i] and position:
+            cash += position * fill_price
+            log_type, log_size = 'SELL', -position
+            position = 0
+        else:
+            continue
+        log_data.append({
+            'Date': (dates[i + 1] - pd.Timedelta(days=1)).date(),
+            'Type': log_type,
+            'Price': fill_price,
+            'Size': log_size,
+            'Portfolio Value': cash + position * close[i + 1],
+        })
+
+    if pruner is not None and not pruned:
+        pruned = pruner.check(checked, last_bar, cash, position, trade_size)
+    if pruned:
+        final_portfolio_value = cash + position * close[pruned[0]]
+        return log_data, final_portfolio_value, pruned[1]
+
+    final_portfolio_value = cash + position * close[-1]
+    return log_data, final_portfolio_value, ""
+
+
+def run_vectorized_sync(stock_data, strategy_name, params, initial_portfolio_value, indicator_cache=None, context=None,
+                        pruner=None):
+    from strategies import strategy_tree
+    from components.formulas import calculate_metrics, calculate_cash_flows, metrics_context
+    from components.indicator_cache import IndicatorCache
+    from components.telemetry import span, observe, count
+    """Run one parameter combination with the NumPy engine; a pruner may stop it early."""
+    start_time = time.perf_counter()
+    if strategy_name not in strategy_tree:
+        raise ValueError(f"Strategy '{strategy_name}' not found in the strategy tree.")
+    # Sweeps pass one cache and metrics context for all their combinations; a single run gets its own
+    indicator_cache = indicator_cache or IndicatorCache(stock_data)
+    context = context or metrics_context(stock_data)
+    signals = strategy_tree[strategy_name]["vectorized_logic"](indicator_cache, params)
+    log_data, final_portfolio_value, pruned = simulate_long_only(
+        indicator_cache.prices, stock_data.index, signals, params["Trade Size"], initial_portfolio_value, pruner
+    )
+
+    # Metrics are shared with the backtrader engine so both report identical rows
+    strategy = SimpleNamespace(log_data=log_data)
+    with span('metrics'):
+        cash_flows = calculate_cash_flows(log_data, initial_portfolio_value, stock_data, context)
+        irr = npf.irr(cash_flows)
+        win_rate, sharpe_ratio, max_drawdown = calculate_metrics(
+            strategy,
+            initial_portfolio_value=initial_portfolio_value,
+            final_portfolio_value=final_portfolio_value, stock_data=stock_data, cash_flows=cash_flows,
+            context=context
+        )
+
+    result = {
+        **params,
+        "Win Rate": win_rate,
+        "Sharpe Ratio": f"{sharpe_ratio:.2f}",
+        "Max Drawdown": f"{max_drawdown:.2f}%",
+        "IRR": f"{irr:.2f}",
+        "Portfolio Value": f"{final_portfolio_value:.2f}",
+    }
+    if pruner is not None:
+        result["Pruned"] = pruned
+
+    observe('combo', time.perf_counter() - start_time, engine='vectorized')
+    count('combos', engine='vectorized')
+    return result
@@ -0,0 +1,154 @@
+import atexit
+import concurrent.futures
+import contextlib
+import os
+from multiprocessing import resource_tracker
+import threading
+
+# One process pool for the whole application, created at startup and reused by every request.
+# BACKTEST_POOL_WORKERS sets the number of worker processes (defaults to the CPU count).
+# BACKTEST_POOL_MAX_TASKS_PER_CHILD recycles the workers once they have run that many tasks
+# each on average, to cap memory growth (0 keeps workers for the life of the application).
+POOL_WORKERS = int(os.environ.get('BACKTEST_POOL_WORKERS', 0)) or os.cpu_count() or 1
+POOL_MAX_TASKS_PER_CHILD = int(os.environ.get('BACKTEST_POOL_MAX_TASKS_PER_CHILD', 0))
+
+_pool = None
+_pool_lock = threading.Lock()
+pool_stats = {"workers": 0, "starts": 0, "restarts": 0, "recycles": 0}
+
+
+def warm_worker():
+    # Pay for the heavy imports once per worker instead of once per task
+    import backtrader
+    import pandas
+    import matplotlib
+    import numpy_financial
+    import strategies
+    import components.backtrader_sync
+    import components.strategy_class
+    import components.formulas
+
+
+def _worker_ready(_):
+    return os.getpid()
+
+
+class WorkerPool(concurrent.futures.ProcessPoolExecutor):
+    # Counts submitted tasks so the pool can be recycled. ProcessPoolExecutor's own
+    # max_tasks_per_child deadlocks on Python 3.11, so workers are replaced a pool at a time.
+    # holders counts the dispatchers leasing the pool: a retired pool is only shut down once the
+    # last of them lets go, so nobody submits to a pool that has been shut down under them.
+    def __init__(self, max_workers, max_tasks_per_child=0):
+        super().__init__(max_workers=max_workers, initializer=warm_worker)
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.submitted = 0
+        self.submit_lock = threading.Lock()
+        self.holders = 0
+        self.retired = False
+        self.cancel_on_retire = False
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self.submit_lock:
+            self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+    def worn_out(self):
+        return bool(self.max_tasks_per_child) and self.submitted >= self.max_tasks_per_child * self.max_workers
+
+
+def _start_pool(max_workers, max_tasks_per_child):
+    from components.telemetry import info
+    # Called with _pool_lock held
+    global _pool
+    # Workers must share our resource tracker, otherwise each starts its own and reports the
+    # shared price blocks it attached to as leaked when it exits
+    resource_tracker.ensure_running()
+    _pool = WorkerPool(max_workers, max_tasks_per_child)
+    # Bring every worker up now so the first request does not pay for spawning and imports
+    list(_pool.map(_worker_ready, range(max_workers)))
+    _pool.submitted = 0
+    pool_stats["workers"] = max_workers
+    pool_stats["starts"] += 1
+    info(f"Worker pool started with {max_workers} workers")
+    return _pool
+
+
+def start_worker_pool(max_workers=None, max_tasks_per_child=None):
+    max_workers = max_workers or POOL_WORKERS
+    max_tasks_per_child = POOL_MAX_TASKS_PER_CHILD if max_tasks_per_child is None else max_tasks_per_child
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        return _start_pool(max_workers, max_tasks_per_child)
+
+
+def _retire_pool(cancel_futures=False):
+    # Called with _pool_lock held. Tasks already queued on the retired pool still run (unless it
+    # broke); it is shut down now if no dispatcher holds it, otherwise by the last one to release it
+    global _pool
+    retired, _pool = _pool, None
+    retired.retired = True
+    retired.cancel_on_retire = cancel_futures
+    if not retired.holders:
+        retired.shutdown(wait=False, cancel_futures=cancel_futures)
+    return _start_pool(retired.max_workers, retired.max_tasks_per_child)
+
+
+def _current_pool():
+    # Called with _pool_lock held. A worker that dies (e.g. killed for memory) breaks the
+    # executor, and a worn out pool is due for fresh workers; either is replaced transparently
+    if _pool is None:
+        return _start_pool(POOL_WORKERS, POOL_MAX_TASKS_PER_CHILD)
+    if getattr(_pool, '_broken', False):
+        pool_stats["restarts"] += 1
+        return _retire_pool(cancel_futures=True)
+    if _pool.worn_out():
+        pool_stats["recycles"] += 1
+        return _retire_pool()
+    return _pool
+
+
+def acquire_worker_pool():
+    """Lease the shared pool; it is not shut down before release_worker_pool is called for it."""
+    with _pool_lock:
+        pool = _current_pool()
+        pool.holders += 1
+        return pool
+
+
+def release_worker_pool(pool):
+    with _pool_lock:
+        pool.holders -= 1
+        if pool.retired and not pool.holders:
+            pool.shutdown(wait=False, cancel_futures=pool.cancel_on_retire)
+
+
+@contextlib.contextmanager
+def leased_worker_pool():
+    """The shared pool for a block that submits to it more than once, e.g. a whole sweep."""
+    pool = acquire_worker_pool()
+    try:
+        yield pool
+    finally:
+        release_worker_pool(pool)
+
+
+def submit_to_pool(fn, /, *args, **kwargs):
+    """Submit one task to the shared pool and return its future."""
+    # A queued task still runs if the pool is retired straight after
+    with leased_worker_pool() as pool:
+        return pool.submit(fn, *args, **kwargs)
+
+
+def shutdown_worker_pool(wait=True):
+    from components.telemetry import info
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+            info("Worker pool shut down")
+
+
+atexit.register(shutdown_worker_pool)
@@ -1,153 +1,250 @@
-import concurrent.futures
 import backtrader as bt
-import pandas as pd
-import numpy_financial as npf
 from strategies import strategy_tree
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
+import json
 import os
-from components.folder_name import UPLOAD_FOLDER
-import base64
-import concurrent
+from components.worker_pool import start_worker_pool
+from components.telemetry import observe, debug, info, warning
 import time
+import uuid
 
 app = Flask(__name__)
 
 CORS(app) # Enable CORS for all routes
 
-# Ensure the directory for saving files exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-@app.route('/backtest', methods=['POST'])
-def backtest():
-    start_time = time.time()
-    from components.strategy_class import create_strategy_class
+def backtest_inputs(data):
     from components.fetch_data import fetch_stock_data
-    from components.parameter_combinations import get_parameter_combinations
-    from components.backtrader_sync import run_backtrader_sync
-    data = request.json
-    print(data)
+    from components.optimizers import search_options
     strategy_name = data.get('strategy_name', 'macd')
     initial_portfolio_value = data.get('initial_portfolio_value', 100000)
     stock_symbol = data.get('stock_symbol', 'RELIANCE.NS')
     start_date = data.get('start_date', '2023-01-01')
     trade_size = data.get('trade_size', 30)
+    engine = data.get('engine', 'backtrader')  # 'vectorized' or 'batch' run the sweep with NumPy
     interval = '1d'
+    search = search_options(data)  # 'optimizer', 'budget' and 'parameter_ranges' replace the full grid
 
     # Fetch stock data and interval
     stock_data = fetch_stock_data(stock_symbol, start_date, interval)
     data_feed = bt.feeds.PandasData(dataname=stock_data)
-    print(f'stock data: {stock_data}')
-    results = []
-    param_names, param_combinations = get_parameter_combinations(strategy_name)
-    # Filter invalid parameter combinations before running
-    valid_combinations = [
-        dict(zip(param_names, combo)) for combo in param_combinations if combo[0] > combo[1]
-    ]
-    # Add 'Trade Size' to each parameter set
-    for params in valid_combinations:
-        params['Trade Size'] = trade_size  # Ensure trade size is included
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        futures = {
-            executor.submit(
-                run_backtrader_sync, data_feed, strategy_name, params, initial_portfolio_value, stock_data
-            ): params for params in valid_combinations
-        }
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            results.append(result)
-    # Convert log data to a DataFrame and save to CSV 
-    log_df = pd.DataFrame(results)
-    # print(log_df)
-    csv_robustness = f'robustness_test_{strategy_name}.csv'
-    csv_path = os.path.join(UPLOAD_FOLDER, csv_robustness)
-    log_df.to_csv(csv_path, index=False)
-
-    # Sort the results list in descending order based on Portfolio Value (convert to float for correct sorting)
-    sorted_results = sorted(results, key=lambda x: float(x["Portfolio Value"]), reverse=True)
-
-    highest_result = sorted_results[0]
-    exclude_keys = {"Win Rate", "Sharpe Ratio", "Max Drawdown", "IRR", "Portfolio Value"}
-    best_params = {key: value for key, value in highest_result.items() if key not in exclude_keys}
-    print("Best Params:", best_params)
-    cerebro = bt.Cerebro()
-    cerebro.adddata(data_feed)
-    cerebro.broker.setcash(initial_portfolio_value)
-    Graph = create_strategy_class(strategy_name=strategy_name, stop_logic='stop_logic')
-    cerebro.addstrategy(Graph, params=best_params)
-    cerebro.run()[0]
-
-    # Check if the file exists
-    csv_trade_log = f'static/files/trade_log_{strategy_name}.csv'
-    if os.path.exists(csv_trade_log):
-        # Read the file and encode it as Base64
-        with open(csv_trade_log, 'rb') as f:
-            encoded_trade_log = base64.b64encode(f.read()).decode('utf-8')
-    
-    graph_img = f'static/files/{strategy_name}_strategy_graph.png'
-    if os.path.exists(graph_img):
-        with open(graph_img, "rb") as image_file:
-            encoded_graph = base64.b64encode(image_file.read()).decode('utf-8')
-
-    # Encode CSV file as base64
-    csv_robustness = f'static/files/robustness_test_{strategy_name}.csv'
-    if os.path.exists(graph_img):
-        with open(csv_robustness, "rb") as f:
-            encoded_robustness_logs = base64.b64encode(f.read()).decode('utf-8')
-        
-    backtest_results = {
-        "Strategy name": strategy_name,
-        "Start Date": start_date,
-        "Trade Size": trade_size,
-        "Robustness Test": encoded_robustness_logs,
-        "Trade Log": encoded_trade_log,
-        "Graph Img": encoded_graph,
-    }
+    debug('stock data:', stock_data)
+    return strategy_name, trade_size, data_feed, initial_portfolio_value, stock_data, start_date, engine, search
+
+def run_backtest(data, progress=None):
+    start_time = time.time()
+    from components.run_strategy import run_strategy
+    from components.charts import chart_mode
+    *inputs, search = backtest_inputs(data)
+    backtest_results = run_strategy(*inputs, progress, search, chart_mode(data))
     end_time = time.time()
-    print(f'Time Taken: {end_time - start_time}')
-    return jsonify(backtest_results)
+    observe('request', end_time - start_time, route='/backtest')
+    info(f'Time Taken: {end_time - start_time}')
+    return backtest_results
 
-@app.route('/strategies', methods=['GET'])
-def get_strategies():
-    """
-    Fetch all available strategies.
-    """
-    strategy_list = list(strategy_tree.keys())
-    print(f'strategies list: {strategy_list}')
-    return jsonify({"strategies": strategy_list})
+def stream_backtest(data, sse=False):
+    start_time = time.time()
+    from components.run_strategy import stream_strategy
+    from components.charts import chart_mode
+    # One JSON document per line, or Server-Sent Events named after each event's type
+    def encode(event):
+        if sse:
+            return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + "\n"
 
-@app.route('/execute-strategies', methods=['POST'])
-def execute_strategies():
+    try:
+        *inputs, search = backtest_inputs(data)
+        for event in stream_strategy(*inputs, search=search, chart=chart_mode(data)):
+            yield encode(event)
+    except Exception as e:
+        warning(f"Streaming backtest failed: {e}")
+        yield encode({"event": "error", "error": f"{type(e).__name__}: {e}"})
+    end_time = time.time()
+    observe('request', end_time - start_time, route='/backtest/stream')
+    info(f'Time Taken: {end_time - start_time}')
+
+def run_execute_strategies(data, progress=None):
     start_time = time.time()
     from components.fetch_data import fetch_stock_data
-    from components.run_strategy import run_strategy
-    data = request.json
-    print(data)
+    from components.scheduler import run_all_strategies
+    from components.optimizers import search_options
+    from components.charts import chart_mode
     initial_portfolio_value = data.get('initial_portfolio_value', 100000)
     stock_symbol = data.get('stock_symbol', 'RELIANCE.NS')
     start_date = data.get('start_date', '2023-01-01')
     trade_size = data.get('trade_size', 30)
+    engine = data.get('engine', 'backtrader')
     interval = '1d'
+    search = search_options(data)
 
     stock_data = fetch_stock_data(stock_symbol, start_date, interval)
     data_feed = bt.feeds.PandasData(dataname=stock_data)
-    print(f'stock data: {stock_data}')
-
-    master_results = [] # Initialize a master results list for all strategies
-    
-    with concurrent.futures.ProcessPoolExecutor() as excutor:
-        futures = {
-            excutor.submit(
-                run_strategy, strategy, trade_size, data_feed, initial_portfolio_value, stock_data, start_date
-            ): strategy for strategy in strategy_tree
-        }
-        for future in concurrent.futures.as_completed(futures):
-            backtest_results = future.result()
-            master_results.append(backtest_results)
-    
+    debug('stock data:', stock_data)
+
+    # Every strategy's combinations share one scheduler on the worker pool
+    master_results = run_all_strategies(
+        list(strategy_tree), trade_size, data_feed, initial_portfolio_value, stock_data, start_date, engine, progress,
+        search, chart_mode(data)
+    )
+
+    end_time = time.time()
+    observe('request', end_time - start_time, route='/execute-strategies')
+    info(f'Time Taken: {end_time - start_time}')
+    return master_results
+
+def run_universe_sweep(data, progress=None):
+    start_time = time.time()
+    from components.universe import run_universe
+    from components.optimizers import search_options
+    stock_symbols = data.get('stock_symbols', [])
+    strategy_names = data.get('strategy_names') or list(strategy_tree)
+    initial_portfolio_value = data.get('initial_portfolio_value', 100000)
+    start_date = data.get('start_date', '2023-01-01')
+    trade_size = data.get('trade_size', 30)
+    engine = data.get('engine', 'backtrader')
+    interval = '1d'
+    search = search_options(data)
+
+    # Every (symbol, strategy, combo) task shares one scheduler on the worker pool
+    universe_results = run_universe(
+        stock_symbols, strategy_names, trade_size, initial_portfolio_value, start_date, interval, engine, progress,
+        search
+    )
+
     end_time = time.time()
-    print(f'Time Taken: {end_time - start_time}')
-    return jsonify(master_results)
+    observe('request', end_time - start_time, route='/universe-sweep')
+    info(f'Time Taken: {end_time - start_time}')
+    return universe_results
+
+def respond(kind, run, data):
+    from components.jobs import submit_job, job_status
+    from components.profiling import profile_options, profiled
+    # With "async": true the request is queued as a job and answered at once with its id
+    # With "profile" the run is profiled; its report is kept under the job id (or a new id)
+    try:
+        profile = profile_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if data.get('async'):
+        job_id = submit_job(kind, profiled(run, profile) if profile else run, data)
+        return jsonify({**job_status(job_id), "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}), 202
+    if profile:
+        profile_id = uuid.uuid4().hex
+        response = jsonify(profiled(run, profile, profile_id)(data))
+        response.headers['X-Profile-Url'] = f"/profiles/{profile_id}"
+        return response
+    return jsonify(run(data))
+
+@app.route('/backtest', methods=['POST'])
+def backtest():
+    data = request.json
+    debug(data)
+    return respond('backtest', run_backtest, data)
+
+@app.route('/backtest/stream', methods=['POST'])
+def backtest_stream():
+    data = request.json
+    debug(data)
+    # Rows are sent as their combinations finish, followed by the summary with the artifacts
+    sse = data.get('format') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+    return Response(
+        stream_with_context(stream_backtest(data, sse)),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/charts/<handle>', methods=['GET'])
+def get_chart(handle):
+    from components.charts import chart_image, CHART_FORMATS, StaleChart
+    # Drawn on the first request for a handle and format, then served from the chart cache
+    fmt = request.args.get('format', 'png')
+    if fmt not in CHART_FORMATS:
+        return jsonify({"error": f"Chart format '{fmt}' not found. Choose one of {list(CHART_FORMATS)}."}), 400
+    try:
+        image = chart_image(handle, fmt)
+    except StaleChart as e:
+        return jsonify({"error": str(e)}), 410
+    if image is None:
+        return jsonify({"error": f"Chart {handle} not found."}), 404
+    # A handle always names the same chart, so clients may keep it
+    return Response(image, mimetype=CHART_FORMATS[fmt], headers={"Cache-Control": "public, max-age=86400"})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    from components.telemetry import render_metrics
+    # Phase timing histograms and counters in the Prometheus text format
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    from components.profiling import profile_file, PROFILE_FILES
+    # The text report, or the request or workers pstats dump
+    fmt = request.args.get('format', 'text')
+    if fmt not in PROFILE_FILES:
+        return jsonify({"error": f"Profile format '{fmt}' not found. Choose one of {list(PROFILE_FILES)}."}), 400
+    path = profile_file(profile_id, fmt)
+    if path is None:
+        return jsonify({"error": f"Profile {profile_id} has no {fmt} report."}), 404
+    with open(path, 'rb') as f:
+        content = f.read()
+    if fmt == 'text':
+        return Response(content, mimetype='text/plain')
+    return Response(content, mimetype='application/octet-stream',
+                    headers={"Content-Disposition": f"attachment; filename={profile_id}_{PROFILE_FILES[fmt]}"})
+
+@app.route('/strategies', methods=['GET'])
+def get_strategies():
+    """
+    Fetch all available strategies.
+    """
+    strategy_list = list(strategy_tree.keys())
+    debug(f'strategies list: {strategy_list}')
+    return jsonify({"strategies": strategy_list})
+
+@app.route('/execute-strategies', methods=['POST'])
+def execute_strategies():
+    data = request.json
+    debug(data)
+    return respond('execute-strategies', run_execute_strategies, data)
+
+@app.route('/universe-sweep', methods=['POST'])
+def universe_sweep():
+    data = request.json
+    debug(data)
+    strategy_names = data.get('strategy_names') or list(strategy_tree)
+    unknown = [name for name in strategy_names if name not in strategy_tree]
+    if not data.get('stock_symbols') or unknown:
+        return jsonify({"error": f"Give a list of stock_symbols and known strategy_names (unknown: {unknown})."}), 400
+    return respond('universe-sweep', run_universe_sweep, data)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    from components.jobs import job_status
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({"error": f"Job {job_id} not found."}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def stop_job(job_id):
+    from components.jobs import cancel_job, job_status
+    if job_status(job_id) is None:
+        return jsonify({"error": f"Job {job_id} not found."}), 404
+    return jsonify(cancel_job(job_id))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    from components.jobs import job_status, job_result
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({"error": f"Job {job_id} not found."}), 404
+    if status["status"] != 'finished':
+        # Not ready (or never will be); the status says which
+        return jsonify(status), 409 if status["status"] in ('failed', 'cancelled', 'interrupted') else 202
+    return jsonify(job_result(job_id))
 
 if __name__ == "__main__":
+    # With the debug reloader only the child process serves requests, so start the pool there
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_worker_pool()
     app.run(host='0.0.0.0', port=8080,debug=True)
\ No newline at end of file